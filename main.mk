@@ -1,6 +1,7 @@
 
 TABLES_DIR = ../tables
-GEN_GAMMA = $(TABLES_DIR)/gen_gamma_table
+GEN_TABLES = $(TABLES_DIR)/gen_tables.py
+GEN_GAMMA = $(GEN_TABLES) gamma
 
 all: $(PROJ).rpt $(PROJ).bin
 
@@ -49,12 +50,9 @@ sudo-prog: $(PROJ).bin
 
 clean:
 	rm -f $(PROJ).blif $(PROJ).asc $(PROJ).log $(PROJ).rpt $(PROJ).bin \
-	      $(PROJ).json ../tables/gen_gamma_table *.vcd a.out $(ADD_CLEAN)
+	      $(PROJ).json *.vcd a.out $(ADD_CLEAN)
 
-%.hex:	../tables/gen_gamma_table
-
-$(GEN_GAMMA): $(TABLES_DIR)/gen_gamma_table.c
-$(GEN_GAMMA): LDLIBS += -lm
+%.hex:	$(GEN_TABLES)
 
 .SECONDARY:
 .PHONY: all prog clean
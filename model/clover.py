@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+
+# Smoking Clover without a frame buffer.
+#
+# The classic version sums a fan of lines into a frame buffer once,
+# then animates by cycling the color lookup table (CLUT).  Here every
+# line is a full diameter through the panel center.  "V" lines run from
+# (i, 0) to (63 - i, 63) and have one pixel per row; "H" lines are their
+# transposes and have one pixel per column.  A pixel's value is the
+# number of lines that touch it, modulo the CLUT size.
+#
+# `framebuffer()` rasterizes the lines the classic way and is the
+# ground truth.  `Incremental` gets the same image in scan order,
+# keeping only a Bresenham position and error term for each line:
+# V accumulators step once per row, H accumulators step once per pixel
+# and restart every row.  Both are vectorized across all lines.
+#
+# The line set has two exact symmetries, which let the hardware drop
+# accumulators:
+#
+#   ×2  line 63 - i is line i mirrored, x → 63 - x.  Keep lines
+#       0..31 and give each accumulator a second comparator.
+#   ×4  additionally, the H lines are the V lines transposed.  Drop the
+#       H accumulators and read H positions from a 64 × 32 table of V
+#       positions, indexed by column.  (The pattern is static; only the
+#       CLUT moves.)
+
+from collections import namedtuple
+import colorsys
+import sys
+import time
+
+import numpy as np
+
+
+SIZE = 64
+SPAN = SIZE - 1                 # dy of a V line
+DENOM = 2 * SPAN                # Bresenham denominator
+
+
+def line_positions(lines=None, size=SIZE):
+    """Ground truth positions: pos[i, t] for V line i at row t.
+
+       x = i + round(t * (63 - 2i) / 63), rounding halves up, in
+       integers.  H line i at column t has the same value as its y.
+    """
+    span = size - 1
+    i = np.arange(size) if lines is None else np.asarray(lines)
+    t = np.arange(size)
+    dx = span - 2 * i
+    return i[:, None] + (2 * t[None, :] * dx[:, None] + span) // (2 * span)
+
+
+def framebuffer(size=SIZE, value_bits=8):
+    """Classic Smoking Clover: rasterize every line into a buffer."""
+    fb = np.zeros((size, size), dtype=np.int64)
+    pos = line_positions(size=size)
+    t = np.broadcast_to(np.arange(size), pos.shape)
+    np.add.at(fb, (t.ravel(), pos.ravel()), 1)     # V lines: fb[y, x]
+    np.add.at(fb, (pos.ravel(), t.ravel()), 1)     # H lines
+    return fb & ((1 << value_bits) - 1)
+
+
+Report = namedtuple('Report',
+                    'symmetry accumulators comparators table_bits '
+                    'err_bits pos_bits value_bits max_count exact')
+
+
+class Incremental:
+    """Frame-bufferless scan-order model.
+
+       `err_bits` is the signed width of the error term, including the
+       intermediate sum before correction.  Too few bits wraps it, just
+       like a narrow register would, and shows up as `exact=False`.
+    """
+
+    def __init__(self, size=SIZE, symmetry=1, err_bits=9, value_bits=8):
+        assert symmetry in (1, 2, 4)
+        self.size = size
+        self.span = size - 1
+        self.symmetry = symmetry
+        self.err_bits = err_bits
+        self.value_bits = value_bits
+        n = size if symmetry == 1 else size // 2
+        self.lines = np.arange(n)
+        self.dx2 = 2 * (self.span - 2 * self.lines)
+
+    def _wrap(self, v):
+        half = 1 << (self.err_bits - 1)
+        return (v + half) % (2 * half) - half
+
+    def _start(self, shape):
+        pos = np.broadcast_to(self.lines, shape).copy()
+        err = np.full(shape, self.span)             # the rounding half
+        return pos, err
+
+    def _step(self, pos, err):
+        err = self._wrap(err + self.dx2)
+        up = err >= 2 * self.span
+        down = err < 0
+        err = self._wrap(err - 2 * self.span * up + 2 * self.span * down)
+        return pos + up - down, err
+
+    def _hits(self, pos, coord):
+        """Count lines at `coord`, including mirrors if folded."""
+        hits = (pos == coord).sum(axis=-1)
+        if self.symmetry > 1:
+            hits += (self.span - pos == coord).sum(axis=-1)
+        return hits
+
+    def _h_positions(self):
+        """H line positions for each column, shaped (size, lines)."""
+        if self.symmetry == 4:
+            # The table is the V accumulator trajectory, captured once.
+            table = np.empty((self.size, self.lines.size), dtype=np.int64)
+            pos, err = self._start(self.lines.shape)
+            for t in range(self.size):
+                table[t] = pos
+                pos, err = self._step(pos, err)
+            return table
+        return None
+
+    def frame(self):
+        size = self.size
+        out = np.zeros((size, size), dtype=np.int64)
+        x = np.arange(size)
+        table = self._h_positions()
+
+        # V accumulators: one step per row.
+        vpos, verr = self._start(self.lines.shape)
+        # H accumulators: one step per pixel, restarted each row.  Every
+        # row runs the same sequence, so all rows are stepped at once.
+        hpos, herr = self._start((size, self.lines.size))
+        y = np.arange(size)
+
+        for t in range(size):
+            # Row t, all columns: V hits.
+            out[t] += self._hits(vpos[None, :], x[:, None])
+            vpos, verr = self._step(vpos, verr)
+            # Column t, all rows: H hits.
+            if table is None:
+                out[:, t] += self._hits(hpos, y[:, None])
+                hpos, herr = self._step(hpos, herr)
+            else:
+                out[:, t] += self._hits(table[t][None, :], y[:, None])
+        return out & ((1 << self.value_bits) - 1)
+
+    def report(self):
+        n = self.lines.size
+        h_accs = 0 if self.symmetry == 4 else n
+        # V and H positions each need a comparator, two when folded.
+        per_line = 1 if self.symmetry == 1 else 2
+        table_bits = n * self.size * self.pos_bits if self.symmetry == 4 else 0
+        truth = framebuffer(self.size, value_bits=30)
+        return Report(symmetry=self.symmetry,
+                      accumulators=n + h_accs,
+                      comparators=2 * n * per_line,
+                      table_bits=table_bits,
+                      err_bits=self.err_bits,
+                      pos_bits=self.pos_bits,
+                      value_bits=self.value_bits,
+                      max_count=int(truth.max()),
+                      exact=bool(np.array_equal(
+                          self.frame(),
+                          truth & ((1 << self.value_bits) - 1))))
+
+    @property
+    def pos_bits(self):
+        return int(self.span).bit_length()
+
+
+def min_err_bits(size=SIZE, symmetry=1):
+    """Narrowest error register that still matches the ground truth."""
+    truth = framebuffer(size)
+    for bits in range(2, 16):
+        if np.array_equal(Incremental(size, symmetry, bits).frame(), truth):
+            return bits
+    return None
+
+
+def make_clut(value_bits=8):
+    n = 1 << value_bits
+    rgb = [colorsys.hsv_to_rgb(i / n, 1.0, 1.0) for i in range(n)]
+    return np.round(np.array(rgb) * 255).astype(np.uint8)
+
+
+def frames(count, model=None, clut=None):
+    """Yield (64, 64, 3) RGB frames, cycling the CLUT one step a frame."""
+    model = model or Incremental()
+    clut = make_clut(model.value_bits) if clut is None else clut
+    values = model.frame()
+    for f in range(count):
+        yield clut[(values + f) % len(clut)]
+
+
+def main(argv):
+    for sym in (1, 2, 4):
+        bits = min_err_bits(symmetry=sym)
+        model = Incremental(symmetry=sym, err_bits=bits)
+        t0 = time.perf_counter()
+        rep = model.report()
+        dt = time.perf_counter() - t0
+        print('×{}: {:3} accumulators, {:3} comparators, {:5} table bits, '
+              '{} err bits, {} pos bits, max count {}, exact {} ({:.1f} ms)'
+              .format(rep.symmetry, rep.accumulators, rep.comparators,
+                      rep.table_bits, rep.err_bits, rep.pos_bits,
+                      rep.max_count, rep.exact, dt * 1e3))
+    if '-i' in argv:
+        import PIL.Image
+        imgs = [PIL.Image.fromarray(f) for f in frames(64)]
+        imgs[0].save('clover.gif', save_all=True, append_images=imgs[1:],
+                     duration=20, loop=0)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+
+# HUB75 bitstream model.
+#
+# This generates the same LED_PANEL pin words that `led_driver` in
+# include/led-*.v produces, one clock (or one DDR half clock) at a time.
+# The panel is scanned as 32 row addresses of 64 columns, and the top
+# and bottom halves are shifted together:
+#
+#     y[0] = {1'b0, addr}
+#     y[1] = {1'b1, addr}
+#
+# Every row takes 66 clocks: S_SHIFT0, 62 × S_SHIFT, S_SHIFTN,
+# S_BLANK and S_UNBLANK.  The painter counter stalls for the same two
+# clocks (S_WAIT1, S_WAIT2), so a subframe is 32 × 66 = 2112 clocks.
+#
+# Only the steady state is modeled.  The FM6126 init sequence and the
+# startup delay are skipped.
+
+from collections import namedtuple
+import sys
+import time
+
+import numpy as np
+
+import gen_tables                       # tables/gen_tables.py
+
+
+ROWS = 32                       # row addresses
+COLS = 64                       # columns
+HEIGHT = 2 * ROWS               # panel height
+ROW_CLOCKS = COLS + 2           # S_SHIFT0 ... S_UNBLANK
+CLOCK_HZ = 30_000_000           # pll_clk30
+
+# State index within a row, counting S_SHIFT0 as 0.
+S_SHIFT0 = 0
+S_SHIFTN = COLS - 1
+S_BLANK = COLS
+S_UNBLANK = COLS + 1
+
+# LED_PANEL bit positions.  See the P1A/P1B assignments in led_driver.
+RGB0_SHIFT = 0                  # P1A1, P1A2, P1A3
+RGB1_SHIFT = 4                  # P1A7, P1A8, P1A9
+ADDR_LO_SHIFT = 8               # P1B1..P1B4 = addr[3:0]
+BLANK_BIT = 12                  # P1B7
+LATCH_BIT = 13                  # P1B8
+SCLK_BIT = 14                   # P1B9
+ADDR_HI_BIT = 15                # P1B10 = addr[4]
+
+
+Variant = namedtuple('Variant', 'name subframes gamma_bits source')
+
+VARIANTS = {
+    'pwm':       Variant('pwm',       255, None, 'include/led-pwm.v'),
+    'pwm-gamma': Variant('pwm-gamma', 255, 8,    'include/led-pwm-gamma.v'),
+    'bcm':       Variant('bcm',       255, 8,    None),
+    'pdm':       Variant('pdm',       256, 10,   'include/led-pdm-gamma.v'),
+    'delay':     Variant('delay',     256, None, 'include/led-delay.v'),
+}
+
+
+def gamma_table(gamma=2.2, domain_bits=8, range_bits=16, zero_adjust=False):
+    """The table the gamma drivers load (see tables/gen_tables.py)."""
+    return gen_tables.gamma(gamma, domain_bits, range_bits, zero_adjust)
+
+
+def bit_reverse8(n):
+    n = np.asarray(n, dtype=np.uint16)
+    r = np.zeros_like(n)
+    for i in range(8):
+        r |= ((n >> i) & 1) << (7 - i)
+    return r
+
+
+def bcm_plane(subframe):
+    """Bit plane shown in a BCM subframe.
+
+       There is no led-bcm.v in the tree, so this is the usual scheme
+       fitted to the existing row timing: of the 255 uniform subframes,
+       bit b is shown in 2**b of them, interleaved the same way `pwm`
+       bit-reverses its compare value.
+    """
+    s = np.asarray(subframe, dtype=np.int64) + 1
+    ctz = np.zeros_like(s)
+    for i in range(8):
+        ctz += ((s & ((1 << (i + 1)) - 1)) == 0)
+    return 7 - ctz
+
+
+def split_halves(frame):
+    """(64, 64, 3) RGB frame -> (2, 32, 64, 3): [half, addr, x, rgb]."""
+    frame = np.asarray(frame)
+    assert frame.shape == (HEIGHT, COLS, 3), frame.shape
+    return frame.reshape(2, ROWS, COLS, 3)
+
+
+class Modulator:
+    """Turn 24 bit frames into 1 bit per channel subframes.
+
+       `bits(frame)` returns a bool array shaped
+       (subframes, 2, ROWS, COLS, 3).  PDM keeps its error state across
+       frames, like the SPRAM does.
+    """
+
+    def __init__(self, variant='pdm'):
+        self.variant = VARIANTS[variant]
+        v = self.variant
+        if v.gamma_bits is None:
+            self.gamma = np.arange(256)
+        else:
+            self.gamma = gamma_table(domain_bits=8,
+                                     range_bits=v.gamma_bits,
+                                     zero_adjust=True)
+        sf = np.arange(v.subframes)
+        self.pwm_cmp = bit_reverse8(sf).astype(np.int64)
+        self.bcm_plane = bcm_plane(sf)
+        self.pdm_err = np.zeros((2, ROWS, COLS, 3), dtype=np.int64)
+
+    @property
+    def subframes(self):
+        return self.variant.subframes
+
+    def bits(self, frame):
+        level = self.gamma[split_halves(frame)]
+        name = self.variant.name
+        if name in ('pwm', 'pwm-gamma'):
+            cmp = self.pwm_cmp[:, None, None, None, None]
+            return level[None] > cmp
+        if name == 'delay':
+            # One bit per channel; the painter's bit is shown as is.
+            return np.broadcast_to(level[None] >= 128,
+                                   (self.subframes, ) + level.shape)
+        if name == 'bcm':
+            plane = self.bcm_plane[:, None, None, None, None]
+            return (level[None] >> plane) & 1 == 1
+        return self._pdm_bits(level)
+
+    def _pdm_bits(self, x):
+        # pdm_calc, one subframe at a time.  The error state is per
+        # pixel, so each step is vectorized over the whole panel.
+        out = np.empty((self.subframes, ) + x.shape, dtype=bool)
+        err = self.pdm_err
+        for s in range(self.subframes):
+            y = x > err
+            err = np.where(y, 1023 - (x - err), err - x)
+            out[s] = y
+        self.pdm_err = err
+        return out
+
+
+def pack_rgb3(bits):
+    """(..., 3) bools -> 3 bit ints, red in bit 0."""
+    b = bits.astype(np.uint16)
+    return b[..., 0] | b[..., 1] << 1 | b[..., 2] << 2
+
+
+def _row_template(ddr):
+    """Control pins for one row, indexed [state, phase].
+
+       The DDR pins (BLANK, LATCH, SCLK) drive data[0] in the first half
+       of the clock and data[1] in the second half.  Without `ddr`, only
+       the second half is kept, which is the value in force at the next
+       rising edge.
+    """
+    blank = np.zeros((ROW_CLOCKS, 2), dtype=np.uint16)
+    latch = np.zeros((ROW_CLOCKS, 2), dtype=np.uint16)
+    sclk = np.zeros((ROW_CLOCKS, 2), dtype=np.uint16)
+    sclk[S_SHIFT0:S_BLANK] = (0, 1)         # 2'b10
+    blank[S_SHIFTN] = (1, 0)                # blank | 2'b01
+    blank[S_BLANK] = (1, 1)                 # 2'b11
+    latch[S_BLANK] = (1, 1)                 # 2'b11
+    blank[S_UNBLANK] = (0, 1)               # 2'b10
+    word = blank << BLANK_BIT | latch << LATCH_BIT | sclk << SCLK_BIT
+    return word if ddr else word[:, 1:]
+
+
+def address_word(addr):
+    addr = np.asarray(addr, dtype=np.uint16)
+    return ((addr & 0xF) << ADDR_LO_SHIFT) | ((addr >> 4) << ADDR_HI_BIT)
+
+
+def pin_words(subframe_bits, ddr=True):
+    """Pin words for a block of subframes.
+
+       `subframe_bits` is shaped (subframes, 2, ROWS, COLS, 3).  Returns
+       uint16 words shaped (subframes, ROWS, ROW_CLOCKS, phases), where
+       phases is 2 with `ddr` and 1 without.
+    """
+    n = subframe_bits.shape[0]
+    rgb = pack_rgb3(subframe_bits)              # (n, 2, ROWS, COLS)
+    data = rgb[:, 0] << RGB0_SHIFT | rgb[:, 1] << RGB1_SHIFT
+
+    # led_rgb holds its last value through S_BLANK and S_UNBLANK.
+    shifted = np.empty((n, ROWS, ROW_CLOCKS), dtype=np.uint16)
+    shifted[..., :COLS] = data
+    shifted[..., COLS:] = data[..., -1:]
+
+    # led_addr changes at S_UNBLANK, so the shift states of row r still
+    # show address r - 1 (which wraps across subframes).
+    rows = np.arange(ROWS)
+    addr = np.empty((ROWS, ROW_CLOCKS), dtype=np.uint16)
+    addr[:, :S_UNBLANK] = address_word((rows - 1) % ROWS)[:, None]
+    addr[:, S_UNBLANK] = address_word(rows)
+
+    words = (shifted | addr)[..., None] | _row_template(ddr)
+    return words
+
+
+def stream(frames, variant='pdm', ddr=True, modulator=None):
+    """Yield a flat uint16 pin-word array for each frame."""
+    mod = modulator or Modulator(variant)
+    for frame in frames:
+        yield pin_words(mod.bits(frame), ddr=ddr).reshape(-1)
+
+
+def clocks_per_frame(variant='pdm'):
+    return VARIANTS[variant].subframes * ROWS * ROW_CLOCKS
+
+
+def bandwidth(variant='pdm', clock_hz=CLOCK_HZ):
+    """RGB data bandwidth and refresh rate, measured from the stream."""
+    words = pin_words(np.zeros((1, 2, ROWS, COLS, 3), dtype=bool),
+                      ddr=False)
+    sclk_edges = int(np.count_nonzero(words & (1 << SCLK_BIT)))
+    bits_per_subframe = sclk_edges * 6          # two RGB triples
+    subframe_hz = clock_hz / words.size
+    Bandwidth = namedtuple('Bandwidth',
+                           'bits_per_second subframe_hz frame_hz')
+    return Bandwidth(bits_per_subframe * subframe_hz,
+                     subframe_hz,
+                     subframe_hz / VARIANTS[variant].subframes)
+
+
+def decode(words):
+    """Reassemble panel bit planes from a pin-word stream.
+
+       Samples RGB on each rising SCLK edge and commits a row on each
+       LATCH, using the address shown when LATCH drops.  Returns bools
+       shaped (rows_latched, 2, COLS, 3) and the row addresses.  Handy
+       for checking a testbench dump against `pin_words`.  SCLK only
+       has edges inside a row in the DDR (half clock) stream.
+    """
+    words = np.asarray(words, dtype=np.uint16).reshape(-1)
+    sclk = (words >> SCLK_BIT) & 1
+    rise = np.flatnonzero((sclk[1:] == 1) & (sclk[:-1] == 0)) + 1
+    if sclk[0]:
+        rise = np.concatenate(([0], rise))
+    latch = (words >> LATCH_BIT) & 1
+    latches = np.flatnonzero((latch[1:] == 1) & (latch[:-1] == 0)) + 1
+    # Each latch commits the COLS most recent rising edges.
+    idx = np.searchsorted(rise, latches) - COLS
+    ok = idx >= 0
+    latches, idx = latches[ok], idx[ok]
+    samples = words[rise[idx[:, None] + np.arange(COLS)]]
+    rgb0 = (samples >> RGB0_SHIFT) & 7
+    rgb1 = (samples >> RGB1_SHIFT) & 7
+    rgb = np.stack((rgb0, rgb1), axis=1)[..., None] >> np.arange(3) & 1
+    falls = np.flatnonzero((latch[1:] == 0) & (latch[:-1] == 1)) + 1
+    after = falls[np.minimum(np.searchsorted(falls, latches),
+                             falls.size - 1)]
+    addr = ((words[after] >> ADDR_LO_SHIFT) & 0xF |
+            ((words[after] >> ADDR_HI_BIT) & 1) << 4)
+    return rgb.astype(bool), addr
+
+
+def test_frames(count):
+    y, x = np.mgrid[:HEIGHT, :COLS]
+    for f in range(count):
+        r = (x * 4 + f) & 0xFF
+        g = (y * 4) & 0xFF
+        b = ((x ^ y) * 4 + f) & 0xFF
+        yield np.stack((r, g, b), axis=-1).astype(np.uint8)
+
+
+def benchmark(variant, frame_count=4):
+    t0 = time.perf_counter()
+    clocks = 0
+    for words in stream(test_frames(frame_count), variant):
+        clocks += words.size // 2
+    dt = time.perf_counter() - t0
+    bw = bandwidth(variant)
+    print('{:9}: {:6.2f} Mclock/s  {:6.1f} Mbit/s  {:5.1f} Hz frame'
+          .format(variant, clocks / dt / 1e6,
+                  bw.bits_per_second / 1e6, bw.frame_hz))
+
+
+if __name__ == '__main__':
+    variants = sys.argv[1:] or list(VARIANTS)
+    for v in variants:
+        benchmark(v)
@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+
+# Golden frames for the demos' painters.
+#
+# Each model here is a transliteration of a demo's `painter24` (or
+# `painter`, for the 1 bit led-delay.v demos), written against NumPy
+# arrays instead of wires.  The inputs are the clock-by-clock values of
+# `led_main`'s painter_counter, including the two stall clocks at the
+# end of every row, and every `always @(posedge clk)` becomes a `reg()`
+# along the time axis.  That keeps any pipeline skew the Verilog has;
+# stripe-shift, for one, mixes values from different clocks.
+#
+# The LED driver samples column k DELAY clocks after the painter last
+# saw x == k, and `golden_frames` samples the model the same way.
+# Arrays are shaped (frames, 2, clocks), where axis 1 is the panel half
+# (y[0] = {0, addr}, y[1] = {1, addr}).
+
+from collections import namedtuple
+import sys
+import time
+
+import numpy as np
+
+from hub75 import ROWS, COLS, ROW_CLOCKS
+
+
+SUBFRAME_CLOCKS = ROWS * ROW_CLOCKS
+PAD = 16                        # history clocks before each subframe
+
+
+def reg(a, n=1):
+    """Delay `a` by `n` clocks.  Registers start at zero, like reset."""
+    a = np.asarray(a)
+    out = np.zeros_like(a)
+    out[..., n:] = a[..., :-n]
+    return out
+
+
+def bits(a, lsb, width):
+    """a[lsb +: width]"""
+    return (a >> lsb) & ((1 << width) - 1)
+
+
+Counter = namedtuple('Counter', 'frame subframe addr x y')
+
+
+def counter_stream(frames, subframe=0, subframes=255, frame_bits=10,
+                   delay=1):
+    """painter_counter for one subframe of each frame, clock by clock.
+
+       Each row shows x = 0 for three clocks (S_COUNT, S_WAIT1, S_WAIT2)
+       and x = 1..63 for one clock each.  PAD clocks of the previous
+       subframe come first, and `delay` clocks of the next one last.
+    """
+    f = np.asarray(frames, dtype=np.int64)[:, None]
+    c = np.arange(-PAD, SUBFRAME_CLOCKS + delay)[None, :]
+    linear = (f * subframes + subframe) * SUBFRAME_CLOCKS + c
+    sub_linear, clock = np.divmod(linear, SUBFRAME_CLOCKS)
+    frame, sub = np.divmod(sub_linear, subframes)
+    addr, j = np.divmod(clock, ROW_CLOCKS)
+    x = np.maximum(j - 2, 0)
+    frame &= (1 << frame_bits) - 1
+    half = np.arange(2)[None, :, None]
+    return Counter(frame=frame[:, None],
+                   subframe=sub[:, None],
+                   addr=addr[:, None],
+                   x=x[:, None],
+                   y=half << 5 | addr[:, None])
+
+
+def sample_index(delay):
+    """Stream index that the LED driver latches for each [addr, x]."""
+    addr = np.arange(ROWS)[:, None]
+    x = np.arange(COLS)[None, :]
+    return PAD + addr * ROW_CLOCKS + x + 2 + delay
+
+
+# The painters.  Each takes a Counter and returns (red, green, blue)
+# as the 8 bit values on its output port.
+
+def lerp(a, b, t):
+    """munch1's three stage lerp module.  Divides by 256, not 255."""
+    a0, b0 = reg(t), reg(255 - t)
+    p0, p1 = reg(a0 * a), reg(b0 * b)
+    m_r = reg(bits(p0 + p1, 0, 16))
+    return bits(m_r, 8, 8)
+
+
+def munch1(c):
+    xo = bits(c.x ^ c.y ^ bits(c.frame, 1, 6), 0, 6)
+    index = bits(xo << 2 | bits(xo, 4, 2), 0, 8)
+    c0, c1 = 0x360033, 0x0b8793
+    red = lerp(bits(c0, 16, 8), bits(c1, 16, 8), index)
+    grn = lerp(bits(c0, 8, 8), bits(c1, 8, 8), index)
+    blu = lerp(bits(c0, 0, 8), bits(c1, 0, 8), index)
+    return red, grn, blu
+
+
+RSTEPS = (0, 1, 2, 3, 4, 5, 6, 7)
+GSTEPS = (0, 2, 4, 8, 10, 12, 14, 16)
+BSTEPS = (0, 4, 8, 12, 16, 20, 24, 28)
+
+
+def _munch_indices(frame):
+    rindex = bits(bits(frame, 2, 7) - bits(frame, 10, 2), 0, 8)
+    gindex = bits(bits(frame, 1, 7) - bits(frame, 9, 3), 0, 8)
+    bindex = bits(bits(frame, 0, 7) - bits(frame, 8, 4), 0, 8)
+    return rindex, gindex, bindex
+
+
+def _munch_stripes(xy, rindex, gindex, bindex):
+    # `rindex - 1` is a 32 bit expression, so nothing wraps.
+    red = sum((xy == rindex - k).astype(np.int64) << (7 - i)
+              for (i, k) in enumerate(RSTEPS))
+    grn = sum((xy == gindex - k).astype(np.int64) << i
+              for (i, k) in enumerate(GSTEPS))
+    blu = sum((xy == bindex - k).astype(np.int64) << (7 - i)
+              for (i, k) in enumerate(BSTEPS))
+    return red, grn, blu
+
+
+def munch2(c):
+    stripes = _munch_stripes(c.x ^ c.y, *_munch_indices(c.frame))
+    return tuple(reg(s) for s in stripes)
+
+
+def munch3(c):
+    indices = (reg(i) for i in _munch_indices(c.frame))
+    red, grn, blu = (reg(s) for s in _munch_stripes(c.x ^ c.y, *indices))
+    wx = bits(c.x + bits(c.frame, 0, 6), 0, 6)
+    wy = bits(c.y + bits(c.frame, 2, 6), 0, 6)
+    wmunch1 = (wx ^ bits(c.frame, 3, 4)) == wy
+    in_window = reg(bits(~(wx | wy), 4, 1)) == 1
+    wmunch8 = reg(wmunch1.astype(np.int64))
+    return (np.where(in_window, wmunch8, red),
+            np.where(in_window, 0, grn),
+            np.where(in_window, wmunch8, blu))
+
+
+def _swizzle(v):
+    """{v[3], v[2], v[1], v[0], v[4], v[5], v[6], v[7]}"""
+    return (bits(v, 0, 4) << 4) | sum(bits(v, 4 + i, 1) << (3 - i)
+                                      for i in range(4))
+
+
+def munch_gamma(c):
+    x, y = c.x, c.y
+    clip = (x < 16) | (x > 48) | (y < 16) | (y > 48)
+    f = bits(c.frame, 2, 6)
+    xor = bits(x + y, 0, 8) ^ bits(x - y, 0, 8)
+    red = reg(np.where(~clip, bits(xor + f, 0, 8), 0))
+    green = reg(np.where(clip, bits((x ^ y) + f, 0, 8), 0))
+    blue = (bits(red, 5, 1) << 7 | bits(green, 5, 1) << 6 |
+            bits(red, 4, 1) << 5 | bits(green, 4, 1) << 4 |
+            bits(green, 5, 1) << 3 | bits(green, 4, 1) << 2)
+    return _swizzle(red), _swizzle(green), blue
+
+
+def _pwm_square(v, width):
+    """(6'd32 - v) * (6'd32 - v) in a `width` bit context."""
+    d = bits(32 - v, 0, width)
+    return bits(d * d, 0, width)
+
+
+def circle(c):
+    x, y = c.x, c.y
+    x2, y2 = reg(_pwm_square(x, 11)), reg(_pwm_square(y, 11))
+    on_border = reg(reg((x == 0) | (x == 63) | (y == 0) | (y == 63)))
+    r2 = reg(bits(x2 + y2, 0, 11))
+    on_circle = (256 <= r2) & (r2 < 289)
+    return on_border * 255, on_circle * 255, np.zeros_like(r2)
+
+
+SQRT_TABLE = np.floor(np.sqrt(np.arange(2048))).astype(np.int64)
+
+
+def circle_tunnel(c):
+    x2, y2 = reg(_pwm_square(c.x, 12)), reg(_pwm_square(c.y, 12))
+    r2 = reg(bits(x2 + y2, 0, 12))
+    # r2 reaches 2048 at (0, 0), past the end of the table.  The
+    # simulator reads X there; call it 0.
+    r = reg(bits(np.where(r2 < 2048, SQRT_TABLE[np.minimum(r2, 2047)], 0),
+                 0, 6))
+    color = bits(r - bits(c.frame, 2, 5), 0, 5)
+    red = color == 31
+    blue = bits(color, 0, 2) == 3
+    return red * 255, np.zeros_like(color), blue * 255
+
+
+# stripe-shift's hue wheel: for each eighth of the wheel, which
+# channels are solid and which one carries the gradient.
+SCHAN = np.array([0b000, 0b001, 0b010, 0b010, 0b110, 0b101, 0b100, 0b000])
+GCHAN = np.array([0b001, 0b010, 0b001, 0b100, 0b001, 0b010, 0b001, 0b100])
+GFLIP = np.array([0, 0, 1, 0, 0, 1, 1, 1])
+
+
+def _compose(schan, gchan, solid, grad, enable=True):
+    return tuple(np.where(enable,
+                          np.where(bits(gchan, i, 1) == 1, grad,
+                                   np.where(bits(schan, i, 1) == 1,
+                                            solid, 0)),
+                          0)
+                 for i in range(3))
+
+
+def _expand5(v):
+    """{v[4:0], v[4:2]}"""
+    return v << 3 | bits(v, 2, 3)
+
+
+def stripe_shift(c):
+    x, y, f = c.x, c.y, c.frame
+    hue1 = reg(bits(bits(f, 2, 8) - bits(x, 1, 5), 0, 8))
+    yy1 = reg(bits(y + bits(f, 0, 6) + x, 0, 6))
+    hue = reg(hue1)
+    dim = reg(np.where(bits(yy1, 5, 1) == 1, 31 - bits(yy1, 0, 5),
+                       bits(yy1, 0, 5)))
+    # The next stage reads `hue` but this clock's x: the skew is real.
+    eighth = bits(hue, 5, 3)
+    h = bits(hue, 0, 5)
+    in_stripe = reg(bits(x, 0, 3) != bits(f, 0, 3))
+    sdist = 31
+    schan = reg(SCHAN[eighth])
+    gchan = reg(GCHAN[eighth])
+    gdist = reg(np.where(GFLIP[eighth] == 1, 31 - h, h))
+    ssdist = np.where(sdist < dim, 0, sdist - dim)
+    ggdist = np.where(gdist < dim, 0, gdist - dim)
+    return tuple(reg(ch) for ch in _compose(schan, gchan,
+                                            _expand5(ssdist),
+                                            _expand5(ggdist),
+                                            in_stripe))
+
+
+def octants(c):
+    x, y = c.x, c.y
+    x5, y5 = bits(x, 5, 1) == 1, bits(y, 5, 1) == 1
+    xl, yl = bits(x, 0, 5), bits(y, 0, 5)
+    gt = x > y
+    # (schan, gchan, sdist, gdist) for each octant, as in the Verilog.
+    nnw = (0b000, 0b001, 31 - y, x - y)
+    wnw = (0b000, 0b100, 31 - x, y - x)
+    nne = (0b001, 0b010, 31 - y, xl)
+    ene = (0b011, 0b001, xl, 31 - y)
+    ese = (0b010, 0b100, xl, yl)
+    sse = (0b110, 0b001, yl, y - x)
+    ssw = (0b101, 0b010, yl, x + y)
+    wsw = (0b100, 0b001, 31 - x, yl)
+    north_w = [np.where(gt, a, b) for (a, b) in zip(nnw, wnw)]
+    north_e = [np.where(63 - x > y, a, b) for (a, b) in zip(nne, ene)]
+    south_e = [np.where(gt, a, b) for (a, b) in zip(ese, sse)]
+    south_w = [np.where(x > 63 - y, a, b) for (a, b) in zip(ssw, wsw)]
+    north = [np.where(x5, e, w) for (w, e) in zip(north_w, north_e)]
+    south = [np.where(x5, e, w) for (w, e) in zip(south_w, south_e)]
+    schan, gchan, sdist, gdist = (reg(bits(np.where(y5, s, n), 0, 5))
+                                  for (n, s) in zip(north, south))
+    return _compose(schan, gchan, _expand5(sdist), _expand5(gdist))
+
+
+Demo = namedtuple('Demo', 'painter delay frame_bits subframes driver')
+
+DEMOS = {
+    'munch1':        Demo(munch1,        3, 12, 255, 'pwm-gamma'),
+    'munch2':        Demo(munch2,        1, 12, 255, 'pwm-gamma'),
+    'munch3':        Demo(munch3,        1, 12, 255, 'pwm-gamma'),
+    'munch-gamma':   Demo(munch_gamma,   1,  8, 255, 'pwm-gamma'),
+    'circle':        Demo(circle,        2, 10, 256, 'delay'),
+    'circle-tunnel': Demo(circle_tunnel, 3,  7, 256, 'delay'),
+    'stripe-shift':  Demo(stripe_shift,  3, 16, 255, 'pwm-gamma'),
+    'octants':       Demo(octants,       1, 12, 255, 'pwm-gamma'),
+}
+
+
+def golden_frames(name, frames, subframe=0, chunk=256):
+    """RGB frames, shaped (len(frames), 64, 64, 3), as the driver sees
+       them in the given subframe.
+    """
+    demo = DEMOS[name]
+    frames = np.asarray(frames, dtype=np.int64).reshape(-1)
+    out = np.empty((frames.size, 2 * ROWS, COLS, 3), dtype=np.uint8)
+    idx = sample_index(demo.delay)
+    for i in range(0, frames.size, chunk):
+        c = counter_stream(frames[i:i + chunk], subframe, demo.subframes,
+                           demo.frame_bits, demo.delay)
+        rgb = np.stack(np.broadcast_arrays(*demo.painter(c)), axis=-1)
+        # (n, 2, clocks, 3) -> (n, 2, ROWS, COLS, 3) -> (n, 64, 64, 3)
+        px = rgb[:, :, idx]
+        out[i:i + chunk] = px.reshape(-1, 2 * ROWS, COLS, 3)
+    return out
+
+
+def benchmark(names, count=512):
+    for name in names:
+        t0 = time.perf_counter()
+        golden_frames(name, range(count))
+        dt = time.perf_counter() - t0
+        print('{:14} {:8.0f} frames/s'.format(name, count / dt))
+
+
+if __name__ == '__main__':
+    if '-i' in sys.argv:
+        import PIL.Image
+        for name in DEMOS:
+            frames = golden_frames(name, range(0, 256, 4))
+            imgs = [PIL.Image.fromarray(f) for f in frames]
+            imgs[0].save('{}.gif'.format(name), save_all=True,
+                         append_images=imgs[1:], duration=40, loop=0)
+    else:
+        benchmark([a for a in sys.argv[1:] if a in DEMOS] or list(DEMOS))
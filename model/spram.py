@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+
+# SPRAM access schedule model.
+#
+# The PDM driver (`pdm` in include/led-pdm-gamma.v) keeps every pixel's
+# PDM error in SPRAM.  Each LED clock (clk30) shifts one pixel pair, top
+# and bottom half, so the pair's error word has to be read and written
+# back once per clk30.  The SPRAMs are single ported, so they run at
+# clk60: two accesses per LED clock, one read, one write.  NOTES.md has
+# the two plans, 2018-11-19 (which didn't work) and 2018-11-21.
+#
+# A Schedule says, for one pixel pair, which clk60 clock after the
+# pair's first clk60 clock each access happens on, and to which SPRAMs.
+# Around it is the clk30 pipeline the HDL has: `pdm_err_in` captures
+# SPRAM.dataout at the start of the pair's next clk30 clock, and
+# `pdm_calc` registers err_out one clk30 clock after that.  Every
+# access of every pair of a run of subframes is laid out at once, as
+# arrays, and checked:
+#
+#   conflict  two accesses to one SPRAM on the same clock
+#   capture   dataout doesn't hold the pair's word at the clk30 edge
+#             that captures it.  It is valid from the clock after the
+#             read until the SPRAM's next access.
+#   write     datain isn't the pair's err_out on the write's clock
+#   order     a read doesn't see what the last subframe wrote there
+#
+# `skew` moves the clk30 edges one clk60 clock later, which is what
+# happens if the fast domain locks onto the wrong phase of clk30.
+#
+#     $ spram.py [-s subframes] [schedule ...]
+#
+# prints, for each schedule, the latencies, what fails, and the bits
+# per pixel it stores and the refresh rate it runs at.
+
+import argparse
+from collections import namedtuple
+import sys
+
+import numpy as np
+
+from hub75 import ROWS, COLS, ROW_CLOCKS, CLOCK_HZ, VARIANTS
+
+
+SPRAMS = 4                      # SB_SPRAM256KA blocks in the UP5K
+SPRAM_BITS = 16
+SPRAM_WORDS = 16384
+READ_LATENCY = 1                # dataout is valid the clock after a read
+PAIR_PIXELS = 2                 # top and bottom half share a word
+ERROR_BITS = 3 * 10             # 10-bit error per color, per pixel
+
+ALL = tuple(range(SPRAMS))
+
+Slot = namedtuple('Slot', 'op offset word sprams')
+
+# ratio:    clk60 clocks per LED clock
+# latch:    dataout is registered in the fast domain the clock it is
+#           valid, and held until the same slot's next read, so more
+#           than one word can be read through the same SPRAMs
+# capture:  LED clocks from the pair's to the one err_in is captured at
+# ready:    LED clocks from the pair's to the one err_out is valid in
+Schedule = namedtuple('Schedule',
+                      'name slots ratio latch capture ready note')
+
+SCHEDULES = {s.name: s for s in (
+    Schedule('2018-11-19',
+             (Slot('R', 0, 0, ALL), Slot('W', 3, 0, ALL)),
+             2, False, 1, 2,
+             'write three clocks after the read'),
+    Schedule('2018-11-21',
+             (Slot('R', 0, 0, ALL), Slot('W', 5, 0, ALL)),
+             2, False, 1, 2,
+             'write five clocks after the read'),
+    Schedule('64bpp',
+             (Slot('R', 0, 0, ALL), Slot('R', 1, 1, ALL),
+              Slot('W', 4, 0, ALL), Slot('W', 5, 1, ALL)),
+             2, True, 1, 2,
+             'two words a pair at clk30'),
+    Schedule('64bpp-15MHz',
+             (Slot('R', 0, 0, ALL), Slot('R', 1, 1, ALL),
+              Slot('W', 10, 0, ALL), Slot('W', 11, 1, ALL)),
+             4, True, 1, 2,
+             'two words a pair, LED clock halved'),
+)}
+
+CHECKS = ('conflict', 'capture', 'write', 'order')
+
+Result = namedtuple('Result', 'failures first latency margin')
+
+
+def pair_clocks(subframes):
+    """The LED clock each pixel pair shifts on, and its address, for
+       `subframes` subframes: (subframe, address, clock) arrays.
+    """
+    s, row, x = np.indices((subframes, ROWS, COLS)).reshape(3, -1)
+    clock = (s * ROWS + row) * ROW_CLOCKS + x
+    return s, row * COLS + x, clock
+
+
+def accesses(schedule, subframes):
+    """Every SPRAM access, one per SPRAM per slot per pair, sorted by
+       SPRAM and clock.  A dict of arrays: op (true for writes), sram,
+       clock, addr, subframe and pair (an index into pair_clocks).
+    """
+    s, addr, clock = pair_clocks(subframes)
+    words = 1 + max(slot.word for slot in schedule.slots)
+    cols = []
+    for slot in schedule.slots:
+        for sram in slot.sprams:
+            n = len(clock)
+            cols.append((np.full(n, slot.op == 'W'),
+                         np.full(n, sram),
+                         clock * schedule.ratio + slot.offset,
+                         addr * words + slot.word,
+                         s,
+                         np.arange(n)))
+    names = ('op', 'sram', 'clock', 'addr', 'subframe', 'pair')
+    a = {k: np.concatenate([c[j] for c in cols])
+         for (j, k) in enumerate(names)}
+    order = np.lexsort((a['clock'], a['sram']))
+    return {k: v[order] for (k, v) in a.items()}
+
+
+def check(schedule, subframes=2, skew=0):
+    """Lay out `subframes` subframes of `schedule` and check them.
+       Returns failures per check, the first clk60 clock each failed
+       at, the latencies, and the margins, in clk60 clocks.
+    """
+    ratio = schedule.ratio
+    a = accesses(schedule, subframes)
+    _, _, pair_clock = pair_clocks(subframes)
+    words = 1 + max(slot.word for slot in schedule.slots)
+    assert SPRAM_WORDS >= ROWS * COLS * words
+    failures = {}
+    first = {}
+
+    def fail(name, bad, clocks):
+        failures[name] = int(bad.sum())
+        first[name] = int(clocks[bad].min()) if bad.any() else None
+
+    same = a['sram'][1:] == a['sram'][:-1]
+    fail('conflict', np.r_[same & (a['clock'][1:] == a['clock'][:-1]),
+                           False],
+         a['clock'])
+
+    # An access's dataout lasts until the same SPRAM's next access.
+    last = np.r_[np.where(same, a['clock'][1:], np.iinfo(np.int64).max),
+                 np.iinfo(np.int64).max]
+    base = pair_clock[a['pair']] * ratio + skew     # the pair's clk30 edge
+    reads = ~a['op']
+    valid_from = a['clock'] + READ_LATENCY
+    valid_to = last
+    if schedule.latch:
+        valid_from = valid_from + 1
+        valid_to = valid_from + ratio - 1
+    # The edge that starts a clock samples the clock before it.
+    sampled = base + schedule.capture * ratio - 1
+    fail('capture', reads & ((sampled < valid_from) | (sampled > valid_to)),
+         a['clock'])
+
+    writes = a['op']
+    ready = base + schedule.ready * ratio
+    fail('write', writes & ((a['clock'] < ready) |
+                            (a['clock'] >= ready + ratio)),
+         a['clock'])
+
+    # By address: each read should follow last subframe's write.
+    o = np.lexsort((a['clock'], a['addr'], a['sram']))
+    op, addr, sram, sub = (a[k][o] for k in ('op', 'addr', 'sram',
+                                             'subframe'))
+    prev_ok = np.r_[False, (sram[1:] == sram[:-1]) & (addr[1:] == addr[:-1])
+                    & op[:-1] & (sub[:-1] == sub[1:] - 1)]
+    # The first subframe reads what reset cleared.
+    fail('order', ~op & ~prev_ok & (sub > 0), a['clock'][o])
+
+    rd = {s.word: s.offset for s in schedule.slots if s.op == 'R'}
+    wr = {s.word: s.offset for s in schedule.slots if s.op == 'W'}
+    latency = {
+        'read to write': max(wr[w] - rd[w] for w in rd),
+        'read to capture': (schedule.capture * ratio + skew -
+                            max(rd.values())),
+        'read to LED': (schedule.ready * ratio + skew - min(rd.values())),
+    }
+    # Clocks to spare on the tighter side of each window.
+    margin = {
+        'capture': int(np.minimum(sampled - valid_from,
+                                  valid_to - sampled)[reads].min()),
+        'write': int(np.minimum(a['clock'] - ready,
+                                ready + ratio - 1 - a['clock'])[writes].min()),
+    }
+    return Result(failures, first, latency, margin)
+
+
+def bits_per_pixel(schedule):
+    words = 1 + max(slot.word for slot in schedule.slots)
+    sprams = len(set(s for slot in schedule.slots for s in slot.sprams))
+    return words * sprams * SPRAM_BITS // PAIR_PIXELS
+
+
+def refresh_hz(schedule):
+    led_hz = 2 * CLOCK_HZ / schedule.ratio
+    return led_hz / (VARIANTS['pdm'].subframes * ROWS * ROW_CLOCKS)
+
+
+def bandwidth_bpp(ratio):
+    """The most state bits per pixel any schedule can read and write
+       back at `ratio` clk60 clocks per LED clock.
+    """
+    return SPRAMS * SPRAM_BITS * ratio // 2 // PAIR_PIXELS
+
+
+def report(schedule, subframes):
+    print('{}: {}'.format(schedule.name, schedule.note))
+    print('  {} bits a pixel ({} used), {:.1f} Hz refresh; at most {} '
+          'bpp at {} clk60 clocks a pixel'.format(
+              bits_per_pixel(schedule), ERROR_BITS, refresh_hz(schedule),
+              bandwidth_bpp(schedule.ratio), schedule.ratio))
+    for skew in (0, 1):
+        r = check(schedule, subframes, skew)
+        bad = ['{} {} (first at {})'.format(k, r.failures[k], r.first[k])
+               for k in CHECKS if r.failures[k]]
+        print('  skew {}: {}'.format(skew, ', '.join(bad) or 'ok'))
+        print('          latency {}'.format(', '.join(
+            '{} {}'.format(k, v) for (k, v) in r.latency.items())))
+        print('          margin {}'.format(', '.join(
+            '{} {}'.format(k, v) for (k, v) in r.margin.items())))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description='Check SPRAM read/modify/write schedules.')
+    parser.add_argument('-s', '--subframes', type=int, default=4,
+                        help='subframes to lay out (a frame is {})'
+                             .format(VARIANTS['pdm'].subframes))
+    parser.add_argument('schedules', nargs='*', metavar='schedule',
+                        help='any of {} (default: all)'
+                             .format(', '.join(SCHEDULES)))
+    args = parser.parse_args(argv)
+    for name in args.schedules:
+        if name not in SCHEDULES:
+            parser.error('unknown schedule {!r}'.format(name))
+    for name in args.schedules or SCHEDULES:
+        report(SCHEDULES[name], args.subframes)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+
+# Streaming VCD reader and panel comparator.
+#
+# main.mk's %_tb.vcd and %_syntb.vcd targets dump whole simulations,
+# and a few full frames is gigabytes.  This reads a dump one line at a
+# time, keeps only the nets it was asked for, and decodes LED_PANEL
+# into latched panel rows as it goes.  Memory stays bounded no matter
+# how long the dump is.
+#
+# The rows can be compared against a model (see `model_rows`), and the
+# comparison stops at the first row that differs.
+#
+#     $ python vcd.py munch1_tb.vcd munch1
+#
+# compares a dump with the painters.py model of munch1, driven through
+# the matching hub75.py modulator.
+
+from collections import namedtuple
+import re
+import sys
+
+import numpy as np
+
+import hub75
+from hub75 import COLS, ROWS, SCLK_BIT, LATCH_BIT
+
+
+VAR_RE = re.compile(rb'\$var\s+\S+\s+(\d+)\s+(\S+)\s+(\S+)\s*(\[[^\]]*\])?')
+
+
+class Signal(namedtuple('Signal', 'name width lsb')):
+    """A VCD variable: hierarchical name, width, and its index if it
+       is one bit of a bus dumped bit by bit.
+    """
+
+
+def _select(defs, name):
+    """Find the VCD ids for `name`, topmost scope first.
+
+       Returns [(id, shift)] to assemble the value.  `name` matches the
+       end of a hierarchical name, and may be a whole bus (`LED_PANEL`)
+       or one bit (`LED_PANEL[3]`).
+    """
+    base, _, index = name.partition('[')
+    matches = {}
+    for (ident, sig) in defs.items():
+        if not ('.' + sig.name).endswith('.' + base):
+            continue
+        scope = sig.name[:-len(base)]
+        if index and sig.lsb != int(index.rstrip(']')):
+            continue
+        matches.setdefault(scope, []).append((ident, sig))
+    if not matches:
+        raise KeyError('no VCD signal matches {!r}'.format(name))
+    scope = min(matches, key=len)
+    parts = matches[scope]
+    if len(parts) == 1 and (index or parts[0][1].lsb is None):
+        return [(parts[0][0], 0)]
+    # A bus dumped as one var per bit.
+    return [(ident, sig.lsb) for (ident, sig) in parts]
+
+
+class Reader:
+    """Stream value changes for a few signals out of a VCD file.
+
+       `signals` are concatenated like a Verilog {a, b, ...}, first name
+       most significant.  `chunks()` yields (times, words) NumPy arrays,
+       one entry per timestamp at which any of them changed.  X and Z
+       read as 0.
+    """
+
+    def __init__(self, path, signals=('LED_PANEL', ), chunk_size=1 << 20):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.file = open(path, 'rb')
+        self.defs = self._read_header()
+        self.slots = {}             # id -> [(shift, width)]
+        width = 0
+        for name in reversed(signals):
+            parts = _select(self.defs, name)
+            w = 0
+            for (ident, shift) in parts:
+                sig = self.defs[ident]
+                self.slots.setdefault(ident, []).append(
+                    (width + shift, sig.width))
+                w = max(w, shift + sig.width)
+            width += w
+        self.width = width
+
+    def _read_header(self):
+        defs = {}
+        scope = []
+        for line in self.file:
+            tokens = line.split()
+            if not tokens:
+                continue
+            if tokens[0] == b'$scope':
+                scope.append(tokens[2].decode())
+            elif tokens[0] == b'$upscope':
+                scope.pop()
+            elif tokens[0] == b'$var':
+                m = VAR_RE.match(line.strip())
+                width, ident, ref, rng = m.groups()
+                lsb = None
+                if rng and b':' not in rng:
+                    lsb = int(rng[1:-1])
+                ref = ref.decode().lstrip('\\')
+                name = '.'.join(scope + [ref])
+                defs[ident] = Signal(name, int(width), lsb)
+            elif tokens[0] == b'$enddefinitions':
+                break
+        return defs
+
+    def chunks(self):
+        slots = self.slots
+        word = 0
+        time = 0
+        changed = False
+        times, words = [], []
+        for line in self.file:
+            c = line[:1]
+            if c == b'#':
+                if changed:
+                    times.append(time)
+                    words.append(word)
+                    changed = False
+                    if len(words) >= self.chunk_size:
+                        yield np.array(times), np.array(words, np.int64)
+                        times, words = [], []
+                time = int(line[1:])
+                continue
+            if c and c in b'01xzXZ':
+                value, ident = c, line[1:].strip()
+            elif c in (b'b', b'B'):
+                value, _, ident = line[1:].partition(b' ')
+                ident = ident.strip()
+            else:
+                continue                # $dumpvars, $end, reals, ...
+            if ident not in slots:
+                continue
+            v = int(value.translate(XZ_TO_0), 2)
+            for (shift, width) in slots[ident]:
+                mask = ((1 << width) - 1) << shift
+                word = (word & ~mask) | (v << shift)
+            changed = True
+        if changed:
+            times.append(time)
+            words.append(word)
+        if words:
+            yield np.array(times), np.array(words, np.int64)
+
+    def close(self):
+        self.file.close()
+
+
+XZ_TO_0 = bytes.maketrans(b'xzXZ', b'0000')
+
+
+Row = namedtuple('Row', 'time addr rgb')
+
+
+class RowDecoder:
+    """Turn LED_PANEL words into latched rows, a chunk at a time.
+
+       RGB is sampled on each rising SCLK edge.  A LATCH pulse commits
+       the 64 most recent samples, at the address shown when LATCH
+       drops.  Pulses that see SCLK edges, like the FM6126 init
+       sequence, are not rows and are skipped.
+    """
+
+    TAIL_LIMIT = 4096
+
+    def __init__(self):
+        self.tail_words = np.zeros(1, dtype=np.int64)
+        self.tail_times = np.zeros(1, dtype=np.int64)
+
+    def feed(self, times, words):
+        w = np.concatenate((self.tail_words, words))
+        t = np.concatenate((self.tail_times, times))
+        sclk = (w >> SCLK_BIT) & 1
+        latch = (w >> LATCH_BIT) & 1
+        rise = np.flatnonzero((sclk[1:] == 1) & (sclk[:-1] == 0)) + 1
+        lrise = np.flatnonzero((latch[1:] == 1) & (latch[:-1] == 0)) + 1
+        lfall = np.flatnonzero((latch[1:] == 0) & (latch[:-1] == 1)) + 1
+        # Pair each latch rise with the fall after it.
+        j = np.searchsorted(lfall, lrise)
+        done = j < lfall.size
+        lrise, lfall = lrise[done], lfall[j[done]]
+        before = np.searchsorted(rise, lrise)
+        during = np.searchsorted(rise, lfall) - before
+        ok = (during == 0) & (before >= COLS)
+        rows = []
+        if ok.any():
+            first = before[ok] - COLS
+            samples = w[rise[first[:, None] + np.arange(COLS)]]
+            rgb = np.stack(((samples >> hub75.RGB0_SHIFT) & 7,
+                            (samples >> hub75.RGB1_SHIFT) & 7), axis=1)
+            rgb = (rgb[..., None] >> np.arange(3)) & 1 == 1
+            end = w[lfall[ok]]
+            addr = (((end >> hub75.ADDR_LO_SHIFT) & 0xF) |
+                    ((end >> hub75.ADDR_HI_BIT) & 1) << 4)
+            rows = [Row(int(tt), int(a), r)
+                    for (tt, a, r) in zip(t[lfall[ok]], addr, rgb)]
+        # Keep everything from the last complete pulse on.
+        start = lfall[-1] if lfall.size else 0
+        start = max(start, w.size - self.TAIL_LIMIT)
+        self.tail_words = w[start:]
+        self.tail_times = t[start:]
+        return rows
+
+
+def panel_rows(path, signals=('LED_PANEL', ), chunk_size=1 << 20):
+    """Yield every latched row in a VCD dump."""
+    reader = Reader(path, signals, chunk_size)
+    decoder = RowDecoder()
+    try:
+        for (times, words) in reader.chunks():
+            yield from decoder.feed(times, words)
+    finally:
+        reader.close()
+
+
+def panel_subframes(rows):
+    """Group rows into whole subframes, (2, ROWS, COLS, 3) bools."""
+    buf = np.zeros((2, ROWS, COLS, 3), dtype=bool)
+    for row in rows:
+        buf[:, row.addr] = row.rgb
+        if row.addr == ROWS - 1:
+            yield buf.copy()
+
+
+def panel_frames(rows, subframes):
+    """Duty cycle images, (64, 64, 3) in 0..1, one per `subframes`."""
+    acc = np.zeros((2, ROWS, COLS, 3))
+    for (i, bits) in enumerate(panel_subframes(rows)):
+        acc += bits
+        if i % subframes == subframes - 1:
+            yield (acc / subframes).reshape(2 * ROWS, COLS, 3)
+            acc[:] = 0
+
+
+Expected = namedtuple('Expected', 'frame subframe addr rgb')
+
+
+def model_rows(frames, variant='pdm'):
+    """Rows the LED driver should latch for a sequence of frames.
+
+       Each frame is used for all of its subframes, so painters that
+       look at `subframe` need their own expected rows.
+    """
+    mod = hub75.Modulator(variant)
+    for (f, frame) in enumerate(frames):
+        bits = mod.bits(frame)
+        for s in range(mod.subframes):
+            for a in range(ROWS):
+                yield Expected(f, s, a, bits[s, :, a])
+
+
+Mismatch = namedtuple('Mismatch',
+                      'row time frame subframe addr got_addr half x '
+                      'channel expected got')
+
+
+def compare(rows, expected):
+    """Compare rows with a model, stopping at the first difference.
+
+       Returns (rows_matched, Mismatch or None).
+    """
+    n = 0
+    for (row, exp) in zip(rows, expected):
+        if row.addr != exp.addr or not np.array_equal(row.rgb, exp.rgb):
+            diff = np.argwhere(row.rgb != exp.rgb)
+            h, x, c = diff[0] if diff.size else (0, 0, 0)
+            return n, Mismatch(n, row.time, exp.frame, exp.subframe,
+                               exp.addr, row.addr, int(h), int(x), int(c),
+                               bool(exp.rgb[h, x, c]), bool(row.rgb[h, x, c]))
+        n += 1
+    return n, None
+
+
+def main(argv):
+    import painters
+    path, demo = argv[:2]
+    frames = int(argv[2]) if len(argv) > 2 else 4
+    d = painters.DEMOS[demo]
+    model = painters.golden_frames(demo, range(frames))
+    n, miss = compare(panel_rows(path), model_rows(model, d.driver))
+    if miss:
+        print('{} rows match; first mismatch:'.format(n))
+        for (k, v) in miss._asdict().items():
+            print('    {:10} {}'.format(k, v))
+        return 1
+    print('{} rows match'.format(n))
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main(sys.argv[1:]))
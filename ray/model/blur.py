@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+
+# Motion blur from time samples.
+#
+# Each output frame is the average of K renders at times spread over the
+# interval since the last frame, the way a shutter open for the whole
+# frame would see it.  The frame stage's inputs, precalc_camera's and
+# precalc_sphere's, are interpolated between the last frame's and this
+# one's, so the camera and sphere move smoothly even though the
+# animation only steps once a frame.
+#
+# Time is one more lane dimension.  The frame stage runs once, on
+# arrays of K times; the pixel stage runs once on every (time, pixel)
+# lane, as NumPy arrays, split into groups where tests diverge (see
+# cube.py).  So a sample costs a fraction of a frame, not a frame.
+#
+#     $ blur.py [frames]
+#
+# writes blur-000.png ... (K = 32), and prints the best time per frame
+# of several runs for K = 1 ... 32, and the cost of a sample, the slope
+# through them.
+
+import math
+import sys
+import time
+
+import numpy as np
+
+from framebuffer import Framebuffer
+import numerics
+import scene
+from sweep import take
+
+
+# Inputs that count around and start over: (field, modulus).  Stepping
+# from 63 to 0, frame64 and frame64m are continued to 64 and 0, where
+# the sphere's height is the same.
+WRAPS = {'frame64': 64, 'frame64m': 64}
+
+
+def _lerp(field, a, b, t):
+    """Field `field` of a frame stage input, `t` of the way from `a` to
+       `b`.  t is an array.
+    """
+    if isinstance(a, numerics.Angle):
+        step = (b.radians - a.radians + math.pi) % math.tau - math.pi
+        return numerics.Angle(radians=a.radians + t * step)
+    a, b = a.value, b.value
+    if field in WRAPS and b < a:
+        b += WRAPS[field]
+    return numerics.Scalar(a + t * (b - a))
+
+
+class BlurScene(scene.Scene):
+    """A Scene whose frames average `samples` times each."""
+
+    def __init__(self, width, height, numerics, samples=4):
+        super().__init__(width, height, numerics)
+        self.samples = samples
+        self.times = (np.arange(samples) + 1) / samples
+        self.lanes = np.indices((samples, height, width)).reshape(3, -1)
+        self.last = {}
+        self.splits = 0
+
+    def start_anim(self):
+        super().start_anim()
+        self.last = {}
+
+    def _blend(self, key, pre):
+        """`pre` at each sample time since the last frame's.  The first
+           frame has nothing to blur from.
+        """
+        before = self.last.get(key, pre)
+        self.last[key] = pre
+        return pre._make(_lerp(f, a, b, self.times)
+                         for (f, a, b) in zip(pre._fields, before, pre))
+
+    def precalc_camera(self):
+        return self._blend('camera', super().precalc_camera())
+
+    def precalc_sphere(self, frame):
+        return self._blend('sphere', super().precalc_sphere(frame))
+
+    def prepare_frame(self, frame):
+        # The frame stage runs once, on every time; each lane then
+        # takes its own.
+        super().prepare_frame(frame)
+        t = self.lanes[0]
+        self.camera = take(self.camera, t)
+        self.sphere = take(self.sphere, t)
+
+    def _restricted(self, mask):
+        camera, sphere = self.camera, self.sphere
+        self.camera = take(camera, mask)
+        self.sphere = take(sphere, mask)
+        return camera, sphere
+
+    def _pixels(self, lanes, iy, ix, out):
+        try:
+            color = self.render_pixel(ix, iy)
+        except numerics.Diverged as d:
+            self.splits += 1
+            for mask in (d.mask, ~d.mask):
+                saved = self._restricted(mask)
+                try:
+                    self._pixels(lanes[mask], iy[mask], ix[mask], out)
+                finally:
+                    self.camera, self.sphere = saved
+            return
+        out[lanes] = np.stack(np.broadcast_arrays(*color), axis=-1)
+
+    def collect_pixels(self, fb=None):
+        if fb is None:
+            fb = Framebuffer(self.width, self.height)
+        _, iy, ix = self.lanes
+        out = np.empty((len(ix), 3))
+        self._pixels(np.arange(len(ix)), iy, ix, out)
+        fb.array[..., :3] = np.round(out.reshape(
+            self.samples, self.height, self.width, 3).mean(axis=0))
+        return fb
+
+
+SAMPLES = (1, 2, 4, 8, 16, 32)
+REPEATS = 5
+
+
+def _render(samples, frame_count, size):
+    """The frames, the seconds they took, and splits a frame."""
+    blur = BlurScene(size, size, numerics.QuietNumerics(), samples)
+    start = time.perf_counter()
+    frames = [fb.copy() for fb in blur.render_anim(frame_count)]
+    seconds = time.perf_counter() - start
+    return frames, seconds, blur.splits // frame_count
+
+
+def main(argv):
+    from main import WIDTH
+    frame_count = int(argv[0]) if argv else 8
+    one = scene.Scene(WIDTH, WIDTH, numerics=numerics.QuietNumerics())
+    plain = [fb.copy() for fb in one.render_anim(frame_count)]
+
+    # A frame takes tens of milliseconds, and a sample adds less than
+    # the noise in one run.  So each K is run REPEATS times, taking
+    # turns so drift hits them all alike, and keeps its best time; the
+    # cost of a sample is the slope of a line through those.
+    best = dict.fromkeys(SAMPLES, math.inf)
+    for _ in range(REPEATS):
+        for samples in SAMPLES:
+            frames, seconds, splits = _render(samples, frame_count, WIDTH)
+            best[samples] = min(best[samples], seconds / frame_count)
+            if samples == 1:
+                same = all((a.array == b.array).all()
+                           for (a, b) in zip(frames, plain))
+    for samples in SAMPLES:
+        print('{:2} samples: {:.3f} s a frame'.format(samples, best[samples]))
+    per_sample, fixed = np.polyfit(SAMPLES, [best[k] for k in SAMPLES], 1)
+    print('{:.4f} s a frame per sample ({:.0%} of one), {:.3f} s that '
+          "doesn't depend on samples; {} splits a frame".format(
+              per_sample, per_sample / (fixed + per_sample), fixed, splits))
+    print('1 sample {} the plain scene'.format(
+        'matches' if same else 'DIFFERS from'))
+    for (i, fb) in enumerate(frames):
+        fb.image().save('blur-{:03}.png'.format(i))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+
+# Branch-path census.
+#
+# Every `Scalar.__lt__` is a data dependent branch (`is_neg` in the
+# DAG).  BranchNumerics skips the graphs and records, for each pixel,
+# the sequence of is_neg outcomes it took.  Over an animation, that
+# tells how many pixels take each path through `Scene.trace`, where on
+# the panel they are, and how long the longest path is.  Paths that
+# cover most of the panel need to run at full rate in hardware; rare
+# ones can share time.
+#
+# Paths are written as strings of is_neg outcomes, '1' for negative.
+
+from collections import Counter, namedtuple
+import sys
+
+import PIL.Image
+
+import numerics
+import scene
+
+
+class BranchNumerics(numerics.Numerics):
+
+    def __init__(self, width, height):
+        super().__init__()
+        self.width = width
+        self.height = height
+        self.counts = Counter()         # path -> pixels
+        self.heat = {}                  # path -> per-pixel frame count
+        self.frames = 0
+
+    def start_frame(self, *input_tuples):
+        self.frame_counter += 1
+        self.frames += 1
+
+    def end_frame(self, *output_tuples):
+        self.pixel_counter = 0
+
+    def start_pixel(self, pixel, *input_tuples):
+        self.index = int(pixel.y.value) * self.width + int(pixel.x.value)
+        numerics.current_path = []
+
+    def end_pixel(self, *output_tuples):
+        path = ''.join('1' if t else '0' for t in numerics.current_path)
+        numerics.current_path = None
+        self.pixel_counter += 1
+        self.counts[path] += 1
+        if path not in self.heat:
+            self.heat[path] = [0] * (self.width * self.height)
+        self.heat[path][self.index] += 1
+
+    def report(self):
+        Path = namedtuple('Path', 'path length pixels fraction')
+        total = sum(self.counts.values())
+        return [Path(p, len(p), n, n / total)
+                for (p, n) in self.counts.most_common()]
+
+    def worst_case(self):
+        return max(len(p) for p in self.counts)
+
+    def heatmap(self, path):
+        """Grayscale image: how often each pixel took `path`."""
+        scale = 255 / max(1, self.frames)
+        img = PIL.Image.new(mode='L', size=(self.width, self.height))
+        img.putdata([round(n * scale) for n in self.heat[path]])
+        return img
+
+
+def census(width, height, frame_count):
+    numz = BranchNumerics(width, height)
+    my_scene = scene.Scene(width, height, numerics=numz)
+    for pixels in my_scene.render_anim(frame_count):
+        pass
+    return numz
+
+
+def main(argv):
+    from main import WIDTH, HEIGHT
+    frame_count = int(argv[0]) if argv else 8
+    numz = census(WIDTH, HEIGHT, frame_count)
+    print('{} frames, {} paths, worst case {} tests'
+          .format(numz.frames, len(numz.counts), numz.worst_case()))
+    print('{:>8} {:>9} {:>7}  path'.format('tests', 'pixels', '%'))
+    for p in numz.report():
+        print('{:8} {:9} {:7.2%}  {}'.format(p.length, p.pixels,
+                                            p.fraction, p.path))
+        numz.heatmap(p.path).save('branch-{}.png'.format(p.path))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
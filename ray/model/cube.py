@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+
+# Six panels on a cube, one camera in the middle.
+#
+# Each face looks out along its own axis: the primary ray turns to the
+# face, then the way the camera looks.  The frame stage is the same for
+# all six, so it runs once per frame.  The pixel stage runs on every
+# pixel of every face at once, as NumPy arrays (see numerics.Diverged).
+# When a test comes out differently across pixels, each group is
+# rendered again on its own, so the whole frame costs about one pass
+# per branch path, not one per pixel.
+#
+# The faces go side by side into one 384x64 Framebuffer, front, right,
+# back, left, top, bottom; `faces_of` gives them as a (6, 64, 64, 3) view.
+#
+#     $ cube.py [frames]
+#
+# writes cube-000.png ..., and prints the time per frame for all six
+# faces next to the time for one face rendered a pixel at a time.
+
+from collections import namedtuple
+from contextlib import contextmanager
+import sys
+import time
+
+import numpy as np
+
+from framebuffer import Framebuffer
+import numerics
+import scene
+from sweep import take
+
+
+# (name, x angle, y angle), in degrees.
+FACES = (
+    ('front', 0, 0),
+    ('right', 0, 90),
+    ('back', 0, 180),
+    ('left', 0, 270),
+    ('top', -90, 0),
+    ('bottom', 90, 0),
+)
+
+Face = namedtuple('Face', 'x_angle y_angle')
+
+
+class CubeScene(scene.Scene):
+    """A Scene whose frames are every face, side by side."""
+
+    def __init__(self, size, numerics, faces=FACES):
+        super().__init__(size, size, numerics)
+        self.faces = faces
+        self.lanes = np.indices((len(faces), size, size)).reshape(3, -1)
+        f = self.lanes[0]
+        self.face = Face(*(self.numerics.angle(
+                               degrees=np.array(a, dtype=float)[f])
+                           for a in zip(*(face[1:] for face in faces))))
+        self.splits = 0
+
+    def ray_direction(self, x, y):
+        # Turn to the face, then the way the camera looks.
+        return (self.image_point(x, y)
+                .rotate(self.face.x_angle, 'X')
+                .rotate(self.face.y_angle, 'Y')
+                .rotate(self.camera.x_angle, 'X')
+                .rotate(self.camera.y_angle, 'Y'))
+
+    @contextmanager
+    def _restricted(self, mask):
+        attrs = ('camera', 'sphere', 'light', 'plane', 'face')
+        saved = [getattr(self, a) for a in attrs]
+        for (a, v) in zip(attrs, saved):
+            setattr(self, a, take(v, mask))
+        try:
+            yield
+        finally:
+            for (a, v) in zip(attrs, saved):
+                setattr(self, a, v)
+
+    def _pixels(self, f, iy, ix, out):
+        try:
+            color = self.render_pixel(ix, iy)
+        except numerics.Diverged as d:
+            self.splits += 1
+            for mask in (d.mask, ~d.mask):
+                with self._restricted(mask):
+                    self._pixels(f[mask], iy[mask], ix[mask], out)
+            return
+        out[iy, f * self.width + ix] = np.stack(np.broadcast_arrays(*color),
+                                                axis=-1)
+
+    def collect_pixels(self, fb=None):
+        if fb is None:
+            fb = Framebuffer(len(self.faces) * self.width, self.height)
+        self._pixels(*self.lanes, fb.array)
+        return fb
+
+    def faces_of(self, fb):
+        """A (faces, height, width, 3) view of a frame."""
+        return fb.array[..., :3].reshape(
+            self.height, len(self.faces), self.width, 3).swapaxes(0, 1)
+
+
+def main(argv):
+    from main import WIDTH
+    frame_count = int(argv[0]) if argv else 4
+    cube = CubeScene(WIDTH, numerics.QuietNumerics())
+    start = time.perf_counter()
+    frames = [fb for fb in cube.render_anim(frame_count)]
+    seconds = (time.perf_counter() - start) / frame_count
+
+    one = scene.Scene(WIDTH, WIDTH, numerics=numerics.QuietNumerics())
+    start = time.perf_counter()
+    fronts = [fb for fb in one.render_anim(frame_count)]
+    one_face = (time.perf_counter() - start) / frame_count
+
+    same = all((cube.faces_of(fb)[0] == front.array).all()
+               for (fb, front) in zip(frames, fronts))
+    for (i, fb) in enumerate(frames):
+        fb.image().save('cube-{:03}.png'.format(i))
+    print('{} faces of {}x{}: {:.3f} s a frame, {} splits a frame'
+          .format(len(cube.faces), WIDTH, WIDTH, seconds,
+                  cube.splits // frame_count))
+    print('one face, a pixel at a time: {:.3f} s a frame ({:.1f}x)'
+          .format(one_face, one_face * len(cube.faces) / seconds))
+    print('front face {} the plain scene'
+          .format('matches' if same else 'DIFFERS from'))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
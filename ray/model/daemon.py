@@ -0,0 +1,338 @@
+#!/usr/bin/env python
+
+# Render daemon.
+#
+# Keeps one Scene warm and renders the animation continuously, so
+# tuning a constant doesn't mean re-importing and rebuilding
+# everything.  Constants are changed over a local socket, one JSON
+# object per line:
+#
+#     {"set": {"SPHERE_ALPHA": 0.5, "LIGHT_DIRECTION": [1, 3, -1]}}
+#     {"stats": true}
+#     {"frames": true}
+#
+# "set" aborts the frame in progress and starts over with the new
+# values, so a change shows up about one frame time later.  "frames"
+# turns the connection into a sink: a JSON header line, then
+# width * height * 3 bytes of RGB, per frame.
+#
+# With --progressive, each frame is also sent coarse to fine as it
+# renders (see Scene.refine_pixels): a frame's header says the size of
+# the blocks it was traced in, and the last one for a frame number has
+# block 1.
+#
+# Each sink holds at most one frame.  A sink that falls behind gets the
+# newest frame when it is ready again, and the ones in between are
+# dropped, not queued.  When there are no sinks, rendering pauses.
+#
+#     $ daemon.py --sim --disk frames/ &
+#     $ daemon.py -c SPHERE_ALPHA=0.5 'LIGHT_DIRECTION=[1, 3, -1]'
+
+import argparse
+import asyncio
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import sys
+import time
+
+import numerics
+import scene
+import trickery
+
+
+SOCKET_PATH = '/tmp/ray-daemon.sock'
+SIM_IMAGE = '/tmp/led-sim/0.png'        # what sim/ displays
+
+
+class Stale(Exception):
+    """The constants changed while a frame was rendering."""
+
+
+# The Scene's animation state, which the frame stage steps.  An aborted
+# frame puts it back, so the retry doesn't skip a step of motion.
+ANIM_STATE = ('cam_pos_u', 'cam_pos_v', 'sphere_pos_x', 'sphere_pos_z',
+              'sphere_inc_x', 'sphere_inc_z')
+
+
+class AbortingNumerics(numerics.QuietNumerics):
+    """Builds no graphs, and can abort a frame between pixels."""
+
+    def __init__(self):
+        super().__init__()
+        self.abort = False
+
+    def start_pixel(self, *input_tuples):
+        if self.abort:
+            raise Stale()
+
+
+Frame = namedtuple('Frame', 'number fb seconds block', defaults=(1,))
+
+
+class Latest:
+    """A one-frame mailbox.  `put` replaces a frame that hasn't been
+       taken yet and counts it as dropped.
+    """
+
+    def __init__(self):
+        self.frame = None
+        self.ready = asyncio.Event()
+        self.taken = 0
+        self.dropped = 0
+
+    def put(self, frame):
+        if self.frame is not None:
+            self.dropped += 1
+        self.frame = frame
+        self.ready.set()
+
+    async def get(self):
+        await self.ready.wait()
+        self.ready.clear()
+        frame, self.frame = self.frame, None
+        self.taken += 1
+        return frame
+
+
+def save_atomic(frame, path):
+    """Write a PNG so a reader never sees half of it."""
+    tmp = '{}.{}.tmp.png'.format(path, os.getpid())
+    frame.fb.image().save(tmp)
+    os.replace(tmp, path)
+
+
+class Daemon:
+
+    def __init__(self, width, height, block=0):
+        self.numz = AbortingNumerics()
+        self.scene = scene.Scene(width, height, numerics=self.numz)
+        self.scene.start_anim()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.block = block              # progressive, from this block size
+        self.loop = None
+        self.pending = {}               # constants for the next frame
+        self.constants = {}             # all constants set so far
+        self.sinks = {}                 # name -> Latest
+        self.has_sinks = asyncio.Event()
+        self.frame = 0
+        self.rendered = 0
+        self.aborted = 0
+        self.seconds = 0.0
+
+    def set_constants(self, values):
+        if not isinstance(values, dict):
+            raise ValueError('"set" takes an object of NAME: VALUE')
+        # Try them on a throwaway namespace first, so a bad value is an
+        # error reply, not a dead render thread.
+        for (name, value) in values.items():
+            try:
+                trickery.redefine_constant({}, numerics.Numerics(),
+                                           name, value)
+            except KeyError as e:
+                raise ValueError(e.args[0])
+        self.pending.update(values)
+        self.numz.abort = True
+
+    def _render(self, frame, values):
+        """Runs on the render thread."""
+        if values:
+            self.scene.set_constants(**values)
+        state = {k: getattr(self.scene, k) for k in ANIM_STATE}
+        start = time.perf_counter()
+        try:
+            # A new Framebuffer each frame, since sinks hold on to them.
+            if not self.block:
+                fb = self.scene.render_frame(frame)
+            else:
+                for (block, fb) in self.scene.render_preview(
+                        frame, block=self.block):
+                    if block > 1:
+                        preview = Frame(frame, fb.copy(),
+                                        time.perf_counter() - start, block)
+                        self.loop.call_soon_threadsafe(self.publish,
+                                                       preview)
+        except Stale:
+            for (k, v) in state.items():
+                setattr(self.scene, k, v)
+            raise
+        return Frame(frame, fb, time.perf_counter() - start)
+
+    def publish(self, frame):
+        for box in self.sinks.values():
+            box.put(frame)
+
+    async def render_loop(self):
+        loop = self.loop = asyncio.get_running_loop()
+        while True:
+            await self.has_sinks.wait()
+            values, self.pending = self.pending, {}
+            self.numz.abort = False
+            try:
+                frame = await loop.run_in_executor(
+                    self.executor, self._render, self.frame, values)
+            except Stale:
+                self.aborted += 1
+                continue
+            finally:
+                self.constants.update(values)
+            self.frame += 1
+            self.rendered += 1
+            self.seconds += frame.seconds
+            self.publish(frame)
+
+    def add_sink(self, name):
+        box = self.sinks[name] = Latest()
+        self.has_sinks.set()
+        return box
+
+    def remove_sink(self, name):
+        del self.sinks[name]
+        if not self.sinks:
+            self.has_sinks.clear()
+
+    async def run_sink(self, name, write):
+        """Feed frames to `write(frame)`, a blocking function run off
+           the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        box = self.add_sink(name)
+        try:
+            while True:
+                frame = await box.get()
+                await loop.run_in_executor(None, write, frame)
+        finally:
+            self.remove_sink(name)
+
+    def stats(self):
+        return {
+            'frame': self.frame,
+            'rendered': self.rendered,
+            'aborted': self.aborted,
+            'frame_seconds': self.seconds / max(1, self.rendered),
+            'constants': self.constants,
+            'sinks': {name: {'taken': box.taken, 'dropped': box.dropped}
+                      for (name, box) in self.sinks.items()},
+        }
+
+    async def _stream(self, name, writer):
+        box = self.add_sink(name)
+        try:
+            while True:
+                frame = await box.get()
+                header = {'frame': frame.number, 'width': frame.fb.width,
+                          'height': frame.fb.height, 'block': frame.block}
+                writer.write(json.dumps(header).encode() + b'\n')
+                writer.write(frame.fb)
+                await writer.drain()
+        finally:
+            self.remove_sink(name)
+
+    async def client(self, reader, writer):
+        name = 'client-{}'.format(id(writer))
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    msg = json.loads(line)
+                    if 'frames' in msg:
+                        await self._stream(name, writer)
+                        break
+                    reply = {'ok': True}
+                    if 'set' in msg:
+                        self.set_constants(msg['set'])
+                        reply['frame'] = self.frame
+                    if 'stats' in msg:
+                        reply['stats'] = self.stats()
+                except (ValueError, TypeError, AssertionError) as e:
+                    reply = {'ok': False,
+                             'error': str(e) or type(e).__name__}
+                writer.write(json.dumps(reply).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, path, sinks):
+        if os.path.exists(path):
+            os.unlink(path)
+        server = await asyncio.start_unix_server(self.client, path)
+        tasks = [asyncio.create_task(self.render_loop())]
+        tasks += [asyncio.create_task(self.run_sink(name, write))
+                  for (name, write) in sinks]
+        async with server:
+            await asyncio.gather(server.serve_forever(), *tasks)
+
+
+def sim_sink(path=SIM_IMAGE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return lambda frame: save_atomic(frame, path)
+
+
+def disk_sink(directory):
+    os.makedirs(directory, exist_ok=True)
+    return lambda frame: frame.fb.image().save(
+        os.path.join(directory, 'frame-{:05}.png'.format(frame.number)))
+
+
+def parse_assignment(arg):
+    """NAME=VALUE, VALUE in JSON: 0.5, [1, 2, -1], {"degrees": 20}."""
+    name, _, value = arg.partition('=')
+    return name, json.loads(value)
+
+
+async def send(path, msg):
+    reader, writer = await asyncio.open_unix_connection(path)
+    writer.write(json.dumps(msg).encode() + b'\n')
+    await writer.drain()
+    reply = json.loads(await reader.readline())
+    writer.close()
+    return reply
+
+
+def main(argv):
+    from main import WIDTH, HEIGHT
+    parser = argparse.ArgumentParser(description='Ray model render daemon.')
+    parser.add_argument('-s', '--socket', default=SOCKET_PATH)
+    parser.add_argument('--sim', nargs='?', const=SIM_IMAGE, metavar='PNG',
+                        help='keep the simulator image up to date')
+    parser.add_argument('--disk', metavar='DIR',
+                        help='save every frame a sink takes to DIR')
+    parser.add_argument('-p', '--progressive', nargs='?', type=int,
+                        const=8, default=0, metavar='BLOCK',
+                        help='send each frame coarse to fine, starting '
+                             'from BLOCK x BLOCK squares (default 8)')
+    parser.add_argument('-c', '--set', nargs='+', metavar='NAME=VALUE',
+                        help="set a running daemon's constants, and exit")
+    parser.add_argument('--stats', action='store_true',
+                        help="print a running daemon's stats, and exit")
+    args = parser.parse_args(argv)
+
+    if args.set or args.stats:
+        msg = {'stats': True} if args.stats else {}
+        if args.set:
+            msg['set'] = dict(parse_assignment(a) for a in args.set)
+        print(json.dumps(asyncio.run(send(args.socket, msg)), indent=2))
+        return
+
+    sinks = []
+    if args.sim:
+        sinks.append(('sim', sim_sink(args.sim)))
+    if args.disk:
+        sinks.append(('disk', disk_sink(args.disk)))
+
+    async def run():
+        await Daemon(WIDTH, HEIGHT, args.progressive).serve(args.socket,
+                                                            sinks)
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -23,6 +23,7 @@ class Dag:
         self.inputs = set()
         self.outputs = set()
         self.constants = set()
+        self.annotations = {}
         pass
 
     def add_node(self, label, value, type):
@@ -62,6 +63,11 @@ class Dag:
         cnode = self.node_map[value]
         self.constants.add(cnode)
 
+    def annotate(self, value, **attrs):
+        """Attach extra attributes to a node.  They go in the .dot file."""
+        node = self.node_map[value]
+        self.annotations.setdefault(node, {}).update(attrs)
+
     def propagate_constants(self):
         done = False
         while not done:
@@ -98,6 +104,8 @@ class Dag:
                 attrs += ' const=true'
             if t:
                 attrs += ' test=true'
+            for (k, v) in self.annotations.get(n, {}).items():
+                attrs += ' {}="{}"'.format(k, v)
 
             # shape: I/O override const
             if i:
@@ -0,0 +1,415 @@
+#!/usr/bin/env python
+
+# Differential test of the Numerics backends.
+#
+# Renders the same frames through every way the model can run, and
+# compares each with the reference, plain float Numerics a pixel at a
+# time (for newton, exact Newton-mode ops, and for scanline-fixed,
+# float scanline, so the graphs match):
+#
+#   quiet     no graphs (numerics.QuietNumerics, what the tools time)
+#   ranges    RangeNumerics, which merges the graphs as it goes
+#   lanes     QuietNumerics, every sampled pixel at once as NumPy
+#             lanes, split where tests diverge (as in cube.py)
+#   scanline  ray directions stepped along each row in scan order, as
+#             Scene.scan_pixels does (see strength.py)
+#   newton    LUT-seeded Newton-Raphson recip and rsqrt
+#   fixed     fixed point, every scalar floored to Q.FIXED_BITS
+#   scanline-fixed
+#             both, as the FPGA would run
+#
+# Only a sample of each frame's pixels is rendered, chosen at random or
+# one from each cell of a grid, over many frames.  Unorm outputs are
+# compared pixel by pixel.  Where a backend records graphs, every node
+# of every frame and pixel graph is compared with the reference's too,
+# as long as the graph has the same ops; a graph that doesn't took a
+# different branch path, and is counted as such.
+#
+# Each backend has a tolerance: how far its unorm outputs may be from
+# the reference's, and how far its node values may be, as |a - b| <=
+# atol + rtol |a|, where |a| is the largest of the reference node's
+# value and its inputs'.  Only nodes whose inputs are within a third of
+# the tolerance of their own values are held to it, so an error is
+# counted where it starts, not everywhere it goes.  A backend is over
+# if any pixel or node exceeds its tolerance.  Pixels that took another
+# branch path may be any color, and are only counted.
+#
+#     $ difftest.py [-f frames] [-n pixels] [--random] [-s seed]
+#                   [backend ...]
+#
+# prints one line per backend, and exits 1 if any is over.
+# test_difftest.py runs it small under pytest.
+
+import argparse
+from collections import namedtuple
+from contextlib import contextmanager
+import math
+import sys
+
+import numpy as np
+
+import numerics
+import ranges
+import scene
+from timeline import op_name
+import trickery
+
+
+FIXED_BITS = 16
+NEWTON = numerics.Newton(6, 1)
+# Exact to the last bit, but with Newton mode's ops (recip, not div),
+# so its graphs line up with NEWTON's.
+EXACT_NEWTON = numerics.Newton(6, 4)
+
+Tolerance = namedtuple('Tolerance', 'unorm atol rtol')
+
+# make:       () -> Numerics
+# graphs:     whether it records graphs to compare node by node
+# reference:  the modes of the float run it is compared with
+Backend = namedtuple('Backend', 'name make graphs mode tolerance reference',
+                     defaults=({},))
+
+
+class CapturingNumerics(numerics.Numerics):
+    """Keeps its graphs instead of writing .dot files."""
+
+    def __init__(self):
+        super().__init__()
+        self.graphs = []
+
+    def graph_done(self, dotfile, graph):
+        self.graphs.append(graph)
+
+
+# The newton and fixed tolerances are about three times the worst seen
+# over 16 frames of 256 pixels.  Newton(6, 1)'s rsqrt is good to about
+# 3e-4, but leaves pixels off by up to 7 where a grazing ray meets the
+# plane.  A Q16 value is off by its last bit, which is more of a small
+# one, and more yet after a recip: up to 5e-3 of the recip of a small
+# dot.  Stepped in Q16, a ray direction drifts by up to about 100 LSBs
+# by the bottom of the frame, which is within the node tolerance but
+# leaves pixels off by up to 3.
+BACKENDS = {b.name: b for b in (
+    Backend('quiet', numerics.QuietNumerics, False, {}, Tolerance(0, 0, 0)),
+    Backend('ranges', ranges.RangeNumerics, False, {}, Tolerance(0, 0, 0)),
+    Backend('lanes', numerics.QuietNumerics, False, {'lanes': True},
+            Tolerance(0, 0, 0)),
+    Backend('scanline', numerics.QuietNumerics, False, {'scanline': True},
+            Tolerance(1, 0, 0)),
+    Backend('newton', CapturingNumerics, True, {'newton': NEWTON},
+            Tolerance(8, 0, 1e-3), {'newton': EXACT_NEWTON}),
+    Backend('fixed', CapturingNumerics, True,
+            {'fixed': numerics.Fixed(FIXED_BITS)},
+            Tolerance(1, 2 ** -(FIXED_BITS - 1), 1.5e-2)),
+    Backend('scanline-fixed', CapturingNumerics, True,
+            {'scanline': True, 'fixed': numerics.Fixed(FIXED_BITS)},
+            Tolerance(9, 2 ** -(FIXED_BITS - 1), 1.5e-2),
+            {'scanline': True}),
+)}
+
+
+def stratified(width, height, n, rng):
+    """About `n` pixels, one at random in each cell of a grid over the
+       frame.
+    """
+    cells = max(1, min(round(math.sqrt(n)), width, height))
+    edges_x = np.linspace(0, width, cells + 1).astype(int)
+    edges_y = np.linspace(0, height, cells + 1).astype(int)
+    cx, cy = (a.ravel() for a in np.meshgrid(np.arange(cells),
+                                             np.arange(cells)))
+    ix = rng.integers(edges_x[cx], edges_x[cx + 1])
+    iy = rng.integers(edges_y[cy], edges_y[cy + 1])
+    return ix, iy
+
+
+def scattered(width, height, n, rng):
+    """`n` different pixels at random."""
+    i = rng.choice(width * height, size=min(n, width * height),
+                   replace=False)
+    return i % width, i // width
+
+
+def numbers(v):
+    """A node value's numbers, flattened, or None if it has none.  Unorm
+       colors are the pixels, compared as such.
+    """
+    if isinstance(v, numerics.Scalar):
+        return np.ravel(np.asarray(v.value, dtype=float))
+    if isinstance(v, numerics.Angle):
+        return np.ravel(np.asarray(v.radians, dtype=float))
+    if isinstance(v, numerics.Vec3):
+        return np.concatenate([numbers(c) if isinstance(c, numerics.Scalar)
+                               else np.ravel(np.asarray(c, dtype=float))
+                               for c in v.values])
+    return None
+
+
+def scale(value, inputs):
+    """The size of numbers a node works with: the largest of its value
+       and its inputs'.  A difference of nearly equal inputs keeps their
+       absolute error, not its own relative error.
+    """
+    m = float(np.abs(value).max(initial=0))
+    for v in inputs:
+        if v is not None and v.size:
+            m = max(m, float(np.abs(v).max()))
+    return m
+
+
+class Run:
+    """One backend's Scene, and what it rendered."""
+
+    def __init__(self, backend, width, height):
+        self.backend = backend
+        self.numz = backend.make()
+        with self.active():
+            self.scene = scene.Scene(width, height, self.numz,
+                                     scanline=backend.mode.get('scanline',
+                                                               False))
+            self.scene.start_anim()
+        self.colors = []
+        self.frame_graphs = []
+        self.pixel_graphs = []
+        self.splits = 0
+
+    @contextmanager
+    def active(self):
+        """This backend's numerics modes and constants, while rendering.
+           The lazy constants are scene module globals, so every backend
+           defines its own again.
+        """
+        saved = numerics.newton, numerics.fixed
+        numerics.newton = self.backend.mode.get('newton')
+        numerics.fixed = self.backend.mode.get('fixed')
+        try:
+            trickery.define_constants(vars(scene), self.numz)
+            yield
+        finally:
+            numerics.newton, numerics.fixed = saved
+
+    def render(self, frame, ix, iy):
+        with self.active():
+            s = self.scene
+            s.prepare_frame(frame)
+            self.frame_graphs.append(self._graphs())
+            if self.backend.mode.get('lanes'):
+                out = np.empty((len(ix), 3), dtype=int)
+                self._lanes(np.arange(len(ix)), ix, iy, out)
+                self.colors.append(out)
+                return
+            colors = [None] * len(ix)
+            graphs = [None] * len(ix)
+            for (i, x, y, direction) in self._directions(ix, iy):
+                colors[i] = s.render_pixel(x, y, direction)
+                graphs[i] = self._graphs()
+            self.pixel_graphs.extend(graphs)
+            self.colors.append(np.array(colors, dtype=int))
+
+    def _directions(self, ix, iy):
+        """(index, x, y, direction) for each pixel.  In scanline mode,
+           the directions are Scene.scan_directions', stepped along
+           every row up to the last pixel wanted; otherwise None, for
+           render_pixel to compute.
+        """
+        pixels = list(zip(ix.tolist(), iy.tolist()))
+        if not self.backend.mode.get('scanline'):
+            for (i, (x, y)) in enumerate(pixels):
+                yield i, x, y, None
+            return
+        wanted = {}
+        for (i, xy) in enumerate(pixels):
+            wanted.setdefault(xy, []).append(i)
+        left = len(pixels)
+        for (x, y, direction) in self.scene.scan_directions():
+            if not left:
+                break
+            for i in wanted.get((x, y), ()):
+                yield i, x, y, direction
+                left -= 1
+
+    def _graphs(self):
+        """The graphs recorded since the last call."""
+        graphs = getattr(self.numz, 'graphs', [])
+        taken = graphs[:]
+        del graphs[:]
+        return taken
+
+    def _lanes(self, lanes, ix, iy, out):
+        try:
+            color = self.scene.render_pixel(ix, iy)
+        except numerics.Diverged as d:
+            self.splits += 1
+            for mask in (d.mask, ~d.mask):
+                self._lanes(lanes[mask], ix[mask], iy[mask], out)
+            return
+        out[lanes] = np.stack(np.broadcast_arrays(*color), axis=-1)
+
+
+# Ops whose value steps, not slides, as their inputs move.  A node of
+# one that differs from the reference's is a different branch, just as
+# a test that goes the other way is.
+DISCRETE = {'xor4'}
+
+Report = namedtuple('Report', 'name pixels over max_diff worst diverged '
+                              'nodes nodes_over worst_node')
+
+
+def path(graph):
+    """A graph's ops in order, with each test's outcome."""
+    return [(op_name(n.label),
+             n.value if n.type == numerics.Type.BOOL else None)
+            for n in graph.nodes]
+
+
+def compare_graphs(ref_graphs, graphs, tolerance, worst):
+    """Compares each graph's nodes with the reference's.  Returns (nodes
+       compared, nodes over, worst, diverged), where worst is the largest
+       (|a - b| / tolerance, op) so far, and diverged says some graph
+       took another branch path, and the rest were not compared.
+
+       A node is only held to the tolerance when its inputs are within
+       a third of it of their own values.  One that isn't gets its
+       error from them, as a recip of a near-zero dot does, and isn't
+       counted.
+    """
+    nodes = over = 0
+    for (ref, got) in zip(ref_graphs, graphs):
+        if path(ref) != path(got):
+            return nodes, over, worst, True
+        values = {n: numbers(n.value) for n in ref.nodes}
+        srcs = {n: [] for n in ref.nodes}
+        for edge in ref.edges:
+            srcs[edge.dst].append(edge.src)
+        tainted = set()
+        for (a, b) in zip(ref.nodes, got.nodes):
+            va, vb = values[a], numbers(b.value)
+            if va is None or vb is None or va.shape != vb.shape:
+                continue
+            diff = np.abs(va - vb)
+            if op_name(a.label) in DISCRETE and diff.any():
+                return nodes, over, worst, True
+            # Inputs off by more than a third what their own size
+            # allows, as a difference of nearly equal numbers is, excuse
+            # the node.  A third, since a product's error is its inputs'
+            # summed, plus its own.
+            if (diff > (tolerance.atol +
+                        tolerance.rtol * np.abs(va)) / 3).any():
+                tainted.add(a)
+            if any(s in tainted for s in srcs[a]):
+                continue
+            nodes += 1
+            allowed = tolerance.atol + tolerance.rtol * scale(
+                va, [values[s] for s in srcs[a]])
+            if (diff > allowed).any():
+                over += 1
+            ratio = float((diff / max(allowed, 1e-300)).max())
+            if ratio > worst[0]:
+                worst = (ratio, op_name(a.label))
+    return nodes, over, worst, False
+
+
+def difftest(width, height, frame_count, n, backends, sample=stratified,
+             seed=1):
+    rng = np.random.default_rng(seed)
+    refs = {}
+    for b in backends:
+        key = tuple(sorted(b.reference.items()))
+        if key not in refs:
+            refs[key] = Run(Backend('reference', CapturingNumerics, True,
+                                    b.reference, Tolerance(0, 0, 0)),
+                            width, height)
+    runs = [Run(b, width, height) for b in backends]
+    where = []
+    for frame in range(frame_count):
+        ix, iy = sample(width, height, n, rng)
+        where.extend((frame, x, y) for (x, y) in zip(ix.tolist(),
+                                                     iy.tolist()))
+        for run in list(refs.values()) + runs:
+            run.render(frame, ix, iy)
+
+    reports = []
+    for run in runs:
+        ref = refs[tuple(sorted(run.backend.reference.items()))]
+        want = np.concatenate(ref.colors)
+        tol = run.backend.tolerance
+        diff = np.abs(np.concatenate(run.colors) - want).max(axis=1)
+        diverged = np.zeros(len(diff), dtype=bool)
+        nodes = nodes_over = worst_node = None
+        if run.backend.graphs:
+            nodes = nodes_over = 0
+            worst_node = (0.0, None)
+            frame_diverged = []
+            for (a, b) in zip(ref.frame_graphs, run.frame_graphs):
+                n, o, worst_node, d = compare_graphs(a, b, tol, worst_node)
+                nodes, nodes_over = nodes + n, nodes_over + o
+                frame_diverged.append(d)
+            for (i, (a, b)) in enumerate(zip(ref.pixel_graphs,
+                                             run.pixel_graphs)):
+                n, o, worst_node, d = compare_graphs(a, b, tol, worst_node)
+                nodes, nodes_over = nodes + n, nodes_over + o
+                diverged[i] = d or frame_diverged[where[i][0]]
+        # A pixel that took another path may be any color.
+        bad = (diff > tol.unorm) & ~diverged
+        worst = where[int(np.argmax(np.where(diverged, -1, diff)))]
+        reports.append(Report(run.backend.name, len(diff), int(bad.sum()),
+                              int(diff[~diverged].max(initial=0)),
+                              worst if diff[~diverged].any() else None,
+                              int(diverged.sum()), nodes, nodes_over,
+                              worst_node))
+    return reports
+
+
+def over(report):
+    return bool(report.over or report.nodes_over)
+
+
+def print_reports(reports):
+    print('{:14} {:>6} {:>5} {:>4} {:>11} {:>5}  {:>7} {:>5}  {}'.format(
+        'backend', 'pixels', 'over', 'max', 'worst f,x,y', 'paths', 'nodes',
+        'over', 'worst node / tolerance'))
+    for r in reports:
+        worst = '{},{},{}'.format(*r.worst) if r.worst else '-'
+        if r.nodes is None:
+            nodes = '{:>7} {:>5}  -'.format('-', '-')
+        else:
+            ratio, op = r.worst_node
+            nodes = '{:7} {:5}  {}'.format(
+                r.nodes, r.nodes_over,
+                '{} {:.3g}'.format(op, ratio) if op else '-')
+        print('{:14} {:6} {:5} {:4} {:>11} {:5}  {}{}'.format(
+            r.name, r.pixels, r.over, r.max_diff, worst, r.diverged, nodes,
+            '   OVER' if over(r) else ''))
+
+
+def main(argv):
+    from main import WIDTH, HEIGHT
+    parser = argparse.ArgumentParser(
+        description='Cross-check the Numerics backends.')
+    parser.add_argument('-f', '--frames', type=int, default=8)
+    parser.add_argument('-n', '--pixels', type=int, default=256,
+                        help='pixels sampled a frame')
+    parser.add_argument('--random', action='store_true',
+                        help='sample at random, not one per grid cell')
+    parser.add_argument('-s', '--seed', type=int, default=1)
+    parser.add_argument('backends', nargs='*', metavar='backend',
+                        help='any of {} (default: all)'
+                             .format(', '.join(BACKENDS)))
+    args = parser.parse_args(argv)
+    for name in args.backends:
+        if name not in BACKENDS:
+            parser.error('unknown backend {!r}'.format(name))
+
+    backends = [BACKENDS[name] for name in args.backends or BACKENDS]
+    reports = difftest(WIDTH, HEIGHT, args.frames, args.pixels, backends,
+                       scattered if args.random else stratified, args.seed)
+    print('{} frames, {} pixels a frame ({}, seed {}), against float '
+          'Numerics'.format(args.frames, args.pixels,
+                            'random' if args.random else 'stratified',
+                            args.seed))
+    print_reports(reports)
+    if any(over(r) for r in reports):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
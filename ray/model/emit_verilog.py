@@ -0,0 +1,1255 @@
+#!/usr/bin/env python
+
+# Verilog from the recorded frame and pixel DAGs.
+#
+# The scene is rendered once under RangeNumerics (see ranges.py), which
+# gives a merged DAG for each stage, the branch paths the pixels took,
+# and the range of every node.  From those:
+#
+#   ray_pixel    the pixel DAG, fully pipelined.  Every op is a register
+#                stage, so one pixel goes in and one comes out every
+#                clock.  Every branch path is computed, and the tests
+#                pick the result at the end.  Multiplies are SB_MAC16s.
+#   ray_frame    the frame DAG as a small sequential unit: one op per
+#                two clocks, sharing one SB_MAC16 and one sine ROM.
+#   ray_precalc  Scene.precalc_camera and Scene.precalc_sphere, which
+#                are not DAGs.  Hand written; see PRECALC_VERILOG.
+#   painter24    ties them together for led_main.  The frame unit works
+#                on the next frame while the pipeline paints this one.
+#
+# Nodes that are constant over the whole animation are folded, nodes no
+# output needs are dropped, and structurally identical nodes were
+# already merged.  Pixel nodes that depend only on frame values move to
+# the frame unit if it can compute them (see hoist.py); the rest are
+# computed in the pipeline's first stages and hold steady for a frame.
+# The primary ray's direction, before it is normalized, is affine in x
+# and y, so it is kept in accumulators that step as the painter scans,
+# instead of being multiplied out (see strength.py).
+#
+# Every wire is signed fixed point, sized from its range: provable if
+# interval arithmetic bounds it, else observed plus `guard` integer
+# bits.  So the widths are only as good as the frames analyzed.
+# Multiplier operands are rounded to 16 bits to fit the DSP.
+#
+#     $ emit_verilog.py [-f frames] [-d delay] [-o ../ray.v]
+
+import argparse
+import math
+import os
+import sys
+from collections import namedtuple
+
+import gen_tables                       # tables/gen_tables.py
+import hoist
+import numerics
+import ranges
+import scene
+import strength
+
+
+DSP_WIDTH = 16
+UP5K_DSPS = 8
+ANGLE_BITS = numerics.ANGLE_BITS        # angles are 1/1024ths of a circle
+
+Format = namedtuple('Format', 'width frac')
+
+SIN_FORMAT = Format(16, numerics.SIN_FRAC_BITS)
+UNORM_FORMAT = Format(9, 0)
+PIXEL_FORMAT = Format(7, 0)             # Pixel.x and Pixel.y
+
+# The values Scene.precalc_* produces over the whole animation: (lo,
+# hi, fraction bits).  A few rendered frames don't show them all.  Keep
+# in step with PRECALC_VERILOG.
+PRECALC_INPUTS = {
+    'PreCam.pos_u': (0, math.tau, None),
+    'PreCam.pos_v': (0, math.tau, None),
+    'PreSphere.frame64': (0, 63, 0),
+    'PreSphere.frame64m': (-64, -1, 0),
+    'PreSphere.center_x': (-16, 16, 5),
+    'PreSphere.center_z': (-16, 16, 5),
+}
+
+PRECALC_VERILOG = '''\
+module ray_precalc (
+        input         clk,
+        input         reset,
+        input         advance,
+        output  [9:0] PreCam_pos_u,
+        output  [9:0] PreCam_pos_v,
+        output signed [6:0] PreSphere_frame64,
+        output signed [7:0] PreSphere_frame64m,
+        output signed [{ch}:0] PreSphere_center_x,
+        output signed [{ch}:0] PreSphere_center_z);
+
+    // Scene.precalc_camera and Scene.precalc_sphere.  The outputs are
+    // for the current frame; `advance` steps to the next.
+
+    reg  [9:0] pos_u, pos_v;
+    reg  [5:0] frame64;
+    reg signed [{ch}:0] sx, sz, inc_x, inc_z;
+
+    wire signed [{ch}:0] next_x = sx + inc_x;
+    wire signed [{ch}:0] next_z = sz + inc_z;
+
+    always @(posedge clk)
+        if (reset) begin
+            pos_u   <= 2;
+            pos_v   <= 3;
+            frame64 <= 0;
+            sx      <= 0;
+            sz      <= {z0};
+            inc_x   <= {inc_x};
+            inc_z   <= {inc_z};
+        end
+        else if (advance) begin
+            pos_u   <= pos_u + 2;
+            pos_v   <= pos_v + 3;
+            frame64 <= frame64 + 1;
+            sx      <= next_x;
+            sz      <= next_z;
+            if (next_x > {lim} || next_x < -{lim})
+                inc_x <= -inc_x;
+            if (next_z > {lim} || next_z < -{lim})
+                inc_z <= -inc_z;
+        end
+
+    assign PreCam_pos_u       = pos_u;
+    assign PreCam_pos_v       = pos_v;
+    assign PreSphere_frame64  = {{1'b0, frame64}};
+    assign PreSphere_frame64m = {{1'b0, frame64}} - 8'sd64;
+    assign PreSphere_center_x = next_x > {lim} ? {lim} :
+                                next_x < -{lim} ? -{lim} : next_x;
+    assign PreSphere_center_z = next_z > {lim} ? {lim} :
+                                next_z < -{lim} ? -{lim} : next_z;
+
+endmodule // ray_precalc
+'''
+
+MUL_VERILOG = '''\
+module ray_mul (
+        input                clk,
+        input  signed [15:0] a,
+        input  signed [15:0] b,
+        output signed [31:0] p);
+
+    // One SB_MAC16 as a registered 16 x 16 signed multiplier.
+    SB_MAC16 #(
+        .A_SIGNED(1'b1),
+        .B_SIGNED(1'b1),
+        .MODE_8x8(1'b0),
+        .PIPELINE_16x16_MULT_REG2(1'b1),
+        .TOPOUTPUT_SELECT(2'b11),
+        .BOTOUTPUT_SELECT(2'b11)
+    ) mac (
+        .CLK(clk),
+        .CE(1'b1),
+        .A(a),
+        .B(b),
+        .C(16'b0),
+        .D(16'b0),
+        .AHOLD(1'b0),
+        .BHOLD(1'b0),
+        .CHOLD(1'b0),
+        .DHOLD(1'b0),
+        .IRSTTOP(1'b0),
+        .IRSTBOT(1'b0),
+        .ORSTTOP(1'b0),
+        .ORSTBOT(1'b0),
+        .OLOADTOP(1'b0),
+        .OLOADBOT(1'b0),
+        .ADDSUBTOP(1'b0),
+        .ADDSUBBOT(1'b0),
+        .OHOLDTOP(1'b0),
+        .OHOLDBOT(1'b0),
+        .CI(1'b0),
+        .ACCUMCI(1'b0),
+        .SIGNEXTIN(1'b0),
+        .O(p));
+
+endmodule // ray_mul
+'''
+
+DIV_VERILOG = '''\
+module ray_div #(
+        parameter WN = 16,
+        parameter WD = 16,
+        parameter WQ = 16
+    ) (
+        input                 clk,
+        input  signed [WN-1:0] n,
+        input  signed [WD-1:0] d,
+        output signed [WQ:0]   q);
+
+    // q = n / d, truncated, one quotient bit per stage.  Latency
+    // WQ + 1.  Overflow and divide by zero are not detected.
+
+    localparam W = WN + WD + WQ;
+
+    reg  [WN-1:0] r0;
+    reg  [WD-1:0] d0;
+    reg           neg0;
+    always @(posedge clk) begin
+        r0   <= n < 0 ? -n : n;
+        d0   <= d < 0 ? -d : d;
+        neg0 <= (n < 0) ^ (d < 0);
+    end
+
+    genvar i;
+    generate
+        for (i = 0; i < WQ; i = i + 1) begin : step
+            reg  [WN-1:0] r;
+            reg  [WD-1:0] dd;
+            reg  [WQ-1:0] qq;
+            reg           neg;
+            wire [WN-1:0] r_prev;
+            wire [WD-1:0] d_prev;
+            wire [WQ-1:0] q_prev;
+            wire          neg_prev;
+            if (i == 0) begin
+                assign r_prev   = r0;
+                assign d_prev   = d0;
+                assign q_prev   = 0;
+                assign neg_prev = neg0;
+            end
+            else begin
+                assign r_prev   = step[i-1].r;
+                assign d_prev   = step[i-1].dd;
+                assign q_prev   = step[i-1].qq;
+                assign neg_prev = step[i-1].neg;
+            end
+            wire [W-1:0] diff = r_prev - (d_prev << (WQ - 1 - i));
+            always @(posedge clk) begin
+                r   <= diff[W-1] ? r_prev : diff[WN-1:0];
+                qq  <= {q_prev, !diff[W-1]};
+                dd  <= d_prev;
+                neg <= neg_prev;
+            end
+        end
+    endgenerate
+
+    wire signed [WQ:0] mag = {1'b0, step[WQ-1].qq};
+    assign q = step[WQ-1].neg ? -mag : mag;
+
+endmodule // ray_div
+'''
+
+SQRT_VERILOG = '''\
+module ray_sqrt #(
+        parameter WN = 16,
+        parameter WR = 8
+    ) (
+        input                  clk,
+        input  signed [WN-1:0] n,
+        output        [WR-1:0] root);
+
+    // Integer square root, one result bit per stage.  Latency WR + 1.
+    // Negative n reads as zero.
+
+    localparam W = 2 * WR;
+
+    reg  [W-1:0] op0;
+    always @(posedge clk)
+        op0 <= n < 0 ? 0 : n;
+
+    genvar i;
+    generate
+        for (i = 0; i < WR; i = i + 1) begin : step
+            localparam [W-1:0] ONE = {{(W-1){1'b0}}, 1'b1} << (2*(WR-1-i));
+            reg  [W-1:0] op, res;
+            wire [W-1:0] op_prev, res_prev;
+            if (i == 0) begin
+                assign op_prev  = op0;
+                assign res_prev = 0;
+            end
+            else begin
+                assign op_prev  = step[i-1].op;
+                assign res_prev = step[i-1].res;
+            end
+            wire [W:0] diff = op_prev - (res_prev + ONE);
+            always @(posedge clk)
+                if (!diff[W]) begin
+                    op  <= diff[W-1:0];
+                    res <= (res_prev >> 1) + ONE;
+                end
+                else begin
+                    op  <= op_prev;
+                    res <= res_prev >> 1;
+                end
+        end
+    endgenerate
+
+    assign root = step[WR-1].res[WR-1:0];
+
+endmodule // ray_sqrt
+'''
+
+SIN_VERILOG = '''\
+module ray_sin (
+        input                clk,
+        input  [9:0]         angle,
+        output signed [15:0] sin);
+
+    // sin(angle * tau / 1024), 2.14 fixed point.  Latency 1.
+
+    reg  [15:0] sin_table [0:1023];
+    initial $readmemh("sin_table.hex", sin_table);
+
+    reg  [15:0] out;
+    always @(posedge clk)
+        out <= sin_table[angle];
+    assign sin = out;
+
+endmodule // ray_sin
+'''
+
+
+def sin_table():
+    """The contents of sin_table.hex, for ray_sin."""
+    text, _ = gen_tables.hex_table('sin', domain_bits=ANGLE_BITS,
+                                   frac_bits=SIN_FORMAT.frac,
+                                   range_bits=SIN_FORMAT.width)
+    return text
+
+
+def mag_bits(lo, hi):
+    """Integer bits for the magnitude of anything in [lo, hi]."""
+    return int(max(abs(lo), abs(hi))).bit_length()
+
+
+def literal(v):
+    """A signed Verilog literal for the integer v."""
+    return '{}{}\'sd{}'.format('-' if v < 0 else '',
+                               abs(v).bit_length() + 1, abs(v))
+
+
+def align(expr, src, dst):
+    """Shift `expr` from `src` fraction bits to `dst`."""
+    if dst > src:
+        return '({} <<< {})'.format(expr, dst - src)
+    if dst < src:
+        return '({} >>> {})'.format(expr, src - dst)
+    return expr
+
+
+def vname(label):
+    return label.replace('.', '_')
+
+
+def decl(kind, fmt, name):
+    if fmt is None:
+        return '    {}               {};'.format(kind, name)
+    return '    {} signed [{:2}:0] {};'.format(kind, fmt.width - 1, name)
+
+
+def _is_pow2(v):
+    return v != 0 and math.log2(abs(v)).is_integer()
+
+
+class _Emitter:
+    """What the pixel pipeline and the frame unit have in common."""
+
+    def __init__(self, numz, stage, guard):
+        self.numz = numz
+        self.stage = stage
+        self.guard = guard
+        self.fmt = {}
+        self.names = {}
+        self.decls = []
+        self.body = []
+        self.multiplies = 0
+        self.dsps = 0
+        self.uses = set()               # helper modules needed
+
+    def node(self, i):
+        return self.stage.nodes[i]
+
+    def const(self, i):
+        n = self.node(i)
+        return (i in self.stage.constants and
+                n.lo is not None and n.lo == n.hi)
+
+    def ncomp(self, i):
+        return 3 if self.node(i).type in ('vector', 'rgbunorm') else 1
+
+    def comp(self, i, c):
+        return c if self.ncomp(i) > 1 else 0
+
+    def format(self, i):
+        n = self.node(i)
+        if n.type == 'angle':
+            return Format(ANGLE_BITS, None)
+        if n.type == 'bool':
+            return None
+        if n.op in ('sin', 'cos'):
+            return SIN_FORMAT
+        if n.type == 'rgbunorm':
+            return UNORM_FORMAT
+        prov = n.provable and (min(a[0] for a in n.provable),
+                               max(a[1] for a in n.provable))
+        if prov and all(map(math.isfinite, prov)):
+            mag = mag_bits(*prov)
+        else:
+            mag = mag_bits(*n.observed) + self.guard
+        frac = self.numz.frac_bits(n)
+        return Format(1 + mag + frac, frac)
+
+    def live(self, roots):
+        """Nodes that `roots` need, in topological (id) order."""
+        seen = set()
+        todo = list(roots)
+        while todo:
+            i = todo.pop()
+            if i in seen:
+                continue
+            seen.add(i)
+            if not self.const(i):
+                todo.extend(self.node(i).preds)
+        return sorted(seen)
+
+    def value(self, i, c):
+        return self.node(i).lo[self.comp(i, c)]
+
+    def val(self, i, c, frac, t=None):
+        """Component c of node i, aligned to `frac` fraction bits."""
+        if self.const(i):
+            return literal(round(self.value(i, c) * 2 ** frac))
+        return align(self.ref(i, self.comp(i, c), t), self.fmt[i].frac, frac)
+
+    def angle(self, i, t=None, offset=0):
+        if self.const(i):
+            units = round(self.value(i, 0) * 1024 / math.tau) + offset
+            return "10'd{}".format(units % 1024)
+        ref = self.ref(i, 0, t)
+        return '{} + 10\'d{}'.format(ref, offset) if offset else ref
+
+    def dsp_operand(self, i, c, t=None):
+        """(expr, frac) of node i rounded to fit a DSP input."""
+        if self.const(i):
+            v = self.value(i, c)
+            frac = DSP_WIDTH - 1 - mag_bits(v, v)
+            q = round(v * 2 ** frac)
+            q = max(-(1 << DSP_WIDTH - 1), min(q, (1 << DSP_WIDTH - 1) - 1))
+            return literal(q), frac
+        w, frac = self.fmt[i]
+        ref = self.ref(i, self.comp(i, c), t)
+        if w > DSP_WIDTH:
+            s = w - DSP_WIDTH
+            return '$signed({}[{}:{}])'.format(ref, w - 1, s), frac - s
+        return ref, frac
+
+    def zero(self, i, c):
+        return self.const(i) and self.value(i, c) == 0
+
+    def pow2_operand(self, a, ca, b, cb):
+        """If a or b is a constant power of two: (other, its comp, log2
+           of the constant, is it negative).  Else None.
+        """
+        for (x, cx, y, cy) in ((a, ca, b, cb), (b, cb, a, ca)):
+            if self.const(x) and _is_pow2(self.value(x, cx)):
+                v = self.value(x, cx)
+                return y, cy, int(math.log2(abs(v))), v < 0
+        return None
+
+    def comp_names(self, i):
+        base = 'n{}'.format(i)
+        if self.ncomp(i) == 1:
+            return [base]
+        return ['{}_{}'.format(base, c) for c in range(self.ncomp(i))]
+
+
+class Pipeline(_Emitter):
+    """The pixel DAG as a fully pipelined module.
+
+       `at[i]` is the clock a node's value is valid at, counting from
+       the clock x and y arrive.  Nodes that only depend on frame values
+       and constants have no `at`; they hold for the whole frame.
+    """
+
+    def __init__(self, numz, stage, frame_formats, guard=1):
+        super().__init__(numz, stage, guard)
+        self.at = {}
+        self.delays = {}            # name -> (depth, format)
+        self.ports = []             # (port name, format), frame values
+        self.temps = 0
+        self.scanning = False
+        paths = sorted(stage.paths.items(),
+                       key=lambda p: -stage.path_counts[p[0]])
+        self.paths = [(tests, outs[0]) for (tests, outs) in paths]
+        roots = [o for (_, o) in self.paths]
+        roots += [t for (tests, _) in self.paths for (t, _) in tests]
+        for i in self.live(roots):
+            self.fmt[i] = self.format(i)
+            if self.const(i):
+                continue
+            n = self.node(i)
+            if i in stage.inputs:
+                self._input(i, n, frame_formats)
+            else:
+                self._op(i, n)
+        self.latency = self._mux() + 1
+
+    def ref(self, i, c, t):
+        name = self.names[i][c]
+        if t is None or self.at[i] is None or t == self.at[i]:
+            return name
+        assert t > self.at[i], (i, t, self.at[i])
+        depth = t - self.at[i]
+        old, fmt = self.delays.get(name, (0, self.fmt[i]))
+        self.delays[name] = (max(old, depth), fmt)
+        return '{}_d{}'.format(name, depth)
+
+    def _input(self, i, n, frame_formats):
+        if n.op in ('Pixel.x', 'Pixel.y'):
+            name = self.comp_names(i)[0]
+            self.fmt[i] = PIXEL_FORMAT
+            self.decls.append(decl('wire', PIXEL_FORMAT, name))
+            self.body.append('    assign {} = {{1\'b0, {}}};'
+                             .format(name, n.op[-1]))
+            self.names[i] = [name]
+            self.at[i] = 0
+            return
+        if n.op.startswith('Scan.'):
+            self._scan(i, n)
+            return
+        if n.op not in frame_formats:
+            raise ValueError('pixel input {} is not a frame output'
+                             .format(n.op))
+        self.fmt[i] = frame_formats[n.op]
+        names = ['{}{}'.format(vname(n.op), s)
+                 for s in _suffixes(self.ncomp(i))]
+        self.ports += [(name, self.fmt[i]) for name in names]
+        self.names[i] = names
+        self.at[i] = None
+
+    def _scan(self, i, n):
+        """A Scan input: base + x dx + y dy, kept by adding dx when x
+           steps and dy when y steps.  Valid a clock after x and y.
+        """
+        w, frac = self.format(i)
+        self.fmt[i] = fmt = Format(w + n.scan_frac - frac, n.scan_frac)
+        rows = strength.PAINTER_ROWS.bit_length() - 1
+        if not self.scanning:
+            self.scanning = True
+            self.decls += ['    reg     [5:0] scan_x;',
+                           '    reg     [5:0] scan_y;']
+            self.body += ['    // The painter counts x along a row, then y, and',
+                          '    // may hold a count for a few clocks.',
+                          '    always @(posedge clk) begin',
+                          '        scan_x <= x;',
+                          '        scan_y <= y;',
+                          '    end']
+        names = self.comp_names(i)
+        for (name, coeffs) in zip(names, n.scan):
+            bases, dx, dy = strength.quantize(coeffs, fmt.frac)
+            assert len(bases) == 2
+            self.decls += [decl('reg ', fmt, name + '_row'),
+                           decl('wire', fmt, name + '_row_next'),
+                           decl('reg ', fmt, name)]
+            self.body += [
+                '    assign {}_row_next = scan_y == y ? {}_row :'
+                .format(name, name),
+                '        y[{}:0] == 0 ? (y[{}] ? {} : {}) : {}_row + {};'
+                .format(rows - 1, rows, literal(bases[1]), literal(bases[0]),
+                        name, literal(dy)),
+                '    always @(posedge clk) begin',
+                '        {0}_row <= {0}_row_next;'.format(name),
+                '        if (x == 0)',
+                '            {0} <= {0}_row_next;'.format(name),
+                '        else if (x != scan_x)',
+                '            {0} <= {0} + {1};'.format(name, literal(dx)),
+                '    end']
+        self.names[i] = names
+        self.at[i] = 1
+
+    def _when(self, preds):
+        dyn = [self.at[p] for p in preds
+               if not self.const(p) and self.at[p] is not None]
+        return (max(dyn), True) if dyn else (0, False)
+
+    def _reg(self, i, exprs, t, dyn, latency=1, fmt=None):
+        fmt = fmt or self.fmt[i]
+        names = self.comp_names(i)
+        self.decls += [decl('reg ', fmt, name) for name in names]
+        self.body.append('    always @(posedge clk) begin')
+        self.body += ['        {} <= {};'.format(name, e)
+                      for (name, e) in zip(names, exprs)]
+        self.body.append('    end')
+        self.names[i] = names
+        self.at[i] = t + latency if dyn else None
+
+    def _wire(self, i, exprs, at, fmt=None):
+        fmt = fmt or self.fmt[i]
+        names = self.comp_names(i)
+        self.decls += [decl('wire', fmt, name) for name in names]
+        self.body += ['    assign {} = {};'.format(name, e)
+                      for (name, e) in zip(names, exprs)]
+        self.names[i] = names
+        self.at[i] = at
+
+    def _product(self, a, ca, b, cb, t):
+        """a × b, registered.  Returns (expr, frac), valid at t + 1."""
+        if self.zero(a, ca) or self.zero(b, cb):
+            return literal(0), 0
+        self.multiplies += 1
+        name = 'm{}'.format(self.temps)
+        self.temps += 1
+        shift = self.pow2_operand(a, ca, b, cb)
+        if shift:
+            # A power of two is a shift, which costs nothing.
+            (y, cy, k, neg) = shift
+            w, frac = self.fmt[y]
+            ref = self.ref(y, self.comp(y, cy), t)
+            self.decls.append(decl('reg ', Format(w + 1, frac), name))
+            self.body.append('    always @(posedge clk) {} <= {}{};'
+                             .format(name, '-' if neg else '', ref))
+            return name, frac - k
+        (ea, fa) = self.dsp_operand(a, ca, t)
+        (eb, fb) = self.dsp_operand(b, cb, t)
+        self.decls.append(decl('wire', Format(32, None), name))
+        self.body.append('    ray_mul mul{} (.clk(clk), .a({}), .b({}), '
+                         '.p({}));'.format(self.dsps, ea, eb, name))
+        self.dsps += 1
+        self.uses.add('mul')
+        return name, fa + fb
+
+    def _op(self, i, n):
+        op, preds = n.op, n.preds
+        t, dyn = self._when(preds)
+        frac = self.fmt[i] and self.fmt[i].frac
+        comps = range(self.ncomp(i))
+
+        if op.startswith('index') or i in self.stage.outputs:
+            (p, ) = preds
+            self.fmt[i] = self.fmt[p]
+            k = int(op[5:]) if op.startswith('index') else None
+            self.names[i] = ([self.names[p][k]] if k is not None
+                             else self.names[p])
+            self.at[i] = self.at[p]
+
+        elif op == 'vec':
+            self._wire(i, [self.val(p, 0, frac, t) for p in preds],
+                       t if dyn else None)
+
+        elif op in ('add', 'sub'):
+            (a, b) = preds
+            sign = '+' if op == 'add' else '-'
+            self._reg(i, ['{} {} {}'.format(self.val(a, c, frac, t), sign,
+                                            self.val(b, c, frac, t))
+                          for c in comps], t, dyn)
+
+        elif op == 'abs':
+            (a, ) = preds
+            v = self.val(a, 0, frac, t)
+            self._reg(i, ['{0} < 0 ? -{0} : {0}'.format(v)], t, dyn)
+
+        elif op == 'mul':
+            (a, b) = preds
+            ps = [self._product(a, c, b, c, t) for c in comps]
+            self._wire(i, [align(p, fp, frac) for (p, fp) in ps],
+                       t + 1 if dyn else None)
+
+        elif op == 'dot':
+            (a, b) = preds
+            ps = [self._product(a, c, b, c, t) for c in range(3)]
+            self._reg(i, [' + '.join(align(p, fp, frac) for (p, fp) in ps)],
+                      t + 1, dyn)
+
+        elif op in ('rotX', 'rotY'):
+            (v, s, c) = preds
+            x, y, z = ((0, 1, 2) if op == 'rotX' else (1, 2, 0))
+            cy, sz = self._product(c, 0, v, y, t), self._product(s, 0, v, z, t)
+            sy, cz = self._product(s, 0, v, y, t), self._product(c, 0, v, z, t)
+            rot = {x: self.val(v, x, frac, t + 1),
+                   y: '{} - {}'.format(align(*cy, frac), align(*sz, frac)),
+                   z: '{} + {}'.format(align(*sy, frac), align(*cz, frac))}
+            self._reg(i, [rot[k] for k in range(3)], t + 1, dyn)
+
+        elif op in ('div', 'recip', 'sqrt', 'rsqrt') and len(comps) == 1:
+            getattr(self, '_' + op)(i, preds, t, dyn)
+
+        elif op in ('sin', 'cos'):
+            (a, ) = preds
+            name = self.comp_names(i)[0]
+            self.decls.append(decl('wire', SIN_FORMAT, name))
+            self.body.append('    ray_sin rom{} (.clk(clk), .angle({}), '
+                             '.sin({}));'.format(
+                                 i, self.angle(a, t, 256 if op == 'cos' else 0),
+                                 name))
+            self.uses.add('sin')
+            self.names[i] = [name]
+            self.at[i] = t + 1 if dyn else None
+
+        elif op == 'unorm':
+            (a, ) = preds
+            fa = self.fmt[a].frac
+            exprs = []
+            for c in comps:
+                v = self.val(a, c, fa, t)
+                scaled = 'u{}_{}'.format(i, c)
+                half = ' + {}'.format(literal(1 << fa - 1)) if fa else ''
+                self.decls.append(decl('wire', Format(self.fmt[a].width + 10,
+                                                      None), scaled))
+                self.body.append('    assign {} = {};'.format(
+                    scaled, align('(({0} <<< 8) - {0}{1})'.format(v, half),
+                                  fa, 0)))
+                exprs.append('{0} < 0 ? 0 : {0} > 255 ? 255 : {0}'
+                             .format(scaled))
+            self._reg(i, exprs, t, dyn)
+
+        elif op == 'xor4':
+            bits = []
+            for p in preds:
+                if self.const(p):
+                    bits.append("1'b{}".format(
+                        math.floor(self.value(p, 0)) >> 2 & 1))
+                else:
+                    w, fp = self.fmt[p]
+                    bits.append('{}[{}]'.format(self.ref(p, 0, t),
+                                                min(fp + 2, w - 1)))
+            self._reg(i, [align('$signed({{1\'b0, {} ^ {}}})'.format(*bits),
+                                0, frac)], t, dyn)
+
+        elif op == 'is_neg':
+            (a, ) = preds
+            name = 't{}'.format(i)
+            if self.const(a):
+                bit, self.at[i] = "1'b{}".format(int(self.value(a, 0) < 0)), None
+            else:
+                bit = '{}[{}]'.format(self.names[a][0], self.fmt[a].width - 1)
+                self.at[i] = self.at[a]
+            self.decls.append(decl('wire', None, name))
+            self.body.append('    assign {} = {};'.format(name, bit))
+            self.names[i] = [name]
+
+        else:
+            raise NotImplementedError('pixel op {!r}'.format(op))
+
+    def _divider(self, num, wa, fa, den, wb, fb, fmt, t):
+        """num / den into `fmt`, started at clock t.  Returns (wire,
+           clock it is valid at).
+        """
+        wq, fq = fmt
+        k = fq - fa + fb
+        if k >= 0:
+            num, wn, wd = align(num, 0, k), wa + k, wb
+        else:
+            den, wn, wd = align(den, 0, -k), wa, wb - k
+        name = 'q{}'.format(self.temps)
+        self.temps += 1
+        self.decls.append(decl('wire', fmt, name))
+        self.body.append('    ray_div #(.WN({}), .WD({}), .WQ({})) div_{} '
+                         '(.clk(clk), .n({}), .d({}), .q({}));'
+                         .format(wn, wd, wq - 1, name, num, den, name))
+        self.uses.add('div')
+        return name, t + wq
+
+    def _rooter(self, arg, wa, fa, fr, t):
+        """sqrt(arg) with `fr` fraction bits, started at clock t.
+           Returns (wire, Format, clock it is valid at).
+        """
+        k = 2 * fr - fa
+        wn = wa + max(k, 0)
+        bits = (wn + 1) // 2
+        fmt = Format(bits + 1, fr)
+        name = 'r{}'.format(self.temps)
+        self.temps += 1
+        self.decls.append('    wire        [{:2}:0] {}_root;'
+                          .format(bits - 1, name))
+        self.decls.append(decl('wire', fmt, name))
+        self.body.append('    ray_sqrt #(.WN({}), .WR({})) sqrt_{} '
+                         '(.clk(clk), .n({}), .root({}_root));'
+                         .format(wn, bits, name, align(arg, 0, k), name))
+        self.body.append('    assign {0} = {{1\'b0, {0}_root}};'.format(name))
+        self.uses.add('sqrt')
+        return name, fmt, t + bits + 1
+
+    def _div(self, i, preds, t, dyn):
+        (a, b) = preds
+        wa, fa = self.fmt[a]
+        wb, fb = self.fmt[b]
+        q, at = self._divider(self.val(a, 0, fa, t), wa, fa,
+                              self.val(b, 0, fb, t), wb, fb, self.fmt[i], t)
+        self._wire(i, [q], at if dyn else None)
+
+    def _recip(self, i, preds, t, dyn):
+        (b, ) = preds
+        wb, fb = self.fmt[b]
+        q, at = self._divider(literal(1), 2, 0, self.val(b, 0, fb, t), wb, fb,
+                              self.fmt[i], t)
+        self._wire(i, [q], at if dyn else None)
+
+    def _sqrt(self, i, preds, t, dyn):
+        (a, ) = preds
+        wa, fa = self.fmt[a]
+        r, fmt, at = self._rooter(self.val(a, 0, fa, t), wa, fa,
+                                  self.fmt[i].frac, t)
+        self._wire(i, [r], at if dyn else None)
+
+    def _rsqrt(self, i, preds, t, dyn):
+        # The model's Newton-Raphson iterations are only there to study
+        # accuracy.  Here it is the square root unit, then the divider.
+        (a, ) = preds
+        wa, fa = self.fmt[a]
+        fr = max((fa + 1) // 2, self.fmt[i].frac)
+        r, fmt, t1 = self._rooter(self.val(a, 0, fa, t), wa, fa, fr, t)
+        q, at = self._divider(literal(1), 2, 0, r, fmt.width, fmt.frac,
+                              self.fmt[i], t1)
+        self._wire(i, [q], at if dyn else None)
+
+    def _mux(self):
+        """Pick each pixel's color by its branch path.  Returns the
+           clock the choice is made at.
+        """
+        nodes = [o for (_, o) in self.paths]
+        nodes += [t for (tests, _) in self.paths for (t, _) in tests]
+        s = max([self.at.get(i) or 0 for i in nodes if not self.const(i)]
+                + [0])
+
+        def color(o):
+            if self.const(o):
+                return '{{{}}}'.format(', '.join(
+                    "8'd{}".format(int(self.value(o, c))) for c in (2, 1, 0)))
+            return '{{{}}}'.format(', '.join(
+                '{}[7:0]'.format(self.ref(o, c, s)) for c in (2, 1, 0)))
+
+        def test(i, outcome):
+            if self.const(i):
+                return "1'b{}".format(int((self.value(i, 0) < 0) == outcome))
+            return '{}{}'.format('' if outcome else '!', self.ref(i, 0, s))
+
+        self.body.append('    always @(posedge clk)')
+        for (k, (tests, out)) in enumerate(self.paths):
+            if k == len(self.paths) - 1:
+                head = 'else ' if k else ''
+            else:
+                cond = ' && '.join(test(i, o) for (i, o) in tests) or "1'b1"
+                head = '{}if ({})\n            '.format(
+                    'else ' if k else '', cond)
+            self.body.append('        {}rgb <= {};'.format(head, color(out)))
+        return s
+
+    def verilog(self):
+        lines = ['module ray_pixel (',
+                 '        input         clk,',
+                 '        input   [5:0] x,',
+                 '        input   [5:0] y,']
+        lines += ['        input  signed [{:2}:0] {},'.format(f.width - 1, p)
+                  if f.frac is not None else
+                  '        input   [{}:0] {},'.format(f.width - 1, p)
+                  for (p, f) in self.ports]
+        lines += ['        output reg [23:0] rgb);',
+                  '',
+                  '    // Latency {} clocks, {} multiplies, {} SB_MAC16s.'
+                  .format(self.latency, self.multiplies, self.dsps),
+                  '']
+        lines += self.decls
+        for (name, (depth, fmt)) in sorted(self.delays.items()):
+            lines += [decl('reg ', fmt, '{}_d{}'.format(name, d))
+                      for d in range(1, depth + 1)]
+        lines.append('')
+        lines += self.body
+        for (name, (depth, _)) in sorted(self.delays.items()):
+            lines.append('    always @(posedge clk) begin')
+            for d in range(1, depth + 1):
+                src = name if d == 1 else '{}_d{}'.format(name, d - 1)
+                lines.append('        {}_d{} <= {};'.format(name, d, src))
+            lines.append('    end')
+        lines += ['', 'endmodule // ray_pixel']
+        return '\n'.join(lines) + '\n'
+
+
+class FrameUnit(_Emitter):
+    """The frame DAG as a sequencer: one op every two clocks.
+
+       In the first clock of a step the operands go to the shared
+       multiplier or sine ROM; in the second the result is stored.
+    """
+
+    def __init__(self, numz, stage, guard=1):
+        super().__init__(numz, stage, guard)
+        self.steps = []             # (ma, mb, angle, name, result)
+        self.inputs = []            # (port name, format)
+        self.outputs = []           # (label, port name, format, source)
+        outs = [i for i in sorted(stage.outputs) if not self.const(i)]
+        for i in self.live(outs):
+            n = self.node(i)
+            if self.const(i):
+                self.fmt[i] = self.format(i)
+                continue
+            if i in stage.inputs:
+                self._input(i, n)
+            else:
+                self.fmt[i] = self.format(i)
+                self._op(i, n)
+        for i in outs:
+            for (s, name) in zip(_suffixes(self.ncomp(i)), self.names[i]):
+                self.outputs.append((self.node(i).op, vname(self.node(i).op)
+                                     + s, self.fmt[i], name))
+
+    def ref(self, i, c, t=None):
+        return self.names[i][c]
+
+    def formats(self):
+        """label -> Format of every non-constant output."""
+        return {label: fmt for (label, _, fmt, _) in self.outputs}
+
+    def _input(self, i, n):
+        if n.op not in PRECALC_INPUTS:
+            raise ValueError('frame input {} has no precalc; see '
+                             'PRECALC_INPUTS'.format(n.op))
+        (lo, hi, frac) = PRECALC_INPUTS[n.op]
+        if frac is None:
+            self.fmt[i] = Format(ANGLE_BITS, None)
+        else:
+            self.fmt[i] = Format(1 + mag_bits(lo, hi) + frac, frac)
+        self.names[i] = [vname(n.op)]
+        self.inputs.append((vname(n.op), self.fmt[i]))
+
+    def _step(self, i, c, result, ma='0', mb='0', angle=None):
+        name = self.comp_names(i)[c]
+        self.steps.append((ma, mb, angle, name, result))
+        return name
+
+    def _op(self, i, n):
+        op, preds = n.op, n.preds
+        frac = self.fmt[i].frac
+        comps = range(self.ncomp(i))
+        names = self.comp_names(i)
+        if op.startswith('index') or i in self.stage.outputs:
+            (p, ) = preds
+            self.fmt[i] = self.fmt[p]
+            k = int(op[5:]) if op.startswith('index') else None
+            self.names[i] = ([self.names[p][k]] if k is not None
+                             else self.names[p])
+            return
+        if op == 'vec':
+            self.decls += [decl('wire', self.fmt[i], name) for name in names]
+            self.body += ['    assign {} = {};'.format(
+                              name, self.val(p, 0, frac))
+                          for (name, p) in zip(names, preds)]
+            self.names[i] = names
+            return
+        self.decls += [decl('reg ', self.fmt[i], name) for name in names]
+        self.names[i] = names
+        if op in ('add', 'sub'):
+            (a, b) = preds
+            sign = '+' if op == 'add' else '-'
+            for c in comps:
+                self._step(i, c, '{} {} {}'.format(self.val(a, c, frac), sign,
+                                                   self.val(b, c, frac)))
+        elif op == 'abs':
+            v = self.val(preds[0], 0, frac)
+            self._step(i, 0, '{0} < 0 ? -{0} : {0}'.format(v))
+        elif op == 'mul':
+            (a, b) = preds
+            for c in comps:
+                if self.zero(a, c) or self.zero(b, c):
+                    self._step(i, c, literal(0))
+                    continue
+                self.multiplies += 1
+                shift = self.pow2_operand(a, c, b, c)
+                if shift:
+                    (y, cy, k, neg) = shift
+                    v = self.val(y, cy, frac + k)
+                    self._step(i, c, '-' + v if neg else v)
+                    continue
+                (ea, fa) = self.dsp_operand(a, c)
+                (eb, fb) = self.dsp_operand(b, c)
+                self._step(i, c, align('mp', fa + fb, frac), ea, eb)
+                self.uses.add('mul')
+        elif op == 'dot':
+            # Three multiply steps, accumulating.
+            (a, b) = preds
+            name = names[0]
+            acc = ''
+            for c in range(3):
+                if self.zero(a, c) or self.zero(b, c):
+                    continue
+                self.multiplies += 1
+                shift = self.pow2_operand(a, c, b, c)
+                if shift:
+                    (y, cy, k, neg) = shift
+                    v = self.val(y, cy, frac + k)
+                    self._step(i, 0, acc + ('-' + v if neg else v))
+                else:
+                    (ea, fa) = self.dsp_operand(a, c)
+                    (eb, fb) = self.dsp_operand(b, c)
+                    self._step(i, 0, acc + align('mp', fa + fb, frac),
+                               ea, eb)
+                    self.uses.add('mul')
+                acc = name + ' + '
+            if not acc:
+                self._step(i, 0, literal(0))
+        elif op in ('sin', 'cos'):
+            angle = self.angle(preds[0], offset=256 if op == 'cos' else 0)
+            self._step(i, 0, 'sin_q', angle=angle)
+            self.uses.add('sin')
+        else:
+            raise NotImplementedError('frame op {!r}'.format(op))
+
+    def verilog(self):
+        sb = max(1, (len(self.steps) - 1).bit_length())
+        lines = ['module ray_frame (',
+                 '        input         clk,',
+                 '        input         start,']
+        for (p, f) in self.inputs:
+            lines.append(_port('input ', f, p))
+        for (_, p, f, _) in self.outputs:
+            lines.append(_port('output', f, p))
+        lines += ['        output reg    busy);',
+                  '',
+                  '    // {} steps, {} clocks.'.format(len(self.steps),
+                                                      2 * len(self.steps)),
+                  '',
+                  '    reg  [{}:0] step;'.format(sb - 1),
+                  '    reg         phase;',
+                  '    reg  signed [15:0] ma, mb;',
+                  '    wire signed [31:0] mp;',
+                  '    reg  [9:0] angle;',
+                  '    wire signed [15:0] sin_q;']
+        lines += self.decls
+        lines += ['',
+                  '    ray_mul mul (.clk(clk), .a(ma), .b(mb), .p(mp));',
+                  '    ray_sin rom (.clk(clk), .angle(angle), .sin(sin_q));',
+                  '']
+        lines += self.body
+        lines += ['',
+                  '    always @* begin',
+                  '        ma    = 0;',
+                  '        mb    = 0;',
+                  '        angle = 0;',
+                  '        case (step)']
+        for (k, (ma, mb, angle, _, _)) in enumerate(self.steps):
+            if angle is not None:
+                lines.append('            {:2}: angle = {};'.format(k, angle))
+            elif ma != '0':
+                lines.append('            {:2}: begin ma = {}; mb = {}; end'
+                             .format(k, ma, mb))
+        lines += ['        endcase',
+                  '    end',
+                  '',
+                  '    always @(posedge clk)',
+                  '        if (start) begin',
+                  '            step  <= 0;',
+                  '            phase <= 0;',
+                  '            busy  <= 1;',
+                  '        end',
+                  '        else if (busy) begin',
+                  '            phase <= !phase;',
+                  '            if (phase) begin',
+                  '                case (step)']
+        for (k, (_, _, _, name, result)) in enumerate(self.steps):
+            lines.append('                    {:2}: {} <= {};'
+                         .format(k, name, result))
+        lines += ['                endcase',
+                  '                step <= step + 1;',
+                  '                if (step == {})'.format(len(self.steps) - 1),
+                  '                    busy <= 0;',
+                  '            end',
+                  '        end',
+                  '']
+        lines += ['    assign {} = {};'.format(p, src)
+                  for (_, p, _, src) in self.outputs]
+        lines += ['', 'endmodule // ray_frame']
+        return '\n'.join(lines) + '\n'
+
+
+def _suffixes(n):
+    return [''] if n == 1 else ['_{}'.format(c) for c in range(n)]
+
+
+def _port(kind, fmt, name):
+    if fmt.frac is None:
+        return '        {}  [{}:0] {},'.format(kind, fmt.width - 1, name)
+    return '        {} signed [{:2}:0] {},'.format(kind, fmt.width - 1, name)
+
+
+def painter24(frame, pixel, frame_bits, delay):
+    lines = ['module painter24 #(',
+             '        parameter DELAY = {}'.format(delay),
+             '    ) (',
+             '        input         clk,',
+             '        input         reset,',
+             '        input   [{}:0] frame,'.format(frame_bits - 1),
+             '        input   [7:0] subframe,',
+             '        input   [5:0] x,',
+             '        input   [5:0] y,',
+             '        output [23:0] rgb24);',
+             '',
+             '    localparam LATENCY = {};'.format(pixel.latency),
+             '',
+             '    // On each new frame, latch what the frame unit computed',
+             '    // during the last one and start on the next.',
+             '    reg   [{}:0] last_frame;'.format(frame_bits - 1),
+             '    reg         started;',
+             '    wire        new_frame = frame != last_frame;',
+             '    always @(posedge clk) begin',
+             '        last_frame <= frame;',
+             '        started    <= !reset;',
+             '    end',
+             '']
+    pre = [(vname(label), None) for label in PRECALC_INPUTS]
+    for (p, f) in frame.inputs:
+        lines.append(_decl_plain('wire', f, 'pre_' + p))
+    for (_, p, f, _) in frame.outputs:
+        lines.append(_decl_plain('wire', f, 'nxt_' + p))
+        lines.append(_decl_plain('reg ', f, 'cur_' + p))
+    lines += ['',
+              '    ray_precalc precalc (',
+              '        .clk(clk),',
+              '        .reset(reset),',
+              '        .advance(new_frame),']
+    used = {p for (p, _) in frame.inputs}
+    lines += ['        .{0}({1}),'.format(p, 'pre_' + p if p in used else '')
+              for (p, _) in pre]
+    lines[-1] = lines[-1].rstrip(',') + ');'
+    lines += ['',
+              '    ray_frame frame_unit (',
+              '        .clk(clk),',
+              '        .start(new_frame || !started),']
+    lines += ['        .{0}(pre_{0}),'.format(p) for (p, _) in frame.inputs]
+    lines += ['        .{0}(nxt_{0}),'.format(p)
+              for (_, p, _, _) in frame.outputs]
+    lines += ['        .busy());',
+              '',
+              '    always @(posedge clk)',
+              '        if (new_frame) begin']
+    lines += ['            cur_{0} <= nxt_{0};'.format(p)
+              for (_, p, _, _) in frame.outputs]
+    lines += ['        end',
+              '',
+              '    wire [23:0] rgb;',
+              '    ray_pixel pixel (',
+              '        .clk(clk),',
+              '        .x(x),',
+              '        .y(y),']
+    lines += ['        .{0}(cur_{0}),'.format(p) for (p, _) in pixel.ports]
+    lines += ['        .rgb(rgb));',
+              '',
+              '    generate',
+              '        if (DELAY == LATENCY)',
+              '            assign rgb24 = rgb;',
+              '        else begin',
+              '            reg [24*(DELAY-LATENCY)-1:0] pad;',
+              '            always @(posedge clk)',
+              '                pad <= {pad, rgb};',
+              '            assign rgb24 = pad[24*(DELAY-LATENCY)-1 -: 24];',
+              '        end',
+              '    endgenerate',
+              '',
+              'endmodule // painter24']
+    return '\n'.join(lines) + '\n'
+
+
+def _decl_plain(kind, fmt, name):
+    if fmt.frac is None:
+        return '    {}        [{:2}:0] {};'.format(kind, fmt.width - 1, name)
+    return decl(kind, fmt, name)
+
+
+def top(frame_bits, delay):
+    return '\n'.join([
+        'module top (',
+        '        input         CLK,',
+        '        input         BTN_N,',
+        '        output [15:0] LED_PANEL);',
+        '',
+        '    led_main #(',
+        '        .FRAME_BITS({}),'.format(frame_bits),
+        '        .DELAY({})'.format(delay),
+        '    ) main (',
+        '        .CLK(CLK),',
+        '        .resetn_btn(BTN_N),',
+        '        .LED_PANEL(LED_PANEL));',
+        '',
+        'endmodule']) + '\n'
+
+
+def analyze(frame_count, width=64, height=64):
+    input_ranges = {label: [(lo, hi)]
+                    for (label, (lo, hi, _)) in PRECALC_INPUTS.items()}
+    numz = ranges.RangeNumerics(input_ranges=input_ranges)
+    my_scene = scene.Scene(width, height, numerics=numz)
+    for pixels in my_scene.render_anim(frame_count):
+        pass
+    numz.prove()
+    return numz
+
+
+def emit(numz, frame_bits=8, delay=None, guard=1, frames=None):
+    """Returns (Verilog source, pixel Pipeline, FrameUnit)."""
+    frame = FrameUnit(numz, numz.stages['Frame'], guard)
+    pixel = Pipeline(numz, numz.stages['Pixel'], frame.formats(), guard)
+    delay = pixel.latency if delay is None else delay
+    if delay < pixel.latency:
+        raise ValueError('DELAY {} is less than the pipeline latency {}'
+                         .format(delay, pixel.latency))
+    uses = pixel.uses | frame.uses | {'mul', 'sin'}
+    (lo, hi, cf) = PRECALC_INPUTS['PreSphere.center_x']
+    ch = mag_bits(lo, hi) + cf
+    parts = [
+        '// Generated by ray/model/emit_verilog.py{}.  Do not edit.\n'
+        '//\n'
+        '// Pixel pipeline: latency {} clocks, {} multiplies on {} '
+        'SB_MAC16s,\n'
+        '// times two painters.  Frame unit: {} steps on 1 SB_MAC16.  '
+        'The UP5K\n'
+        '// has {}.\n'.format(
+            ', analyzing {} frames'.format(frames) if frames else '',
+            pixel.latency, pixel.multiplies, pixel.dsps, len(frame.steps),
+            UP5K_DSPS),
+        '`default_nettype none\n\n'
+        '`include "../include/led-pdm-gamma.v"\n',
+        top(frame_bits, delay),
+        painter24(frame, pixel, frame_bits, delay),
+        pixel.verilog(),
+        frame.verilog(),
+        PRECALC_VERILOG.format(ch=ch,
+                               z0=literal(5 << cf),
+                               inc_x=literal(7 << cf >> 5),
+                               inc_z=literal(4 << cf >> 5),
+                               lim=literal(16 << cf)),
+    ]
+    parts += [{'mul': MUL_VERILOG, 'div': DIV_VERILOG,
+               'sqrt': SQRT_VERILOG, 'sin': SIN_VERILOG}[u]
+              for u in ('mul', 'div', 'sqrt', 'sin') if u in uses]
+    return '\n\n'.join(parts), pixel, frame
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description='Generate the ray tracer Verilog from the model.')
+    parser.add_argument('-f', '--frames', type=int, default=2,
+                        help='frames to analyze for ranges (default: 2)')
+    parser.add_argument('-d', '--delay', type=int, default=None,
+                        help='painter DELAY (default: pipeline latency)')
+    parser.add_argument('-b', '--frame-bits', type=int, default=8)
+    parser.add_argument('-g', '--guard', type=int, default=1,
+                        help='extra integer bits on observed ranges')
+    parser.add_argument('-o', '--output', default='ray.v')
+    parser.add_argument('--no-hoist', action='store_true',
+                        help='leave pixel-invariant nodes in the pipeline')
+    parser.add_argument('--no-scan', action='store_true',
+                        help='multiply out the ray setup for every pixel')
+    args = parser.parse_args(argv)
+
+    numz = analyze(args.frames)
+    if not args.no_hoist:
+        numz = hoist.hoist(numz)
+    if not args.no_scan:
+        numz = strength.reduce(numz)
+    text, pixel, frame = emit(numz, args.frame_bits, args.delay, args.guard,
+                              args.frames)
+    with open(args.output, 'w') as f:
+        f.write(text)
+    hex_path = os.path.join(os.path.dirname(args.output), 'sin_table.hex')
+    with open(hex_path, 'w') as f:
+        f.write(sin_table())
+    print('{}: latency {}, {} multiplies, {} SB_MAC16s per painter, '
+          'frame unit {} steps'.format(args.output, pixel.latency,
+                                       pixel.multiplies, pixel.dsps,
+                                       len(frame.steps)))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,57 @@
+# Framebuffers.
+#
+# A Framebuffer is a bytearray of height * width * channels bytes, row
+# major, RGB or RGBA.  The renderer writes pixels into it in place.
+# bytearray has the buffer protocol, so NumPy, PIL, files and sockets
+# all read it without a copy.
+
+import numpy as np
+import PIL.Image
+
+
+class Framebuffer(bytearray):
+
+    def __init__(self, width, height, channels=3):
+        assert channels in (3, 4)
+        super().__init__(width * height * channels)
+        self.width = width
+        self.height = height
+        self.channels = channels
+        if channels == 4:
+            self[3::4] = b'\xff' * (width * height)
+        # A view, not a copy.  Writes through it land in the bytearray.
+        self.array = np.frombuffer(self, dtype=np.uint8).reshape(
+            height, width, channels)
+
+    @property
+    def mode(self):
+        return 'RGBA' if self.channels == 4 else 'RGB'
+
+    def put(self, x, y, rgb):
+        o = (y * self.width + x) * self.channels
+        self[o], self[o + 1], self[o + 2] = rgb
+
+    def copy(self):
+        fb = Framebuffer(self.width, self.height, self.channels)
+        fb[:] = self
+        return fb
+
+    def image(self):
+        """A PIL image of the framebuffer.  RGBA images share its
+           memory; PIL stores RGB as four bytes a pixel, so RGB is
+           copied.
+        """
+        return PIL.Image.frombuffer(self.mode, (self.width, self.height),
+                                    self, 'raw', self.mode, 0, 1)
+
+    def rgb565(self, out=None):
+        """Little-endian RGB565, like `ffmpeg -pix_fmt rgb565`, as a
+           (height, width) array.  Pass `out` to reuse one.
+        """
+        if out is None:
+            out = np.empty((self.height, self.width), dtype='<u2')
+        a = self.array
+        np.left_shift(a[..., 0] >> 3, 11, out=out, dtype=out.dtype)
+        out |= (a[..., 1] >> 2).astype(np.uint16) << 5
+        out |= a[..., 2] >> 3
+        return out
@@ -0,0 +1 @@
+../../tables/gen_tables.py
\ No newline at end of file
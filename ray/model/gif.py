@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+
+# Animated GIFs with one global palette.
+#
+# The scene has few colors: checker red and green, the plane blue, the
+# sphere's tints, and their shadowed versions.  So the palette is built
+# once, from a sample of frames, and every frame is mapped through a
+# lookup table instead of being quantized on its own.  Each frame after
+# the first is written as the rectangle that changed since the one
+# before it, with unchanged pixels inside the rectangle transparent,
+# and a frame that didn't change just lengthens the one before.  Colors
+# not in the sample map to a near palette color.  PIL still does the
+# LZW.
+#
+#     $ gif.py 256        # 256 frames to scene.gif, and PIL's scene-pil.gif
+#
+# or, from Python,
+#
+#     save_animation('scene.gif', my_scene.render_anim(1000))
+
+from collections import Counter
+import itertools
+import struct
+import sys
+import time
+
+import numpy as np
+import PIL.GifImagePlugin
+import PIL.Image
+
+
+def _packed(rgb):
+    """(..., 3) uint8 -> (...) int 0xRRGGBB."""
+    rgb = np.asarray(rgb, dtype=np.int32)
+    return rgb[..., 0] << 16 | rgb[..., 1] << 8 | rgb[..., 2]
+
+
+def _pixels(frame):
+    """An (h, w, 3) array from a Framebuffer or an array."""
+    return getattr(frame, 'array', frame)[..., :3]
+
+
+class Palette:
+    """Up to 256 colors, and a map from RGB to palette index.
+
+       Colors in the palette map exactly.  Others go to the nearest
+       palette color of their 5-5-5 cell, from a table of 32768 built
+       once.
+    """
+
+    def __init__(self, colors):
+        self.colors = np.asarray(colors, dtype=np.uint8).reshape(-1, 3)
+        assert 0 < len(self.colors) <= 256
+        keys = _packed(self.colors)
+        self.order = np.argsort(keys)
+        self.keys = keys[self.order]
+        self._lut = None
+
+    @property
+    def lut(self):
+        """Nearest palette color to the middle of each 5-5-5 cell.
+           Built on the first color that isn't in the palette.
+        """
+        if self._lut is None:
+            cells = np.arange(1 << 15)
+            centers = np.stack(((cells >> 10 & 31) << 3 | 4,
+                                (cells >> 5 & 31) << 3 | 4,
+                                (cells & 31) << 3 | 4), axis=-1)
+            p = self.colors.astype(np.float32)
+            # |c - p|**2 without the |c|**2 term, which doesn't change
+            # which p is nearest.
+            d = (p * p).sum(axis=1) - 2 * centers.astype(np.float32) @ p.T
+            self._lut = d.argmin(axis=1).astype(np.uint8)
+        return self._lut
+
+    @classmethod
+    def from_frames(cls, frames, max_colors=256):
+        """The most common colors of `frames`.  If there are more than
+           `max_colors`, the rest are left to the lookup table.
+        """
+        counts = Counter()
+        for frame in frames:
+            keys, n = np.unique(_packed(_pixels(frame)), return_counts=True)
+            counts.update(dict(zip(keys.tolist(), n.tolist())))
+        top = [k for (k, _) in counts.most_common(max_colors)]
+        return cls([(k >> 16, k >> 8 & 255, k & 255) for k in top])
+
+    def __len__(self):
+        return len(self.colors)
+
+    def index(self, frame):
+        """Palette indices, (h, w) uint8."""
+        keys = _packed(_pixels(frame))
+        pos = np.searchsorted(self.keys, keys).clip(0, len(self.keys) - 1)
+        hit = self.keys[pos] == keys
+        if hit.all():
+            return self.order[pos].astype(np.uint8)
+        cell = (keys >> 9 & 0x7C00) | (keys >> 6 & 0x3E0) | (keys >> 3 & 31)
+        return np.where(hit, self.order[pos], self.lut[cell]).astype(np.uint8)
+
+
+class GifWriter:
+    """Write frames as they come.  `duration` is per frame, in ms."""
+
+    def __init__(self, path, palette, width, height, duration=20, loop=0):
+        self.file = open(path, 'wb')
+        self.palette = palette
+        self.width = width
+        self.height = height
+        self.duration = duration
+        # One index left over is the transparent color.
+        n = len(palette) + 1 if len(palette) < 256 else len(palette)
+        self.bits = max(1, (n - 1).bit_length())
+        self.transparent = len(palette) if len(palette) < 256 else None
+        self.prev = None                # indices of the last frame
+        self.pending = None             # (x, y, indices, ms)
+        self.frames = 0
+        self.written = 0
+        self._header(loop)
+
+    def _header(self, loop):
+        f = self.file
+        f.write(b'GIF89a')
+        f.write(struct.pack('<HHBBB', self.width, self.height,
+                            0x80 | (self.bits - 1) << 4 | (self.bits - 1),
+                            0, 0))
+        table = np.zeros((1 << self.bits, 3), dtype=np.uint8)
+        table[:len(self.palette)] = self.palette.colors
+        f.write(table.tobytes())
+        f.write(b'\x21\xff\x0bNETSCAPE2.0\x03\x01')
+        f.write(struct.pack('<HB', loop, 0))
+
+    def add(self, frame):
+        idx = self.palette.index(frame)
+        self.frames += 1
+        if self.prev is None:
+            self._queue(0, 0, idx)
+        else:
+            changed = idx != self.prev
+            if not changed.any():
+                x, y, data, ms = self.pending
+                self.pending = (x, y, data, ms + self.duration)
+            else:
+                rows = np.flatnonzero(changed.any(axis=1))
+                cols = np.flatnonzero(changed.any(axis=0))
+                y0, y1 = rows[0], rows[-1] + 1
+                x0, x1 = cols[0], cols[-1] + 1
+                data = idx[y0:y1, x0:x1]
+                if self.transparent is not None:
+                    data = np.where(changed[y0:y1, x0:x1], data,
+                                    self.transparent).astype(np.uint8)
+                self._queue(int(x0), int(y0), data)
+        self.prev = idx
+
+    def _queue(self, x, y, data):
+        self._flush()
+        self.pending = (x, y, data, self.duration)
+
+    def _flush(self):
+        if self.pending is None:
+            return
+        x, y, data, ms = self.pending
+        f = self.file
+        has_t = self.transparent is not None and self.written > 0
+        f.write(struct.pack('<BBBBHBB', 0x21, 0xF9, 4,
+                            1 << 2 | has_t,     # disposal: leave in place
+                            round(ms / 10),
+                            self.transparent if has_t else 0, 0))
+        # PIL does the image descriptor and the LZW, in C.
+        data = np.ascontiguousarray(data)
+        h, w = data.shape
+        img = PIL.Image.frombuffer('P', (w, h), data, 'raw', 'P', 0, 1)
+        for chunk in PIL.GifImagePlugin.getdata(img, offset=(x, y)):
+            f.write(chunk)
+        self.written += 1
+        self.pending = None
+
+    def close(self):
+        self._flush()
+        self.file.write(b'\x3b')
+        self.file.close()
+
+
+def save_animation(path, frames, sample=8, duration=20, loop=0):
+    """Write an iterable of frames (Framebuffers or (h, w, 3) arrays)
+       to a GIF.  The palette comes from the first `sample` frames,
+       which must be distinct objects; frames after them may all be
+       the same Framebuffer, rewritten in place.
+    """
+    frames = iter(frames)
+    first = list(itertools.islice(frames, sample))
+    palette = Palette.from_frames(first)
+    h, w, _ = _pixels(first[0]).shape
+    writer = GifWriter(path, palette, w, h, duration, loop)
+    for frame in itertools.chain(first, frames):
+        writer.add(frame)
+    writer.close()
+    return writer
+
+
+def main(argv):
+    from main import WIDTH, HEIGHT
+    import numerics
+    import scene
+
+    frame_count = int(argv[0]) if argv else 64
+    my_scene = scene.Scene(WIDTH, HEIGHT, numerics=numerics.QuietNumerics())
+    frames = list(my_scene.render_anim(frame_count))
+
+    start = time.perf_counter()
+    w = save_animation('scene.gif', frames)
+    ours = time.perf_counter() - start
+    start = time.perf_counter()
+    imgs = [fb.image() for fb in frames]
+    imgs[0].save('scene-pil.gif', include_color_table=True, save_all=True,
+                 append_images=imgs[1:], duration=20, loop=0)
+    pil = time.perf_counter() - start
+    print('{} frames, {} written, {} colors'
+          .format(w.frames, w.written, len(w.palette)))
+    for (name, path, t) in (('global palette', 'scene.gif', ours),
+                            ('PIL', 'scene-pil.gif', pil)):
+        with open(path, 'rb') as f:
+            size = len(f.read())
+        print('{:15} {:8.3f} s {:9} bytes'.format(name, t, size))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+
+# Loop-invariant hoisting, from the pixel stage into the frame stage.
+#
+# A pixel node that depends on no Pixel.x or Pixel.y, only on the
+# frame's outputs (the Camera and Sphere tuples) and constants, has the
+# same value for every pixel of a frame.  `invariant` finds those in a
+# merged pixel Stage (see ranges.py).  `hoist` moves the ones the frame
+# unit can compute into the frame stage.  Each hoisted node that a
+# pixel node still uses becomes a new frame output, `Hoist.n<id>`, and
+# a new pixel input of the same name.
+#
+# Tests (is_neg) stay in the pixel stage even when they are invariant:
+# the frame unit can't branch.  So do ops it has no hardware for.
+#
+#     $ hoist.py [frames]
+#
+# prints what moves and what it saves per pixel, and writes
+# frame-hoisted.dot and pixel-hoisted.dot.
+
+from collections import Counter
+import copy
+import sys
+
+import ranges
+
+
+# What emit_verilog.FrameUnit can do.
+FRAME_OPS = {'add', 'sub', 'abs', 'mul', 'dot', 'sin', 'cos', 'vec',
+             'index0', 'index1', 'index2'}
+
+
+def multiplies(node):
+    """Multiplies one node costs."""
+    n = 3 if node.type == 'vector' else 1
+    return {'mul': n, 'dot': 3, 'rotX': 4, 'rotY': 4}.get(node.op, 0)
+
+
+def _pixel_inputs(stage):
+    # Scan inputs (see strength.py) vary by pixel too.
+    return {i for i in stage.inputs
+            if stage.nodes[i].op.startswith(('Pixel.', 'Scan.'))}
+
+
+def invariant(stage):
+    """Ids of the nodes in a pixel Stage that are the same for every
+       pixel of a frame.  Inputs and constants are not included.
+    """
+    varying = set(_pixel_inputs(stage))
+    for (i, n) in enumerate(stage.nodes):           # ids are topological
+        if any(p in varying for p in n.preds):
+            varying.add(i)
+    return {i for (i, n) in enumerate(stage.nodes)
+            if i not in varying and i not in stage.inputs and
+            i not in stage.constants and i not in stage.outputs}
+
+
+def hoistable(stage):
+    """The invariant nodes the frame unit can compute."""
+    moved = set()
+    for i in sorted(invariant(stage)):
+        n = stage.nodes[i]
+        if n.op in FRAME_OPS and all(p in moved or p in stage.inputs or
+                                     p in stage.constants for p in n.preds):
+            moved.add(i)
+    return moved
+
+
+def frontier(stage, moved):
+    """Moved nodes that a node left in the pixel stage still reads."""
+    return {p for (i, n) in enumerate(stage.nodes) if i not in moved
+            for p in n.preds if p in moved}
+
+
+def hoist(numz):
+    """A copy of RangeNumerics `numz` with the hoistable pixel nodes
+       moved into the frame stage, and ranges proved again.
+    """
+    frame = copy.deepcopy(numz.stages['Frame'])
+    pixel = copy.deepcopy(numz.stages['Pixel'])
+    moved = hoistable(pixel)
+    edge = frontier(pixel, moved)
+    frame_outs = {frame.nodes[i].op: i for i in frame.outputs}
+
+    def append(node, preds):
+        n = copy.copy(node)
+        n.preds = tuple(preds)
+        frame.nodes.append(n)
+        return len(frame.nodes) - 1
+
+    where = {}                      # pixel id -> frame id
+    for i in sorted(moved):
+        n = pixel.nodes[i]
+        preds = []
+        for p in n.preds:
+            if p not in where:
+                pn = pixel.nodes[p]
+                if p in pixel.inputs:
+                    where[p] = frame_outs[pn.op]
+                else:                               # a constant
+                    where[p] = append(pn, ())
+                    frame.constants.add(where[p])
+            preds.append(where[p])
+        where[i] = append(n, preds)
+    for i in sorted(edge):
+        label = 'Hoist.n{}'.format(i)
+        out = copy.copy(pixel.nodes[i])
+        out.op = label
+        o = append(out, [where[i]])
+        frame.outputs.add(o)
+        # The pixel node becomes an input; what fed it is dead.
+        pixel.nodes[i] = copy.copy(out)
+        pixel.nodes[i].preds = ()
+        pixel.inputs.add(i)
+    result = copy.copy(numz)
+    result.stages = dict(numz.stages, Frame=frame, Pixel=pixel)
+    result.prove()
+    result.moved = moved
+    result.edge = edge
+    return result
+
+
+def _live(stage):
+    roots = set(o for outs in stage.paths.values() for o in outs)
+    roots |= set(t for tests in stage.paths for (t, _) in tests)
+    seen = set()
+    todo = list(roots)
+    while todo:
+        i = todo.pop()
+        if i not in seen:
+            seen.add(i)
+            todo.extend(stage.nodes[i].preds)
+    return seen
+
+
+def per_pixel_cost(stage):
+    """(ops, multiplies) of the live, non-constant pixel nodes."""
+    live = [i for i in _live(stage)
+            if i not in stage.inputs and i not in stage.constants and
+            i not in stage.outputs]
+    ops = Counter(stage.nodes[i].op for i in live
+                  if not stage.nodes[i].op.startswith('index'))
+    return ops, sum(multiplies(stage.nodes[i]) for i in live)
+
+
+def main(argv):
+    from main import WIDTH, HEIGHT
+    frame_count = int(argv[0]) if argv else 2
+    numz = ranges.analyze(WIDTH, HEIGHT, frame_count)
+    pixel = numz.stages['Pixel']
+    inv = invariant(pixel)
+    hoisted = hoist(numz)
+    print('{} invariant pixel nodes, {} hoisted, {} new frame outputs'
+          .format(len(inv), len(hoisted.moved), len(hoisted.edge)))
+    print('  stay:  {}'.format(', '.join(sorted(
+        '{}:{}'.format(i, pixel.nodes[i].op.replace('\\n', ' '))
+        for i in inv - hoisted.moved))))
+    before, bm = per_pixel_cost(pixel)
+    after, am = per_pixel_cost(hoisted.stages['Pixel'])
+    print('{:10} {:>6} {:>6}'.format('op', 'before', 'after'))
+    for op in sorted(before, key=lambda op: -before[op]):
+        if op.startswith(('Pixel.', 'const')):
+            continue
+        print('{:10} {:6} {:6}'.format(op.replace('\\n', ' ')[:10],
+                                       before[op], after[op]))
+    print('{:10} {:6} {:6}'.format('ops', sum(before.values()),
+                                   sum(after.values())))
+    print('{:10} {:6} {:6}'.format('multiplies', bm, am))
+    for title in ('Frame', 'Pixel'):
+        with open('{}-hoisted.dot'.format(title.lower()), 'w') as f:
+            f.write(hoisted.to_dag(title).to_dot())
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -1,10 +1,10 @@
 #!/usr/bin/env python
 
-from itertools import chain
+import os
 import sys
+import time
 
-import PIL.Image
-
+from gif import save_animation
 import numerics
 import scene
 from trickery import lazy_scalar, define_constants
@@ -15,37 +15,42 @@ WIDTH, HEIGHT = 64, 64
 FRAME_COUNT = 2
 
 
-def make_image():
+def make_image(raw=False):
 
     numz = numerics.Numerics()
     my_scene = scene.Scene(WIDTH, HEIGHT, numerics=numz)
-    pixels = my_scene.render_scene()
-
-    img = PIL.Image.new(mode='RGB', size=(WIDTH, HEIGHT))
-    img.putdata(list(chain(*pixels)))
-    img.save('scene.png')
+    fb = my_scene.render_scene()
+    fb.image().save('scene.png')
+    if raw:
+        with open('scene.raw', 'wb') as f:   # RGB565, for sim/join-video.sh
+            f.write(fb.rgb565())
+
+
+def make_preview(block=8):
+    """The first animation frame, coarse to fine.  scene.png is
+       rewritten as each level finishes, so a preview is there long
+       before the whole frame is.
+    """
+    my_scene = scene.Scene(WIDTH, HEIGHT, numerics=numerics.QuietNumerics())
+    my_scene.start_anim()
+    start = time.perf_counter()
+    for (size, fb) in my_scene.render_preview(0, block=block):
+        fb.image().save('scene.tmp.png')
+        os.replace('scene.tmp.png', 'scene.png')
+        print('{}x{} blocks: {:.3f} s'.format(size, size,
+                                             time.perf_counter() - start))
 
 
 def make_animation():
     numz = numerics.Numerics()
     my_scene = scene.Scene(WIDTH, HEIGHT, numerics=numz)
-    imgs = []
 
-    for (frame, pixels) in enumerate(my_scene.render_anim(FRAME_COUNT)):
-        img = PIL.Image.new(mode='RGB', size=(WIDTH, HEIGHT))
-        img.putdata(list(chain(*pixels)))
-        if frame == 0:
-            seq = img
-        else:
-            imgs.append(img)
-        print('Frame {}'.format(frame))
+    def frames():
+        for (frame, fb) in enumerate(my_scene.render_anim(FRAME_COUNT)):
+            print('Frame {}'.format(frame))
+            yield fb
 
-    seq.save('scene.gif',
-             include_color_table=True,
-             save_all=True,
-             append_images=imgs,
-             duration=20,
-             loop=100)
+    save_animation('scene.gif', frames(), duration=20, loop=100)
 
 
 def test_numerics():
@@ -135,5 +140,7 @@ if __name__ == '__main__':
         test_numerics()
     elif '-a' in sys.argv:
         make_animation()
+    elif '-p' in sys.argv:
+        make_preview()
     else:
-        make_image()
+        make_image(raw='-r' in sys.argv)
@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+
+# Mandelbrot on Numerics.
+#
+# The whole frame iterates at once: z and c are Scalars holding NumPy
+# arrays with one element per pixel still iterating, so the same model
+# runs in floating point or, with numerics.fixed set, in fixed point.
+# Each iteration is z = z² + c in three multiplies, zr², zi² and zr zi;
+# |z|² for the escape test comes from the same products.
+#
+# Pixels leave the arrays as soon as they are done, so later
+# iterations only pay for the pixels still active:
+#
+#   escaped   |z|² > 4.  Its count is the iteration it escaped at.
+#   periodic  z came back to a value saved earlier (Brent: z is saved
+#             at iterations 1, 2, 4, 8, ...), so it is in a cycle and
+#             will never escape.  In fixed point the match is exact.
+#   inside    still iterating after `max_iter`.
+#
+# The escape and cycle tests differ from pixel to pixel, so they look
+# at the arrays directly; a Numerics test would raise Diverged.
+#
+# The budget compares the multiplies a frame needs with what the UP5K's
+# DSPs can do in one panel refresh: 8 of them, two clocks per 16 × 16
+# multiply, at 30 MHz, for 256 subframes of 32 rows of 66 clocks (see
+# model/hub75.py).  Wider operands take one 16 × 16 multiply per pair
+# of 16-bit pieces; with -q the operands are OPERAND_INT_BITS plus the
+# fraction bits wide, and float runs are costed as 16-bit operands.
+#
+#     $ mandelbrot.py                 # 64 frames zooming in, float
+#     $ mandelbrot.py -q 24 -f 16     # fixed point, 24 fraction bits
+
+import argparse
+from collections import namedtuple
+import math
+import sys
+import time
+
+import numpy as np
+
+from framebuffer import Framebuffer
+import numerics
+
+
+CLOCK_HZ = 30_000_000
+REFRESH_CLOCKS = 256 * 32 * 66          # PDM subframes × rows × clocks
+DSPS = 8
+MUL_CLOCKS = 2                          # 16 × 16 takes two clocks
+MULS_PER_REFRESH = DSPS * REFRESH_CLOCKS // MUL_CLOCKS    # 16 × 16
+MULS_PER_ITERATION = 3
+DSP_BITS = 16
+OPERAND_INT_BITS = 4                    # sign + 3: |z| < 4 + |c| < 8
+
+# Seahorse valley.
+CENTER = (-0.743643887037151, 0.131825904205330)
+
+PERIOD_EPSILON = 2.0 ** -40             # float only; fixed is exact
+
+
+Frame = namedtuple('Frame', 'counts periodic inside multiplies iterations')
+
+
+def _keep(s, mask):
+    return numerics.Scalar(s.value[mask])
+
+
+class Mandelbrot:
+
+    def __init__(self, width=64, height=64, max_iter=256, numz=None):
+        self.width = width
+        self.height = height
+        self.max_iter = max_iter
+        self.numz = numz or numerics.Numerics()
+
+    def render(self, center=CENTER, span=3.0):
+        """One frame, `span` wide in the complex plane.  Counts are
+           max_iter for pixels that never escape.
+        """
+        S = self.numz.scalar
+        n = self.width * self.height
+        step = span / self.width
+        iy, ix = np.indices((self.height, self.width)).reshape(2, -1)
+        cr = S(center[0] + (ix - self.width / 2) * step)
+        ci = S(center[1] - (iy - self.height / 2) * step)
+        zr, zi = S(np.zeros(n)), S(np.zeros(n))
+        sr, si = zr, zi                 # saved z, for cycles
+        four = S(4)
+        exact = numerics.fixed is not None
+        active = np.arange(n)
+        counts = np.full(n, self.max_iter)
+        periodic = np.zeros(n, dtype=bool)
+        multiplies = iterations = 0
+
+        for k in range(self.max_iter):
+            if not len(active):
+                break
+            zr2, zi2, zri = zr * zr, zi * zi, zr * zi
+            multiplies += MULS_PER_ITERATION * len(active)
+            iterations += len(active)
+            escaped = ((zr2 + zi2) - four).value > 0
+            zr = zr2 - zi2 + cr
+            zi = zri + zri + ci
+            dr, di = (zr - sr).value, (zi - si).value
+            if exact:
+                cycled = (dr == 0) & (di == 0)
+            else:
+                cycled = (np.abs(dr) < PERIOD_EPSILON) & \
+                         (np.abs(di) < PERIOD_EPSILON)
+            cycled &= ~escaped
+            counts[active[escaped]] = k
+            periodic[active[cycled]] = True
+            if (k + 1) & k == 0:        # a power of two
+                sr, si = zr, zi
+            done = escaped | cycled
+            if done.any():
+                keep = ~done
+                active = active[keep]
+                zr, zi, cr, ci, sr, si = (_keep(s, keep)
+                                          for s in (zr, zi, cr, ci, sr, si))
+        shape = (self.height, self.width)
+        return Frame(counts.reshape(shape), periodic.reshape(shape),
+                     int((counts == self.max_iter).sum()), multiplies,
+                     iterations)
+
+    def zoom(self, frame_count, center=CENTER, span=3.0, factor=0.9):
+        for f in range(frame_count):
+            yield self.render(center, span * factor ** f)
+
+    def colorize(self, frame, fb=None):
+        """Escaped pixels cycle through hues by count; the rest are
+           black.
+        """
+        if fb is None:
+            fb = Framebuffer(self.width, self.height)
+        t = np.sqrt(frame.counts / self.max_iter) * 4 * math.pi
+        rgb = np.stack([np.sin(t + a) * 0.5 + 0.5
+                        for a in (0, 2 * math.pi / 3, 4 * math.pi / 3)],
+                       axis=-1)
+        rgb[frame.counts == self.max_iter] = 0
+        fb.array[..., :3] = np.round(rgb * 255)
+        return fb
+
+
+def partial_products(frac_bits=None):
+    """16 × 16 multiplies per multiply with `frac_bits` fraction bits,
+       or for 16-bit operands if None.
+    """
+    if frac_bits is None:
+        return 1
+    return math.ceil((OPERAND_INT_BITS + frac_bits) / DSP_BITS) ** 2
+
+
+def report(frames, max_iter, pixels, frac_bits=None):
+    per_refresh = MULS_PER_REFRESH // partial_products(frac_bits)
+    worst = MULS_PER_ITERATION * max_iter * pixels
+    print('{:>5} {:>6} {:>6} {:>6} {:>9} {:>10} {:>8}'
+          .format('frame', 'inside', 'cycle', 'mean', 'max esc',
+                  'multiplies', 'refresh'))
+    for (f, frame) in enumerate(frames):
+        escaped = frame.counts[frame.counts < max_iter]
+        print('{:5} {:6} {:6} {:6.1f} {:9} {:10} {:7.2f}x'.format(
+            f, frame.inside, int(frame.periodic.sum()),
+            frame.iterations / pixels,
+            int(escaped.max()) if len(escaped) else 0,
+            frame.multiplies, frame.multiplies / per_refresh))
+    total = sum(f.multiplies for f in frames)
+    refresh_hz = CLOCK_HZ / REFRESH_CLOCKS
+    if frac_bits is None:
+        operands = 'assumes 16-bit operands'
+    else:
+        operands = 'Q{}.{} operands, 16 × 16 pieces: {}'.format(
+            OPERAND_INT_BITS, frac_bits, partial_products(frac_bits))
+    print('{} multiplies a refresh ({:.1f} Hz, {}): '
+          '{:.0f} iterations a pixel'
+          .format(per_refresh, refresh_hz, operands,
+                  per_refresh / MULS_PER_ITERATION / pixels))
+    print('mean frame needs {:.2f} refreshes, {:.2f} without early exit'
+          .format(total / len(frames) / per_refresh,
+                  worst / per_refresh))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description='Mandelbrot zoom on the Numerics model.')
+    parser.add_argument('-f', '--frames', type=int, default=64)
+    parser.add_argument('-i', '--max-iter', type=int, default=256)
+    parser.add_argument('-z', '--zoom', type=float, default=0.9,
+                        help='span factor per frame (default: 0.9)')
+    parser.add_argument('-q', '--frac-bits', type=int, default=None,
+                        help='fixed point with this many fraction bits')
+    parser.add_argument('-o', '--output', default=None,
+                        help='write the zoom as a GIF')
+    args = parser.parse_args(argv)
+
+    m = Mandelbrot(max_iter=args.max_iter)
+    pixels = m.width * m.height
+    start = time.perf_counter()
+    frames = list(m.zoom(args.frames, factor=args.zoom))
+    seconds = time.perf_counter() - start
+    print('float: {:.3f} s a frame'.format(seconds / args.frames))
+    if args.frac_bits is not None:
+        float_frames = frames
+        numerics.fixed = numerics.Fixed(args.frac_bits)
+        try:
+            start = time.perf_counter()
+            frames = list(m.zoom(args.frames, factor=args.zoom))
+            seconds = time.perf_counter() - start
+        finally:
+            numerics.fixed = None
+        differ = sum(int((a.counts != b.counts).sum())
+                     for (a, b) in zip(frames, float_frames))
+        last_step = 3.0 * args.zoom ** (args.frames - 1) / m.width
+        print('Q.{}: {:.3f} s a frame, {} of {} counts differ from float; '
+              'last pixel step is {:.3g} LSBs'.format(
+                  args.frac_bits, seconds / args.frames, differ,
+                  pixels * args.frames, last_step * 2 ** args.frac_bits))
+    report(frames, args.max_iter, pixels, args.frac_bits)
+    if args.output:
+        from gif import save_animation
+        save_animation(args.output, (m.colorize(f) for f in frames))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
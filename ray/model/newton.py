@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+# Accuracy vs. cycles for the Newton-Raphson recip and rsqrt.
+#
+# Renders the same frames with exact recip/rsqrt and with LUT-seeded
+# Newton-Raphson at several table sizes and iteration counts, and
+# reports how far the image moves and what the ops cost.  Each recip
+# iteration is two multiplies, each rsqrt iteration three.
+#
+#     $ newton.py                 # frame 0, default settings
+#     $ newton.py 4 5:1 3:2 8:0   # 4 frames, LUT bits:iterations
+
+from collections import Counter, namedtuple
+import sys
+
+import numpy as np
+import PIL.Image
+
+import numerics
+import scene
+
+
+SETTINGS = ((4, 1), (6, 0), (6, 1), (8, 0), (3, 2), (6, 2))
+
+
+Result = namedtuple('Result', 'setting frames ops max_err mean_err changed')
+
+
+def render(width, height, frame_count, setting):
+    """Frames as (frame_count, height, width, 3) uint8, and op counts."""
+    numerics.newton = setting and numerics.Newton(*setting)
+    numerics.op_counts = Counter()
+    try:
+        numz = numerics.QuietNumerics()
+        my_scene = scene.Scene(width, height, numerics=numz)
+        frames = np.array([fb.array
+                           for fb in my_scene.render_anim(frame_count)])
+        ops = numerics.op_counts
+    finally:
+        numerics.newton = None
+        numerics.op_counts = None
+    return frames, ops
+
+
+def compare(width, height, frame_count, settings):
+    exact, exact_ops = render(width, height, frame_count, None)
+    results = [Result(None, exact, exact_ops, 0, 0.0, 0)]
+    for setting in settings:
+        frames, ops = render(width, height, frame_count, setting)
+        err = np.abs(frames.astype(int) - exact)
+        results.append(Result(setting, frames, ops, int(err.max()),
+                              float(err.mean()),
+                              int(err.any(axis=-1).sum())))
+    return results
+
+
+def nr_multiplies(result):
+    if result.setting is None:
+        return 0
+    iterations = result.setting[1]
+    return iterations * (2 * result.ops['recip'] + 3 * result.ops['rsqrt'])
+
+
+def main(argv):
+    from main import WIDTH, HEIGHT
+    frame_count = int(argv[0]) if argv else 1
+    settings = [tuple(int(n) for n in a.split(':')) for a in argv[1:]]
+    results = compare(WIDTH, HEIGHT, frame_count, settings or SETTINGS)
+    pixels = frame_count * WIDTH * HEIGHT
+    print('{} frames, {} pixels'.format(frame_count, pixels))
+    print('{:>5} {:>5} {:>7} {:>7} {:>7} {:>8} {:>8} {:>8}'
+          .format('lut', 'iters', 'max', 'mean', 'changed',
+                  'recip', 'rsqrt', 'NR mul/px'))
+    for r in results:
+        lut, iters = r.setting or ('exact', '-')
+        print('{:>5} {:>5} {:7} {:7.3f} {:7} {:8} {:8} {:8.2f}'
+              .format(lut, iters, r.max_err, r.mean_err, r.changed,
+                      r.ops['recip'], r.ops['rsqrt'],
+                      nr_multiplies(r) / pixels))
+        name = ('newton-{}-{}.png'.format(*r.setting) if r.setting
+                else 'newton-exact.png')
+        PIL.Image.fromarray(r.frames[0]).save(name)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
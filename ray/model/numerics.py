@@ -1,8 +1,13 @@
+from collections import namedtuple
 import copy
 from enum import Enum, auto
+import functools
 import math
 
+import numpy as np
+
 import dag
+import gen_tables                       # tables/gen_tables.py
 import trickery
 
 
@@ -26,8 +31,23 @@ class Type(Enum):
 
 current_graph = None
 cg_test_count = 0
+current_path = None             # is_neg outcomes, when tracing branches
+op_counts = None                # op label -> count, when counting ops
+
+# recip and rsqrt: exact if None, else LUT-seeded Newton-Raphson.  In
+# Newton mode, division and normalize use them too.
+Newton = namedtuple('Newton', 'lut_bits iterations')
+newton = None
+
+# Floating point if None, else fixed point: every scalar is rounded
+# down to `frac_bits` fraction bits, the way a product is shifted.
+# Integer bits are not limited.
+Fixed = namedtuple('Fixed', 'frac_bits')
+fixed = None
 
 def record(label, op, type, predecessors):
+    if op_counts is not None:
+        op_counts[label] += 1
     if current_graph:
         current_graph.add_node(label, op, type.name.lower())
         if type == Type.BOOL and hasattr(current_graph, 'next_test_label'):
@@ -49,6 +69,131 @@ def record(label, op, type, predecessors):
                     current_graph.add_edge(p, op)
 
 
+# Angle.sin and cos read the table ray_sin does (see emit_verilog.py):
+# 2**ANGLE_BITS entries a circle, SIN_FRAC_BITS fraction bits.  The
+# angle is rounded to the nearest entry.
+ANGLE_BITS = 10
+SIN_FRAC_BITS = 14
+
+
+@functools.lru_cache()
+def _sin_table():
+    return gen_tables.sin(ANGLE_BITS, SIN_FRAC_BITS) / 2 ** SIN_FRAC_BITS
+
+
+def _sin(radians, offset=0):
+    """sin(radians), from the table.  cos is offset a quarter circle."""
+    n = 1 << ANGLE_BITS
+    if _batched(radians):
+        i = np.round(radians * n / math.tau).astype(int)
+        return _sin_table()[(i + offset) % n]
+    i = round(radians * n / math.tau)
+    return float(_sin_table()[(i + offset) % n])
+
+
+@functools.lru_cache()
+def _recip_lut(lut_bits):
+    """1/m at the middle of each of 2**lut_bits slices of [1, 2)."""
+    return gen_tables.recip(lut_bits) / 2 ** (lut_bits + 1)
+
+
+@functools.lru_cache()
+def _rsqrt_lut(lut_bits):
+    """1/sqrt(m) at the middle of each of 2**lut_bits slices of [1, 4)."""
+    return gen_tables.rsqrt(lut_bits) / 2 ** (lut_bits + 1)
+
+
+def newton_recip(x, lut_bits=6, iterations=1):
+    """1/x the way hardware would do it: normalize x to m 2**e, m in
+       [1, 2), seed from a table indexed by m's top fraction bits, and
+       refine with y = y (2 - m y).  Each iteration doubles the good
+       bits and costs two multiplies.  Works on arrays; 0 gives 0.
+    """
+    x = np.asarray(x, dtype=float)
+    f, e = np.frexp(np.abs(x))                  # |x| = f 2**e, f in [.5, 1)
+    m = 2 * f
+    n = 1 << lut_bits
+    y = _recip_lut(lut_bits)[np.clip(((m - 1) * n).astype(int), 0, n - 1)]
+    for _ in range(iterations):
+        y = y * (2 - m * y)
+    return np.sign(x) * np.ldexp(y, 1 - e)
+
+
+def newton_rsqrt(x, lut_bits=6, iterations=1):
+    """1/sqrt(x) likewise: x = m 2**2k, m in [1, 4), table seed, then
+       y = y (3 - m y y) / 2, three multiplies an iteration.  x must be
+       positive.
+    """
+    x = np.asarray(x, dtype=float)
+    f, e = np.frexp(x)
+    even = e % 2 == 0
+    m = np.where(even, 4 * f, 2 * f)
+    k = np.where(even, e - 2, e - 1) // 2
+    n = 1 << lut_bits
+    y = _rsqrt_lut(lut_bits)[np.clip(((m - 1) / 3 * n).astype(int), 0, n - 1)]
+    for _ in range(iterations):
+        y = y * (1.5 - 0.5 * m * y * y)
+    return np.ldexp(y, -k)
+
+
+def _newton(fn, v):
+    result = fn(v, *newton)
+    return result if _batched(v) else float(result)
+
+
+def _recip(values):
+    if newton is None:
+        return [1 / v for v in values]
+    if any(np.any(np.equal(v, 0)) for v in values):
+        raise ZeroDivisionError('reciprocal of zero')
+    return [_newton(newton_recip, v) for v in values]
+
+
+def _rsqrt(values):
+    if newton is None:
+        return [1 / _apply(math.sqrt, np.sqrt, v) for v in values]
+    if any(np.any(np.less_equal(v, 0)) for v in values):
+        raise ValueError('math domain error')
+    return [_newton(newton_rsqrt, v) for v in values]
+
+
+# Batches.  A value may be a NumPy array with one element per variant
+# of the scene (see sweep.py).  Arithmetic just broadcasts; a test has
+# to come out the same for every variant, or it raises Diverged.
+
+class Diverged(Exception):
+    """A test came out differently across a batch.  `mask` is the
+       outcome for each variant.
+    """
+
+    def __init__(self, mask):
+        super().__init__('{} of {} variants'.format(mask.sum(), mask.size))
+        self.mask = mask
+
+
+def _batched(value):
+    return isinstance(value, np.ndarray)
+
+
+def _test(result):
+    if _batched(result):
+        if result.all():
+            return True
+        if not result.any():
+            return False
+        raise Diverged(result)
+    return result
+
+
+def _apply(fn, np_fn, value):
+    return np_fn(value) if _batched(value) else fn(value)
+
+
+def _quantize(value):
+    scale = 2.0 ** fixed.frac_bits
+    return _apply(math.floor, np.floor, value * scale) / scale
+
+
 class NumericBase:          # XXX still needed?
     pass
 
@@ -70,7 +215,9 @@ class Scalar(NumericBase):
             return value
         else:
             result = super().__new__(cls)
-            result.value = float(value)
+            result.value = value if _batched(value) else float(value)
+            if fixed is not None:
+                result.value = _quantize(result.value)
             return result
 
     def __repr__(self):
@@ -115,17 +262,22 @@ class Scalar(NumericBase):
 
     def __truediv__(self, other):
         assert isinstance(other, Scalar), 'type(other) = {}'.format(type(other))
+        if newton is not None:
+            # The way the hardware would divide.
+            return self * other.recip()
         result = Scalar(self.value / other.value)
         record('div', result, Type.SCALAR, (self, other))
         return result
 
     def __lt__(self, other):
         assert other == 0, 'must compare to zero'
-        result = self.value < 0
+        result = _test(self.value < 0)
         global cg_test_count
         label = '{}\\nis_neg\\n{}'.format(cg_test_count, result)
         cg_test_count += 1
         record(label, result, Type.BOOL, (self, ))
+        if current_path is not None:
+            current_path.append(result)
         return result
 
     def abs(self):
@@ -134,18 +286,31 @@ class Scalar(NumericBase):
         return result
 
     def sqrt(self):
-        result = Scalar(math.sqrt(self.value))
+        result = Scalar(_apply(math.sqrt, np.sqrt, self.value))
         record('sqrt', result, Type.SCALAR, (self, ))
         return result
 
+    def recip(self):
+        result = Scalar(_recip([self.value])[0])
+        record('recip', result, Type.SCALAR, (self, ))
+        return result
+
+    def rsqrt(self):
+        result = Scalar(_rsqrt([self.value])[0])
+        record('rsqrt', result, Type.SCALAR, (self, ))
+        return result
+
     def to_unorm(self):
+        if _batched(self.value):
+            return np.clip(np.round(self.value * 255), 0, 255).astype(int)
         result = min(255, max(0, round(self.value * 255)))
         return result
 
     def xor4(self, other):
         """Stupid method.  Can't figure out how to decompose it."""
         assert isinstance(other, Scalar)
-        a, b = math.floor(self.value), math.floor(other.value)
+        a = _apply(math.floor, lambda v: np.floor(v).astype(int), self.value)
+        b = _apply(math.floor, lambda v: np.floor(v).astype(int), other.value)
         result = Scalar((a ^ b) >> 2 & 1)
         record('xor4', result, Type.SCALAR, (self, other))
         return result
@@ -166,18 +331,21 @@ class Angle(NumericBase):
         return '{:.4}'.format(self)
 
     def __format__(self, format_spec):
-        fa = format(self.radians / math.tau, format_spec)
+        if _batched(self.radians):
+            fa = str(np.round(self.radians / math.tau, 4))
+        else:
+            fa = format(self.radians / math.tau, format_spec)
         # 'angle x.xxx tau'
         # return '\u2220{}\U0001d70f'.format(fa)
         return '\u2220{}\u03c4'.format(fa)
 
     def sin(self):
-        result = Scalar(math.sin(self.radians))
+        result = Scalar(_sin(self.radians))
         record('sin', result, Type.SCALAR, (self, ))
         return result
 
     def cos(self):
-        result = Scalar(math.cos(self.radians))
+        result = Scalar(_sin(self.radians, 1 << ANGLE_BITS - 2))
         record('cos', result, Type.SCALAR, (self, ))
         return result
 
@@ -272,7 +440,19 @@ class Vec3(NumericBase):
         record('dot', result, Type.SCALAR, (self, other))
         return result
 
+    def recip(self):
+        result = Vec3(*_recip(self._access_values()))
+        record('recip', result, Type.VECTOR, (self, ))
+        return result
+
+    def rsqrt(self):
+        result = Vec3(*_rsqrt(self._access_values()))
+        record('rsqrt', result, Type.VECTOR, (self, ))
+        return result
+
     def normalize(self):
+        if newton is not None:
+            return self * (self @ self).rsqrt()
         return self * (Numerics().scalar(1) / (self @ self).sqrt())
 
     def rotate(self, angle, axis):
@@ -384,11 +564,33 @@ class Numerics:
         for (v, out) in sinks:
             if current_graph.is_constant(out):
                 v.constant = True
-        with open(dotfile, 'w') as out:
-            out.write(current_graph.to_dot())
+        self.graph_done(dotfile, current_graph)
         current_graph = None
 
+    def graph_done(self, dotfile, graph):
+        """Called with each finished frame or pixel graph."""
+        with open(dotfile, 'w') as out:
+            out.write(graph.to_dot())
+
 
     def annotate_test(label):
         global next_test_label
         next_test_label = label
+
+
+class QuietNumerics(Numerics):
+    """Builds no graphs, for timing and for rendering many frames.  Ops
+       are still counted when op_counts is set.
+    """
+
+    def start_frame(self, *input_tuples):
+        self.frame_counter += 1
+
+    def end_frame(self, *output_tuples):
+        self.pixel_counter = 0
+
+    def start_pixel(self, *input_tuples):
+        pass
+
+    def end_pixel(self, *output_tuples):
+        self.pixel_counter += 1
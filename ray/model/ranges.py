@@ -0,0 +1,417 @@
+#!/usr/bin/env python
+
+# Value ranges for sizing fixed-point wires.
+#
+# RangeNumerics renders normally but, instead of writing a .dot file
+# per graph, folds every frame and pixel graph into one merged DAG per
+# stage.  Nodes are merged structurally: two nodes are the same wire if
+# they do the same op on the same wires, so a node shared by several
+# branch paths is one node.  Each merged node keeps the min and max of
+# every value it took, over all pixels and frames.
+#
+# From those, two ranges:
+#
+#   observed   what the animation actually produced.
+#   provable   interval arithmetic over the merged DAG, starting from
+#              the observed inputs, or from `input_ranges` where the
+#              caller knows better.  Pixel inputs that the frame stage
+#              computes start from the frame's provable outputs.  Branch
+#              conditions are not used, so a divisor that could be zero
+#              makes everything downstream unbounded.
+#
+# and the integer and fraction bits each needs.  Integer bits include a
+# sign bit when the range goes negative.  Fraction bits give the
+# smallest nonzero observed magnitude `sig_bits` significant bits;
+# integral nodes get none.
+#
+#     $ ranges.py [frames]
+#
+# prints a table and writes frame-ranges.dot and pixel-ranges.dot.
+
+from collections import Counter, namedtuple
+import math
+import sys
+
+import dag
+import numerics
+import scene
+
+
+INF = math.inf
+UNBOUNDED = (-INF, INF)
+
+
+class _Node:
+
+    def __init__(self, op, type_, preds):
+        self.op = op
+        self.type = type_
+        self.preds = preds
+        self.lo = None
+        self.hi = None
+        self.min_abs = INF
+        self.integral = True
+        self.count = 0
+        self.provable = None
+
+    def observe(self, values):
+        if self.lo is None:
+            self.lo = list(values)
+            self.hi = list(values)
+        else:
+            self.lo = [min(a, v) for (a, v) in zip(self.lo, values)]
+            self.hi = [max(a, v) for (a, v) in zip(self.hi, values)]
+        for v in values:
+            if v:
+                self.min_abs = min(self.min_abs, abs(v))
+                self.integral = self.integral and float(v).is_integer()
+        self.count += 1
+
+    @property
+    def observed(self):
+        if self.lo is None:
+            return None
+        return min(self.lo), max(self.hi)
+
+
+class Stage:
+    """The merged DAG of every graph with one title."""
+
+    def __init__(self, title):
+        self.title = title
+        self.ids = {}               # (op, type, pred ids) -> id
+        self.nodes = []
+        self.inputs = set()
+        self.outputs = set()
+        self.constants = set()
+        self.paths = {}             # is_neg (id, outcome)s -> output ids
+        self.path_counts = Counter()
+
+    def merge(self, graph):
+        preds = {}
+        for e in graph.edges:
+            preds.setdefault(e.dst, []).append(e.src)
+        ids = {}
+
+        def visit(n):
+            if n in ids:
+                return ids[n]
+            ps = tuple(visit(p) for p in preds.get(n, ()))
+            key = (_op_name(n, preds), n.type, ps)
+            i = self.ids.get(key)
+            if i is None:
+                i = self.ids[key] = len(self.nodes)
+                self.nodes.append(_Node(key[0], n.type, ps))
+            ids[n] = i
+            return i
+
+        for n in graph.nodes:
+            i = visit(n)
+            if n in graph.inputs:
+                self.inputs.add(i)
+            if n in graph.outputs:
+                self.outputs.add(i)
+            if n in graph.constants:
+                self.constants.add(i)
+            values = _components(n.value, n.type)
+            if values:
+                self.nodes[i].observe(values)
+        tests = tuple((ids[n], n.label.endswith('True'))
+                      for n in graph.nodes
+                      if self.nodes[ids[n]].op == 'is_neg')
+        outs = tuple(ids[n] for n in graph.nodes if n in graph.outputs)
+        self.paths[tests] = outs
+        self.path_counts[tests] += 1
+
+
+def _op_name(node, preds):
+    label = node.label
+    if '\\nis_neg\\n' in label:
+        return 'is_neg'             # drop the test number and outcome
+    if label == 'index':
+        vec = preds[node][0].value
+        return 'index{}'.format(
+            [v is node.value for v in vec.values].index(True))
+    return label
+
+
+def _components(value, type_):
+    if type_ == 'scalar':
+        return [value.value]
+    if type_ == 'angle':
+        return [value.radians]
+    if type_ == 'vector':
+        return [v.value for v in value.values]
+    if type_ == 'rgbunorm':
+        return [float(v) for v in value.values]
+    return []
+
+
+# Interval arithmetic.  An interval is (lo, hi); a node's provable
+# range is a list of them, one per component.
+
+def _mul(a, b):
+    ps = [x * y for x in a for y in b]
+    ps = [0.0 if math.isnan(p) else p for p in ps]      # 0 × ∞
+    return min(ps), max(ps)
+
+
+def _add(a, b):
+    return a[0] + b[0], a[1] + b[1]
+
+
+def _sub(a, b):
+    return a[0] - b[1], a[1] - b[0]
+
+
+def _div(a, b):
+    if b[0] <= 0 <= b[1]:
+        return UNBOUNDED
+    return _mul(a, (1 / b[1], 1 / b[0]))
+
+
+def _abs(a):
+    if a[0] >= 0:
+        return a
+    if a[1] <= 0:
+        return -a[1], -a[0]
+    return 0.0, max(-a[0], a[1])
+
+
+def _sqrt(a):
+    return math.sqrt(max(a[0], 0)), math.sqrt(max(a[1], 0))
+
+
+def _sin(a):
+    if not all(map(math.isfinite, a)) or a[1] - a[0] >= math.tau:
+        return -1.0, 1.0
+    ys = [math.sin(a[0]), math.sin(a[1])]
+    # Peaks and troughs inside the interval.
+    k = math.ceil((a[0] - math.pi / 2) / math.pi)
+    while k * math.pi + math.pi / 2 <= a[1]:
+        ys.append(1.0 if k % 2 == 0 else -1.0)
+        k += 1
+    return min(ys), max(ys)
+
+
+def _cos(a):
+    return _sin((a[0] + math.pi / 2, a[1] + math.pi / 2))
+
+
+def _recip(a):
+    return _div((1.0, 1.0), a)
+
+
+def _rsqrt(a):
+    if a[1] <= 0:
+        return UNBOUNDED
+    lo = max(a[0], 0)
+    return 1 / math.sqrt(a[1]), 1 / math.sqrt(lo) if lo else INF
+
+
+def _clamp(a, lo, hi):
+    return min(max(a[0], lo), hi), min(max(a[1], lo), hi)
+
+
+def _broadcast(a, n):
+    return a * n if len(a) == 1 else a
+
+
+def _elementwise(f, a, b):
+    n = max(len(a), len(b))
+    return [f(x, y) for (x, y) in zip(_broadcast(a, n), _broadcast(b, n))]
+
+
+def _rot(axis, v, s, c):
+    x, y, z = v
+    if axis == 'X':
+        return [x,
+                _sub(_mul(c, y), _mul(s, z)),
+                _add(_mul(s, y), _mul(c, z))]
+    return [_add(_mul(c, x), _mul(s, z)),
+            y,
+            _sub(_mul(c, z), _mul(s, x))]
+
+
+def _provable(op, args):
+    """Propagate intervals through one op.  None if not numeric."""
+    if op in ('add', 'sub', 'mul', 'div'):
+        f = {'add': _add, 'sub': _sub, 'mul': _mul, 'div': _div}[op]
+        return _elementwise(f, *args)
+    if op == 'dot':
+        terms = _elementwise(_mul, *args)
+        total = (0.0, 0.0)
+        for t in terms:
+            total = _add(total, t)
+        return [total]
+    if op in ('abs', 'sqrt', 'recip', 'rsqrt', 'sin', 'cos'):
+        f = {'abs': _abs, 'sqrt': _sqrt, 'recip': _recip, 'rsqrt': _rsqrt,
+             'sin': _sin, 'cos': _cos}[op]
+        return [f(a) for a in args[0]]
+    if op.startswith('index'):
+        return [args[0][int(op[5:])]]
+    if op == 'vec':
+        return [a[0] for a in args]
+    if op in ('rotX', 'rotY'):
+        (v, (s, ), (c, )) = args
+        return _rot(op[3], v, s, c)
+    if op == 'unorm':
+        return [_clamp((a[0] * 255, a[1] * 255), 0, 255) for a in args[0]]
+    if op == 'xor4':
+        return [(0.0, 1.0)]
+    if op == 'is_neg':
+        return None
+    return [UNBOUNDED] * max(1, len(args[0]) if args else 1)
+
+
+def _span(intervals):
+    return (min(a[0] for a in intervals), max(a[1] for a in intervals))
+
+
+def int_bits(lo, hi):
+    """Integer bits for [lo, hi], plus a sign bit if lo < 0."""
+    if not (math.isfinite(lo) and math.isfinite(hi)):
+        return None
+    mag = int(max(abs(lo), abs(hi)))
+    return mag.bit_length() + (lo < 0)
+
+
+Range = namedtuple('Range',
+                   'stage id op type count observed provable '
+                   'int_bits provable_int_bits frac_bits')
+
+
+class RangeNumerics(numerics.Numerics):
+
+    def __init__(self, sig_bits=8, max_frac_bits=16, input_ranges=None):
+        super().__init__()
+        self.sig_bits = sig_bits
+        self.max_frac_bits = max_frac_bits
+        self.input_ranges = input_ranges or {}    # label -> [(lo, hi)]
+        self.stages = {}
+
+    def graph_done(self, dotfile, graph):
+        if graph.name not in self.stages:
+            self.stages[graph.name] = Stage(graph.name)
+        self.stages[graph.name].merge(graph)
+
+    def frac_bits(self, node):
+        if node.integral:
+            return 0
+        floor = 2 ** -self.max_frac_bits
+        if node.min_abs < floor:
+            return self.max_frac_bits
+        bits = self.sig_bits - 1 - math.floor(math.log2(node.min_abs))
+        return min(max(bits, 0), self.max_frac_bits)
+
+    def prove(self):
+        """Fill in every node's provable range, frame stage first."""
+        outs = {}
+        for title in ('Frame', 'Pixel'):
+            stage = self.stages.get(title)
+            if stage is None:
+                continue
+            for (i, n) in enumerate(stage.nodes):
+                if i in stage.inputs:
+                    n.provable = (self.input_ranges.get(n.op) or
+                                  outs.get(n.op) or
+                                  _observed_intervals(n))
+                elif not n.preds:
+                    n.provable = _observed_intervals(n)
+                elif i in stage.outputs:
+                    n.provable = stage.nodes[n.preds[0]].provable
+                else:
+                    args = [stage.nodes[p].provable for p in n.preds]
+                    if any(a is None for a in args):
+                        n.provable = None
+                    else:
+                        n.provable = _provable(n.op, args)
+                if i in stage.outputs and n.provable:
+                    outs[n.op] = n.provable
+
+    def report(self):
+        self.prove()
+        rows = []
+        for stage in self.stages.values():
+            for (i, n) in enumerate(stage.nodes):
+                if n.observed is None:
+                    continue
+                obs = n.observed
+                prov = _span(n.provable) if n.provable else UNBOUNDED
+                rows.append(Range(stage.title, i, n.op.replace('\\n', ' '),
+                                  n.type, n.count, obs, prov,
+                                  int_bits(*obs), int_bits(*prov),
+                                  self.frac_bits(n)))
+        return rows
+
+    def to_dag(self, title):
+        """The merged DAG for one stage, annotated with ranges."""
+        stage = self.stages[title]
+        ranges = {r.id: r for r in self.report() if r.stage == title}
+        g = dag.Dag(title)
+        for (i, n) in enumerate(stage.nodes):
+            label = n.op
+            r = ranges.get(i)
+            if r:
+                label += '\\n[{:.4g}, {:.4g}]\\nQ{}.{}'.format(
+                    r.observed[0], r.observed[1],
+                    _bits_str(r.provable_int_bits), r.frac_bits)
+            g.add_node(label, i, n.type)
+            if i in stage.inputs:
+                g.tag_input(i)
+            if i in stage.outputs:
+                g.tag_output(i)
+            if i in stage.constants:
+                g.tag_constant(i)
+            if r:
+                g.annotate(i,
+                           observed='{:.6g} {:.6g}'.format(*r.observed),
+                           provable='{:.6g} {:.6g}'.format(*r.provable),
+                           int_bits=r.int_bits,
+                           provable_int_bits=_bits_str(r.provable_int_bits),
+                           frac_bits=r.frac_bits,
+                           count=r.count)
+            for p in n.preds:
+                g.add_edge(p, i)
+        return g
+
+
+def _observed_intervals(node):
+    if node.lo is None:
+        return None
+    return list(zip(node.lo, node.hi))
+
+
+def _bits_str(bits):
+    return '∞' if bits is None else str(bits)
+
+
+def analyze(width, height, frame_count, **kwargs):
+    numz = RangeNumerics(**kwargs)
+    my_scene = scene.Scene(width, height, numerics=numz)
+    for pixels in my_scene.render_anim(frame_count):
+        pass
+    return numz
+
+
+def main(argv):
+    from main import WIDTH, HEIGHT
+    frame_count = int(argv[0]) if argv else 2
+    numz = analyze(WIDTH, HEIGHT, frame_count)
+    print('{:5} {:>4}  {:24} {:>23} {:>23} {:>4} {:>4} {:>4}'
+          .format('stage', 'id', 'op', 'observed', 'provable',
+                  'int', 'pint', 'frac'))
+    for r in numz.report():
+        print('{:5} {:4}  {:24} {:>11.4g} {:>11.4g} {:>11.4g} {:>11.4g} '
+              '{:>4} {:>4} {:>4}'
+              .format(r.stage, r.id, r.op[:24], r.observed[0],
+                      r.observed[1], r.provable[0], r.provable[1],
+                      r.int_bits, _bits_str(r.provable_int_bits),
+                      r.frac_bits))
+    for title in numz.stages:
+        with open('{}-ranges.dot'.format(title.lower()), 'w') as f:
+            f.write(numz.to_dag(title).to_dot())
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
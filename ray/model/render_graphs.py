@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+
+# Render the .dot files that Numerics writes, in parallel.
+#
+# Each graph is rendered by Graphviz into a cache directory, keyed by a
+# hash of the .dot contents and output format, so unchanged graphs are
+# never rendered twice.  The output file next to each .dot is a copy
+# (hard link when possible) of the cached one.
+#
+#     $ render_graphs.py frame-*.dot pixel-*.dot
+#     $ render_graphs.py -i index.html pixel-*.dot
+#     $ render_graphs.py --open frame-000.dot
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import html
+import os
+import shutil
+import subprocess
+import sys
+import threading
+
+
+CACHE_DIR = '.graph-cache'
+
+
+def cache_path(dot_text, fmt, cache_dir=CACHE_DIR):
+    digest = hashlib.sha1(fmt.encode() + b'\0' + dot_text).hexdigest()
+    return os.path.join(cache_dir, digest[:2], '{}.{}'.format(digest, fmt))
+
+
+def _temp_name(path):
+    # Unique to this process and thread, so concurrent renders of the
+    # same graph don't share it.  Not created here, so os.link can use
+    # it and Graphviz creates it with the usual permissions.
+    return '{}.{}.{}.tmp'.format(path, os.getpid(), threading.get_ident())
+
+
+def _place(src, dst):
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        return
+    # Link (or copy) to a temporary name, then rename it over dst, so
+    # dst is never missing or half written.
+    tmp = _temp_name(dst)
+    try:
+        try:
+            os.link(src, tmp)
+        except OSError:
+            shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def render_one(dot, fmt='png', cache_dir=CACHE_DIR, dot_cmd='dot'):
+    """Render one .dot file.  Returns (output path, was it cached)."""
+    with open(dot, 'rb') as f:
+        text = f.read()
+    out = os.path.splitext(dot)[0] + '.' + fmt
+    cached = cache_path(text, fmt, cache_dir)
+    hit = os.path.exists(cached)
+    if not hit:
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        tmp = _temp_name(cached)
+        try:
+            # Graphviz runs in its own process, so threads parallelize it.
+            subprocess.run([dot_cmd, '-T' + fmt, '-o', tmp],
+                           input=text, check=True)
+            os.replace(tmp, cached)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+    _place(cached, out)
+    return out, hit
+
+
+def render_all(dots, fmt='png', jobs=None, cache_dir=CACHE_DIR,
+               dot_cmd='dot', verbose=True):
+    jobs = jobs or os.cpu_count()
+    outputs = []
+    hits = 0
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(render_one, d, fmt, cache_dir, dot_cmd)
+                   for d in dots]
+        for (dot, fut) in zip(dots, futures):
+            out, hit = fut.result()
+            hits += hit
+            outputs.append(out)
+            if verbose:
+                print('{}{}'.format(dot[:-4], ' (cached)' if hit else ''))
+    if verbose:
+        print('{} rendered, {} cached'.format(len(dots) - hits, hits))
+    return outputs
+
+
+def write_index(path, images, title='DAGs'):
+    """One browsable page of all the rendered graphs."""
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, 'w') as f:
+        print('<!DOCTYPE html>', file=f)
+        print('<html><head><meta charset="utf-8">', file=f)
+        print('<title>{}</title>'.format(html.escape(title)), file=f)
+        print('<style>figure { display: inline-block; margin: 8px; } '
+              'img { max-width: 320px; max-height: 320px; }</style>',
+              file=f)
+        print('</head><body>', file=f)
+        print('<h1>{}</h1>'.format(html.escape(title)), file=f)
+        for img in images:
+            rel = html.escape(os.path.relpath(os.path.abspath(img), base))
+            name = html.escape(os.path.basename(img))
+            print('<figure><a href="{0}"><img src="{0}" loading="lazy">'
+                  '</a><figcaption>{1}</figcaption></figure>'
+                  .format(rel, name), file=f)
+        print('</body></html>', file=f)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description='Render Graphviz files in parallel, with caching.')
+    parser.add_argument('dots', nargs='+', metavar='DOT')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='parallel Graphviz processes (default: CPUs)')
+    parser.add_argument('-T', '--format', default='png',
+                        help='output format (default: png)')
+    parser.add_argument('-c', '--cache-dir', default=CACHE_DIR)
+    parser.add_argument('-i', '--index', metavar='HTML',
+                        help='write an index page of all outputs')
+    parser.add_argument('--open', action='store_true',
+                        help='open the index, or each output if no index')
+    args = parser.parse_args(argv)
+
+    outputs = render_all(args.dots, args.format, args.jobs, args.cache_dir)
+    opened = outputs
+    if args.index:
+        write_index(args.index, outputs)
+        opened = [args.index]
+    if args.open:
+        if sys.platform == 'darwin':
+            subprocess.call(['open'] + opened)
+        else:
+            for path in opened:
+                subprocess.call(['xdg-open', path])
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -1,5 +1,11 @@
-from collections import namedtuple
+from collections import Counter, namedtuple
+
+import numpy as np
+
+from framebuffer import Framebuffer
+from numerics import Diverged
 from trickery import lazy_scalar, lazy_vec3, lazy_angle, define_constants
+from trickery import redefine_constant
 
 
 # Numeric constants are defined lazily.  When the caller passes in an
@@ -44,6 +50,9 @@ lazy_scalar('SPHERE_RADIUS', 3)
 lazy_vec3('SPHERE_COLOR', (0.9, 0.9, 0))
 lazy_scalar('SPHERE_ALPHA', 0.3)
 
+MIN_WEIGHT = 1 / 255           # one unorm step
+BOUNCE_RAYS = 2                # a reflected ray and its shadow ray
+
 
 def lerp(a, b, frac):
     return (frac.__class__(1) - frac) * a + frac * b
@@ -52,6 +61,7 @@ def lerp(a, b, frac):
 Ray = namedtuple('Ray', 'origin direction')
 Camera = namedtuple('Camera', 'position x_angle, y_angle')
 Light = namedtuple('Light', 'direction')
+Scan = namedtuple('Scan', 'direction')
 
 
 class Plane(namedtuple('Plane', 'origin normal')):
@@ -89,18 +99,61 @@ class Sphere(namedtuple('Sphere', 'center radius')):
                 ('Hit', 't intersection normal reflect_ray')
                 (t, intersection, normal, reflect_ray))
 
+    def occludes(self, ray):
+        """Whether `ray` hits the sphere, for shadows.  Only intersect's
+           two tests: no square root, normal or reflection.
+        """
+        L = self.center - ray.origin
+        tca = ray.direction @ L
+        if tca < 0:
+            return False
+        d2 = L @ L - tca * tca
+        return not self.radius * self.radius - d2 < 0
+
+
+def spheres_occlude(centers, radii, origins, directions):
+    """Sphere.occludes for many rays and spheres at once, in NumPy:
+       centers (s, 3), radii (s,), origins and directions (r, 3).
+       Returns (r,) bools, true where a ray hits any sphere.
+    """
+    L = centers[None, :, :] - origins[:, None, :]
+    tca = np.einsum('rk,rsk->rs', directions, L)
+    d2 = np.einsum('rsk,rsk->rs', L, L) - tca * tca
+    return ((tca >= 0) & (radii * radii - d2 >= 0)).any(axis=1)
+
 
 class Scene:
 
-    def __init__(self, width, height, numerics):
+    def __init__(self, width, height, numerics, scanline=False, depth=1,
+                 ray_budget=None):
         self.width = width
         self.height = height
         self.numerics = numerics
+        # Step each primary ray's direction from the last pixel's,
+        # instead of computing it.  See strength.py.
+        self.scanline = scanline
+        # Reflection bounces a ray may take, and the most rays (primary,
+        # reflected and shadow) a frame may trace.  Only reflections are
+        # cut to fit, so a budget smaller than the frame's primary and
+        # shadow rays is overrun by the difference.  See bounce().
+        self.depth = depth
+        self.ray_budget = ray_budget
+        self.others = ()                # more spheres, that don't move
         define_constants(globals(), numerics)
+        self._derive()
+        self.start_rays()
+
+    def _derive(self):
         self.plane = Plane(origin=PLANE_ORIGIN, normal=PLANE_NORMAL)
         self.light = Light(direction=LIGHT_DIRECTION.normalize())
 
-    def render_scene(self):
+    def set_constants(self, **values):
+        """Change lazy constants, e.g. SPHERE_ALPHA=0.5."""
+        for (name, value) in values.items():
+            redefine_constant(globals(), self.numerics, name, value)
+        self._derive()
+
+    def render_scene(self, fb=None):
         cam_pos = self.numerics.vec3(0, 10, -10)
         # cam_x_angle = self.numerics.angle(degrees=20)
         # cam_y_angle = self.numerics.angle(degrees=10)
@@ -109,9 +162,10 @@ class Scene:
                              x_angle=CAMERA_X_ANGLE,
                              y_angle=CAMERA_Y_ANGLE)
         self.sphere = Sphere(center=sphere_pos, radius=SPHERE_RADIUS)
-        return self.collect_pixels()
+        self.start_rays()
+        return self.collect_pixels(fb)
 
-    def render_anim(self, frame_count):
+    def start_anim(self):
         self.cam_pos_u = 0
         self.cam_pos_v = 0
         self.sphere_pos_x = 0
@@ -119,8 +173,13 @@ class Scene:
         self.sphere_inc_x = +7 / 2**5
         self.sphere_inc_z = +4 / 2**5
 
+    def render_anim(self, frame_count, fb=None):
+        """Yield each frame's Framebuffer.  If `fb` is given, every
+           frame is rendered into it.
+        """
+        self.start_anim()
         for frame in range(frame_count):
-            yield self.render_frame(frame)
+            yield self.render_frame(frame, fb)
 
     def precalc_camera(self):
         """Precalculate the camera parameters that don't require DSP.
@@ -144,9 +203,9 @@ class Scene:
         pos_y = pos_cos * S(8) + S(10)
         pos_z = pos_cos * S(5) - S(25)
         pos = self.numerics.vec3(pos_x, pos_y, pos_z)
-        x_angle = self.numerics.angle(degrees=10)
-        y_angle = self.numerics.angle(units=45)
-        return Camera(position=pos, x_angle=x_angle, y_angle=y_angle)
+        return Camera(position=pos,
+                      x_angle=CAMERA_X_ANGLE,
+                      y_angle=CAMERA_Y_ANGLE)
 
     def precalc_sphere(self, frame):
         """Precalculate the sphere parameters that don't require DSP.
@@ -198,7 +257,20 @@ class Scene:
         pos = self.numerics.vec3(center_x, center_y, center_z)
         return Sphere(center=pos, radius=SPHERE_RADIUS)
 
-    def render_frame(self, frame):
+    def render_frame(self, frame, fb=None):
+        self.prepare_frame(frame)
+        return self.collect_pixels(fb)
+
+    def render_preview(self, frame, fb=None, block=8):
+        """render_frame, coarse to fine: yield (block, fb) each time
+           refine_pixels finishes a level.
+        """
+        self.prepare_frame(frame)
+        yield from self.refine_pixels(fb, block)
+
+    def prepare_frame(self, frame):
+        """The frame stage: the camera and sphere for `frame`."""
+        self.start_rays()
         pre_cam = self.precalc_camera()
         pre_sphere = self.precalc_sphere(frame)
         # print('pre_cam', pre_cam)
@@ -212,27 +284,83 @@ class Scene:
         # print('sphere', self.sphere)
         self.numerics.end_frame(self.camera, self.sphere)
 
-        pixels = self.collect_pixels()
-        return pixels
+    def collect_pixels(self, fb=None):
+        if fb is None:
+            fb = Framebuffer(self.width, self.height)
+        if self.scanline:
+            return self.scan_pixels(fb)
+        for iy in range(self.height):
+            for ix in range(self.width):
+                fb.put(ix, iy, self.render_pixel(ix, iy))
+        return fb
+
+    def refine_pixels(self, fb=None, block=8):
+        """collect_pixels, coarse to fine.  Trace one ray per block ×
+           block square and fill the square with it, then halve the
+           block until it is a pixel.  Each sample is the top left
+           corner of its square at every finer level, so it is kept,
+           and every pixel is traced once in all.  Yields (block, fb)
+           after each level.  Always computes ray directions; see
+           scan_pixels.
+        """
+        assert block > 0 and block & (block - 1) == 0
+        if fb is None:
+            fb = Framebuffer(self.width, self.height)
+        a = fb.array
+        size = block
+        while size:
+            done = 2 * size                     # the last level's spacing
+            for iy in range(0, self.height, size):
+                for ix in range(0, self.width, size):
+                    if size < block and not ix % done and not iy % done:
+                        continue
+                    a[iy:iy + size, ix:ix + size, :3] = \
+                        self.render_pixel(ix, iy)
+            yield size, fb
+            size //= 2
+
+    def scan_steps(self):
+        """The primary ray direction at pixel (0, 0), and how much it
+           changes per step in x and per step in y.
+        """
+        S = self.numerics.scalar
+        d0 = self.ray_direction(S(0), S(0))
+        dx = self.ray_direction(S(1), S(0)) - d0
+        dy = self.ray_direction(S(0), S(1)) - d0
+        return d0, dx, dy
+
+    def scan_directions(self):
+        """(ix, iy, direction) for each pixel in the order the LED
+           driver counts, x along a row, then y, with each direction
+           stepped from the last.
+        """
+        d0, dx, dy = self.scan_steps()
+        row = d0
+        for iy in range(self.height):
+            direction = row
+            for ix in range(self.width):
+                yield ix, iy, direction
+                direction = direction + dx
+            row = row + dy
+
+    def scan_pixels(self, fb):
+        """collect_pixels, stepping the ray direction the way the
+           LED driver counts.
+        """
+        for (ix, iy, direction) in self.scan_directions():
+            fb.put(ix, iy, self.render_pixel(ix, iy, direction))
+        return fb
 
-    def collect_pixels(self):
-        # return [[self.render_pixel(2, 47)]]
-        return [
-            [
-                self.render_pixel(ix, iy)
-                for ix in range(self.width)
-            ]
-            for iy in range(self.height)
-        ]
+    def ray_direction(self, x, y):
+        """The primary ray's direction through pixel (x, y), not yet
+           normalized.  It is affine in x and y.
+        """
+        return (self.image_point(x, y)
+                .rotate(self.camera.x_angle, 'X')
+                .rotate(self.camera.y_angle, 'Y'))
 
-    def render_pixel(self, ix, iy):
-        x = self.numerics.scalar(ix)
-        y = self.numerics.scalar(iy)
-        pixel = namedtuple('Pixel', 'x y')(x, y)
-        # print('render_pixel({}, {})'.format(ix, iy))
-        self.numerics.start_pixel(pixel,
-                                  self.camera,
-                                  self.sphere)
+    def image_point(self, x, y):
+        """Pixel (x, y) on the image plane, before the camera turns."""
         x_start = self.numerics.scalar(-1 / 2)
         y_start = self.numerics.scalar(+1 / 2)
         x_step = self.numerics.scalar(+1 / min(self.width, self.height))
@@ -241,32 +369,123 @@ class Scene:
         px = x_start + x * x_step
         py = y_start + y * y_step
         pz = self.numerics.scalar(1)
+        return self.numerics.vec3(px, py, pz)
+
+    def render_pixel(self, ix, iy, direction=None):
+        """`direction` is the primary ray's, not normalized, if the
+           caller stepped it (see scan_pixels).
+        """
+        x = self.numerics.scalar(ix)
+        y = self.numerics.scalar(iy)
+        pixel = namedtuple('Pixel', 'x y')(x, y)
+        # print('render_pixel({}, {})'.format(ix, iy))
+        if direction is None:
+            self.numerics.start_pixel(pixel,
+                                      self.camera,
+                                      self.sphere)
+            direction = self.ray_direction(x, y)
+        else:
+            self.numerics.start_pixel(pixel,
+                                      self.camera,
+                                      self.sphere,
+                                      Scan(direction))
         primary = Ray(origin=self.camera.position,
-                      direction=self.numerics.vec3(px, py, pz)
-                          .rotate(self.camera.x_angle, 'X')
-                          .rotate(self.camera.y_angle, 'Y')
-                          .normalize())
+                      direction=direction.normalize())
         # print(ix, iy, primary)
+        if self.ray_budget is not None:
+            self.allowance = ((self.ray_budget - self.frame_rays) /
+                              max(1, self.pixels_left))
+        self.pixel_rays = 0
         color = self.trace(primary).to_unorm()
+        self.pixels_left -= 1
         pixel_color = namedtuple('Pixel', 'color')(color)
         self.numerics.end_pixel(pixel_color)
         return color.as_tuple()
 
-    def trace(self, ray, primary=True):
-        if primary:
-            hit = self.sphere.intersect(ray)
-            if hit:
-                C = self.trace(hit.reflect_ray, primary=False)
-                C = lerp(SPHERE_COLOR, C, SPHERE_ALPHA)
-                spot_light = hit.reflect_ray.direction @ self.light.direction
-                if not spot_light < 0:
-                    spot_light_e2 = spot_light * spot_light
-                    spot_light_e4 = spot_light_e2 * spot_light_e2
-                    spot_light_e8 = spot_light_e4 * spot_light_e4
-                    C = C + SHADOW_ATTEN * spot_light_e8
-                    # Clamp not needed.  to_unorm clamps later.
-                    # C = C.clamp()
-                return C
+    def start_rays(self):
+        """Zero the frame's ray counts and budget."""
+        self.rays = Counter()           # depth or 'shadow' -> rays
+        self.frame_rays = 0
+        self.pixel_rays = 0
+        self.pixels_left = self.width * self.height
+        self.allowance = None
+
+    def _count_ray(self, kind):
+        self.rays[kind] += 1
+        self.frame_rays += 1
+        self.pixel_rays += 1
+
+    def spheres(self):
+        return (self.sphere,) + self.others
+
+    def bounce(self, depth, weight):
+        """Whether to trace a reflection at `depth` that contributes
+           `weight` of the pixel.  Not if it would go past the depth
+           limit or change the pixel by less than one unorm step, nor,
+           with a ray budget, if the reflection and its shadow ray
+           would take this pixel past its share of what is left of the
+           frame's.  A pixel that uses less leaves more for the rest.
+        """
+        if depth >= self.depth:
+            return False
+        small = weight < MIN_WEIGHT
+        if isinstance(small, np.ndarray):
+            # A swept SPHERE_ALPHA: the variants split where they
+            # disagree, as they do at a test.
+            if small.any() and not small.all():
+                raise Diverged(small)
+            small = small.all()
+        if small:
+            return False
+        # The reflected ray may need a shadow ray too; deeper bounces
+        # ask again.
+        return (self.allowance is None or
+                self.pixel_rays + BOUNCE_RAYS <= self.allowance)
+
+    def nearest_sphere(self, ray, source=None):
+        """(hit, sphere) for the nearest sphere `ray` hits, or (None,
+           None).  A reflected ray can't hit `source`, the sphere it
+           leaves.
+        """
+        nearest = (None, None)
+        for sphere in self.spheres():
+            if sphere is source:
+                continue
+            hit = sphere.intersect(ray)
+            if hit and (nearest[0] is None or hit.t - nearest[0].t < 0):
+                nearest = (hit, sphere)
+        return nearest
+
+    def occluded(self, ray):
+        """Whether any sphere is in the way of `ray`.  Stops at the
+           first one.
+        """
+        return any(sphere.occludes(ray) for sphere in self.spheres())
+
+    def trace(self, ray, depth=0, weight=1.0, source=None):
+        """The color `ray` sees.  It is `depth` reflections from the
+           eye and contributes `weight` of the pixel.  When a
+           reflection isn't traced, the sphere reflects the background.
+        """
+        self._count_ray(depth)
+        hit, sphere = self.nearest_sphere(ray, source)
+        if hit:
+            reflected = weight * SPHERE_ALPHA.value
+            if self.bounce(depth, reflected):
+                C = self.trace(hit.reflect_ray, depth + 1, reflected,
+                               sphere)
+            else:
+                C = BACKGROUND_COLOR
+            C = lerp(SPHERE_COLOR, C, SPHERE_ALPHA)
+            spot_light = hit.reflect_ray.direction @ self.light.direction
+            if not spot_light < 0:
+                spot_light_e2 = spot_light * spot_light
+                spot_light_e4 = spot_light_e2 * spot_light_e2
+                spot_light_e8 = spot_light_e4 * spot_light_e4
+                C = C + SHADOW_ATTEN * spot_light_e8
+                # Clamp not needed.  to_unorm clamps later.
+                # C = C.clamp()
+            return C
         hit = self.plane.intersect(ray)
         if not hit:
             return BACKGROUND_COLOR
@@ -275,10 +494,10 @@ class Scene:
             not pisect.x.abs() - CHECKER_X_EXTENT < 0):
             return PLANE_COLOR
         reverse_light_ray = Ray(pisect, self.light.direction)
-        light_intersects = self.sphere.intersect(reverse_light_ray)
+        self._count_ray('shadow')
         checker = pisect.x.xor4(pisect.z)
         C = lerp(CHECK0_COLOR, CHECK1_COLOR, checker)
-        if light_intersects:
+        if self.occluded(reverse_light_ray):
             C = SHADOW_ATTEN * C
         return C
 
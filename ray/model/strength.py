@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+
+# Strength reduction of the primary ray setup.
+#
+# render_pixel computes px = x_start + x * x_step and py = y_start +
+# y * y_step, and rotates (px, py, 1) by the camera angles.  Until it is
+# normalized, the direction is affine in the pixel indices:
+#
+#     d(x, y) = d(0, 0) + x dx + y dy
+#
+# The LED driver hands each painter its pixels in raster order (see
+# painter_counter in include/led-pdm-gamma.v): x counts 0 to 63 along a
+# row, then y steps, and painter p starts at row 32p.  So the pipeline
+# can keep d in an accumulator that adds dx when x steps, and reloads
+# at the start of each row from a row accumulator that adds dy when y
+# steps.  No multiplies.
+#
+# `affine` finds the pixel nodes that are affine in Pixel.x and Pixel.y
+# with constant coefficients.  `reduce` turns the ones a non-affine
+# node reads into new pixel inputs, `Scan.n<id>`, which carry their
+# coefficients, and gives each accumulator enough fraction bits that
+# it stays within half an LSB of the exact value over the whole frame.
+# emit_verilog.Pipeline builds the accumulators.  Coefficients that
+# change by frame would need the frame unit; nodes with those are left
+# alone.
+#
+# Scene(..., scanline=True) is the model's side: it steps the direction
+# the same way, in floating point, instead of computing it per pixel.
+#
+#     $ strength.py [frames]
+#
+# prints what is reduced, the accumulator error, and the multiplies and
+# render time it saves.
+
+import copy
+import sys
+import time
+
+import numpy as np
+
+import hoist
+import numerics
+import ranges
+import scene
+
+
+PAINTERS = 2
+PAINTER_ROWS = 32               # painter p paints rows 32p to 32p + 31
+MAX_GUARD = 16                  # accumulator fraction bits beyond the node's
+
+
+def _is_const(stage, i):
+    n = stage.nodes[i]
+    return i in stage.constants and n.lo is not None and n.lo == n.hi
+
+
+def _plus(a, b):
+    return tuple(x + y for (x, y) in zip(a, b))
+
+
+def _minus(a, b):
+    return tuple(x - y for (x, y) in zip(a, b))
+
+
+def _scale(k, a):
+    return tuple(k * x for x in a)
+
+
+def _varies(form):
+    return any(cx or cy for (_, cx, cy) in form)
+
+
+def _form(op, args):
+    """The coefficients of an op's result, from its arguments'.  None
+       if it isn't affine.
+    """
+    if op in ('add', 'sub'):
+        f = _plus if op == 'add' else _minus
+        n = max(map(len, args))
+        a, b = (ranges._broadcast(x, n) for x in args)
+        return [f(x, y) for (x, y) in zip(a, b)]
+    if op == 'mul':
+        a, b = args
+        if _varies(a) and _varies(b):
+            return None
+        if _varies(a):
+            a, b = b, a
+        n = max(len(a), len(b))
+        return [_scale(k[0], x) for (k, x) in zip(ranges._broadcast(a, n),
+                                                  ranges._broadcast(b, n))]
+    if op == 'vec':
+        return [a[0] for a in args]
+    if op.startswith('index'):
+        return [args[0][int(op[5:])]]
+    if op in ('rotX', 'rotY'):
+        (v, s, c) = args
+        if _varies(s) or _varies(c):
+            return None
+        (s, _, _), = s
+        (c, _, _), = c
+        x, y, z = v
+        if op == 'rotX':
+            return [x,
+                    _minus(_scale(c, y), _scale(s, z)),
+                    _plus(_scale(s, y), _scale(c, z))]
+        return [_plus(_scale(c, x), _scale(s, z)),
+                y,
+                _minus(_scale(c, z), _scale(s, x))]
+    return None
+
+
+def affine(stage):
+    """{id: coefficients} of the nodes in a pixel Stage that are affine
+       in Pixel.x and Pixel.y with constant coefficients.  Coefficients
+       are one (c0, cx, cy) per component, for c0 + x cx + y cy.
+    """
+    forms = {}
+    for (i, n) in enumerate(stage.nodes):           # ids are topological
+        if n.op == 'Pixel.x':
+            forms[i] = [(0.0, 1.0, 0.0)]
+        elif n.op == 'Pixel.y':
+            forms[i] = [(0.0, 0.0, 1.0)]
+        elif (i in stage.inputs or i in stage.outputs or not n.preds or
+              not any(p in forms for p in n.preds) or
+              not all(p in forms or _is_const(stage, p) for p in n.preds)):
+            continue
+        else:
+            args = [forms[p] if p in forms else
+                    [(v, 0.0, 0.0) for v in stage.nodes[p].lo]
+                    for p in n.preds]
+            form = _form(n.op, args)
+            if form is not None:
+                forms[i] = form
+    return forms
+
+
+def frontier(stage, forms):
+    """Affine nodes that a node that isn't affine reads."""
+    return {p for (i, n) in enumerate(stage.nodes) if i not in forms
+            for p in n.preds
+            if p in forms and p not in stage.inputs}
+
+
+def quantize(coeffs, frac):
+    """One component's accumulator constants, with `frac` fraction
+       bits: each painter's first row's value, and the x and y steps.
+    """
+    c0, cx, cy = coeffs
+    q = lambda v: round(v * 2 ** frac)
+    return ([q(c0 + p * PAINTER_ROWS * cy) for p in range(PAINTERS)],
+            q(cx), q(cy))
+
+
+def scan_error(coeffs, frac, width, height):
+    """The largest difference, over the frame, between the exact value
+       and what the accumulator holds.  The accumulator only adds
+       integers, so its value at (x, y) is exactly row base + row dy +
+       x dx.
+    """
+    c0, cx, cy = coeffs
+    bases, dx, dy = quantize(coeffs, frac)
+    x = np.arange(width)
+    y = np.arange(height)
+    acc = ((np.array(bases)[y // PAINTER_ROWS] + y % PAINTER_ROWS * dy)
+           [:, None] + x * dx)
+    exact = c0 + x * cx + y[:, None] * cy
+    return np.abs(acc / 2 ** frac - exact).max()
+
+
+def guard_bits(coeffs, frac, width, height):
+    """Fraction bits beyond `frac` that keep the accumulator within half
+       an LSB of `frac`.
+    """
+    for g in range(MAX_GUARD + 1):
+        if scan_error(coeffs, frac + g, width, height) <= 2 ** -(frac + 1):
+            return g
+    return MAX_GUARD
+
+
+def _extent(coeffs, width, height, slack):
+    c0, cx, cy = coeffs
+    ends = [c0 + x * cx + y * cy
+            for x in (0, width - 1) for y in (0, height - 1)]
+    return min(ends) - slack, max(ends) + slack
+
+
+def reduce(numz, width=64, height=64):
+    """A copy of RangeNumerics `numz` with the affine pixel nodes that
+       feed the rest replaced by Scan inputs, and ranges proved again.
+       A Scan input's node has `scan`, its coefficients, and
+       `scan_frac`, its accumulator's fraction bits.
+    """
+    assert height <= PAINTERS * PAINTER_ROWS
+    pixel = copy.deepcopy(numz.stages['Pixel'])
+    forms = affine(pixel)
+    edge = frontier(pixel, forms)
+    input_ranges = dict(numz.input_ranges)
+    for i in sorted(edge):
+        n = copy.copy(pixel.nodes[i])
+        n.op = 'Scan.n{}'.format(i)
+        n.preds = ()
+        n.scan = forms[i]
+        frac = numz.frac_bits(n)
+        n.scan_frac = frac + max(guard_bits(c, frac, width, height)
+                                 for c in n.scan)
+        input_ranges[n.op] = [_extent(c, width, height, 2 ** -(frac + 1))
+                              for c in n.scan]
+        # The node becomes an input; what fed it is dead.
+        pixel.nodes[i] = n
+        pixel.inputs.add(i)
+    result = copy.copy(numz)
+    result.stages = dict(numz.stages, Pixel=pixel)
+    result.input_ranges = input_ranges
+    result.prove()
+    result.reduced = edge
+    result.forms = forms
+    return result
+
+
+def _render(width, height, frame_count, scanline):
+    my_scene = scene.Scene(width, height, numerics=numerics.QuietNumerics(),
+                           scanline=scanline)
+    start = time.perf_counter()
+    frames = [fb for fb in my_scene.render_anim(frame_count)]
+    return time.perf_counter() - start, frames
+
+
+def main(argv):
+    from main import WIDTH, HEIGHT
+    frame_count = int(argv[0]) if argv else 2
+    numz = ranges.analyze(WIDTH, HEIGHT, frame_count)
+    pixel = numz.stages['Pixel']
+    reduced = reduce(numz, WIDTH, HEIGHT)
+    print('{} affine pixel nodes, {} reduced to scan accumulators'
+          .format(len(set(reduced.forms) - pixel.inputs),
+                  len(reduced.reduced)))
+    for i in sorted(reduced.reduced):
+        n = reduced.stages['Pixel'].nodes[i]
+        frac = numz.frac_bits(pixel.nodes[i])
+        print('  {} ({}), Q.{} accumulated in Q.{}'.format(
+            n.op, pixel.nodes[i].op, frac, n.scan_frac))
+        for (c, coeffs) in enumerate(n.scan):
+            err = scan_error(coeffs, n.scan_frac, WIDTH, HEIGHT)
+            print('    [{}] {:+.6f} {:+.6f} x {:+.6f} y   max error {:.3g}'
+                  ' ({:.3f} LSB)'.format(c, *coeffs, err, err * 2 ** frac))
+    _, bm = hoist.per_pixel_cost(pixel)
+    _, am = hoist.per_pixel_cost(reduced.stages['Pixel'])
+    print('multiplies per pixel: {} -> {}, {} removed'.format(bm, am, bm - am))
+
+    direct, want = _render(WIDTH, HEIGHT, frame_count, False)
+    scanned, got = _render(WIDTH, HEIGHT, frame_count, True)
+    differ = sum(int((a.array != b.array).any(axis=-1).sum())
+                 for (a, b) in zip(want, got))
+    print('software: {:.3f} s direct, {:.3f} s scanline, {} of {} pixels '
+          'differ'.format(direct, scanned, differ,
+                          WIDTH * HEIGHT * frame_count))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+
+# Parameter sweeps.
+#
+# Renders a grid of values for some of scene.py's lazy constants in one
+# pass.  Each swept constant holds a NumPy array, one element per
+# variant, so every op in the model works on all variants at once.
+# When a test comes out differently across variants (numerics.Diverged),
+# that pixel is rendered again for each group separately.  Constants
+# that only color things never diverge; ones that move edges, like
+# CHECKER_X_EXTENT, split only the pixels near the edges.
+#
+# Values are a list, `lo:hi:count`, or, for vectors, JSON.  Angles are
+# in degrees.
+#
+#     $ sweep.py SPHERE_ALPHA=0:1:10 SHADOW_ATTEN=0.2,0.5,0.8
+#     $ sweep.py -f 4 -p CHECKER_X_EXTENT=10:26:5 CAMERA_X_ANGLE=0:20:5
+#     $ sweep.py 'LIGHT_DIRECTION=[[1, 2, -1], [1, 4, -1], [-1, 2, -1]]'
+
+import argparse
+from contextlib import contextmanager
+from itertools import product
+import json
+import math
+import sys
+import time
+
+import numpy as np
+import PIL.Image
+import PIL.ImageDraw
+
+import numerics
+import scene
+import trickery
+
+
+def take(obj, mask):
+    """`obj` with only the variants in `mask`."""
+    if isinstance(obj, numerics.Scalar):
+        if numerics._batched(obj.value):
+            return numerics.Scalar(obj.value[mask])
+        return obj
+    if isinstance(obj, numerics.Vec3):
+        return numerics.Vec3(*(take(v, mask) for v in obj.values))
+    if isinstance(obj, numerics.Angle):
+        if numerics._batched(obj.radians):
+            return numerics.Angle(radians=obj.radians[mask])
+        return obj
+    if isinstance(obj, tuple) and hasattr(obj, '_fields'):
+        return obj._make(take(f, mask) for f in obj)
+    return obj
+
+
+class SweepScene(scene.Scene):
+    """A Scene whose frames are (variants, height, width, 3) arrays."""
+
+    def __init__(self, width, height, numerics, variants, names):
+        super().__init__(width, height, numerics)
+        self.variants = variants
+        self.names = names
+        self.splits = 0
+
+    @contextmanager
+    def _restricted(self, mask):
+        attrs = ('camera', 'sphere', 'light', 'plane')
+        saved = [getattr(self, a) for a in attrs]
+        saved_constants = [vars(scene)[n] for n in self.names]
+        for (a, v) in zip(attrs, saved):
+            setattr(self, a, take(v, mask))
+        for (n, v) in zip(self.names, saved_constants):
+            vars(scene)[n] = take(v, mask)
+        try:
+            yield
+        finally:
+            for (a, v) in zip(attrs, saved):
+                setattr(self, a, v)
+            for (n, v) in zip(self.names, saved_constants):
+                vars(scene)[n] = v
+
+    def _pixel(self, ix, iy, lanes, out):
+        try:
+            color = self.render_pixel(ix, iy)
+        except numerics.Diverged as d:
+            self.splits += 1
+            for mask in (d.mask, ~d.mask):
+                with self._restricted(mask):
+                    self._pixel(ix, iy, lanes[mask], out)
+            return
+        for (c, v) in enumerate(color):
+            out[lanes, iy, ix, c] = v
+
+    def collect_pixels(self, fb=None):
+        # Not one Framebuffer but an array of them; `fb` is ignored.
+        lanes = np.arange(self.variants)
+        out = np.empty((self.variants, self.height, self.width, 3),
+                       dtype=np.uint8)
+        for iy in range(self.height):
+            for ix in range(self.width):
+                self._pixel(ix, iy, lanes, out)
+        return out
+
+
+def _kind(name):
+    for (kind, table) in (('scalar', trickery.scalars),
+                          ('vec3', trickery.vectors),
+                          ('angle', trickery.angles)):
+        if name in dict(table):
+            return kind
+    raise KeyError('no constant {!r}'.format(name))
+
+
+def batch_constants(axes):
+    """The grid of `axes`, {name: [values]}, as batched constants for
+       Scene.set_constants, and the list of variants.
+    """
+    names = list(axes)
+    variants = [dict(zip(names, vs))
+                for vs in product(*(axes[n] for n in names))]
+    batched = {}
+    for name in names:
+        column = np.array([v[name] for v in variants], dtype=float)
+        kind = _kind(name)
+        if kind == 'scalar':
+            batched[name] = column
+        elif kind == 'vec3':
+            batched[name] = tuple(column.T)
+        else:
+            batched[name] = {'degrees': column}
+    return batched, variants
+
+
+class Sweep:
+
+    def __init__(self, frames, variants, seconds, splits):
+        self.frames = frames            # (frames, variants, h, w, 3)
+        self.variants = variants        # [{name: value}]
+        self.seconds = seconds
+        self.splits = splits
+
+    def contact_sheet(self, frame=0, columns=None, labels=True):
+        n, h, w, _ = self.frames[frame].shape
+        columns = columns or math.ceil(math.sqrt(n))
+        rows = math.ceil(n / columns)
+        label_h = 12 if labels else 0
+        sheet = PIL.Image.new('RGB', (columns * (w + 2),
+                                      rows * (h + 2 + label_h)))
+        draw = PIL.ImageDraw.Draw(sheet)
+        for (i, img) in enumerate(self.frames[frame]):
+            x = i % columns * (w + 2) + 1
+            y = i // columns * (h + 2 + label_h) + 1
+            sheet.paste(PIL.Image.fromarray(img), (x, y))
+            if labels:
+                draw.text((x, y + h), str(i), fill=(255, 255, 255))
+        return sheet
+
+
+def sweep(width, height, axes, frame_count=1):
+    batched, variants = batch_constants(axes)
+    numz = numerics.QuietNumerics()
+    my_scene = SweepScene(width, height, numz, len(variants), list(axes))
+    saved = {n: vars(scene)[n] for n in axes}
+    try:
+        my_scene.set_constants(**batched)
+        start = time.perf_counter()
+        frames = np.array(list(my_scene.render_anim(frame_count)))
+        seconds = time.perf_counter() - start
+    finally:
+        vars(scene).update(saved)
+    return Sweep(frames, variants, seconds, my_scene.splits)
+
+
+def single(width, height, frame_count=1):
+    """Seconds to render the unswept scene, for comparison."""
+    my_scene = scene.Scene(width, height, numerics=numerics.QuietNumerics())
+    start = time.perf_counter()
+    for pixels in my_scene.render_anim(frame_count):
+        pass
+    return time.perf_counter() - start
+
+
+def parse_axis(arg):
+    name, _, spec = arg.partition('=')
+    if spec.startswith('['):
+        return name, json.loads(spec)
+    if spec.count(':') == 2:
+        lo, hi, count = spec.split(':')
+        return name, list(np.linspace(float(lo), float(hi), int(count)))
+    return name, [float(v) for v in spec.split(',')]
+
+
+def main(argv):
+    from main import WIDTH, HEIGHT
+    parser = argparse.ArgumentParser(
+        description='Render a grid of scene constant values at once.')
+    parser.add_argument('axes', nargs='+', metavar='NAME=VALUES')
+    parser.add_argument('-f', '--frames', type=int, default=1)
+    parser.add_argument('-o', '--output', default='sweep',
+                        help='prefix for contact sheets (default: sweep)')
+    parser.add_argument('-p', '--per-variant', action='store_true',
+                        help='also write each variant frame')
+    args = parser.parse_args(argv)
+
+    axes = dict(parse_axis(a) for a in args.axes)
+    base = single(WIDTH, HEIGHT, args.frames)
+    result = sweep(WIDTH, HEIGHT, axes, args.frames)
+    n = len(result.variants)
+    print('{} variants x {} frames: {:.2f} s, {:.1f}x one render ({:.2f} s),'
+          ' {} pixels split'.format(n, args.frames, result.seconds,
+                                     result.seconds / base, base,
+                                     result.splits))
+    for (i, v) in enumerate(result.variants):
+        print('{:4}  {}'.format(i, '  '.join(
+            '{}={}'.format(k, json.dumps(x) if isinstance(x, list)
+                           else '{:g}'.format(x))
+            for (k, x) in v.items())))
+    for f in range(args.frames):
+        result.contact_sheet(f).save('{}-{:03}.png'.format(args.output, f))
+        if args.per_variant:
+            for (i, img) in enumerate(result.frames[f]):
+                PIL.Image.fromarray(img).save(
+                    '{}-{:03}-{:03}.png'.format(args.output, f, i))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,67 @@
+# Runs difftest.py small, so the backends are cross-checked by pytest:
+#
+#     $ python -m pytest -q
+#
+# and checks a batched sweep against one render per variant, and the
+# NumPy shadow test against Sphere.occludes.
+
+import numpy as np
+import pytest
+
+import difftest
+import numerics
+import scene
+import sweep
+
+
+SIZE = 16
+FRAMES = 2
+PIXELS = 16
+
+
+@pytest.mark.parametrize('name', list(difftest.BACKENDS))
+def test_backend(name):
+    for sample in (difftest.stratified, difftest.scattered):
+        (report,) = difftest.difftest(SIZE, SIZE, FRAMES, PIXELS,
+                                      [difftest.BACKENDS[name]], sample)
+        assert report.pixels > 0
+        assert not difftest.over(report), report
+
+
+@pytest.mark.parametrize('axes', [
+    {'SPHERE_ALPHA': [0.1, 0.5, 0.9]},
+    {'SPHERE_ALPHA': [0.001, 0.5]},         # split at the bounce cutoff
+    {'SPHERE_RADIUS': [2, 4]},
+])
+def test_sweep(axes):
+    result = sweep.sweep(SIZE, SIZE, axes, FRAMES)
+    saved = {n: vars(scene)[n] for n in axes}
+    try:
+        for (i, variant) in enumerate(result.variants):
+            one = scene.Scene(SIZE, SIZE, numerics.QuietNumerics())
+            one.set_constants(**variant)
+            for (f, fb) in enumerate(one.render_anim(FRAMES)):
+                np.testing.assert_array_equal(result.frames[f][i],
+                                              fb.array[..., :3])
+    finally:
+        vars(scene).update(saved)
+
+
+def test_spheres_occlude():
+    rng = np.random.default_rng(1)
+    centers = rng.uniform(-5, 5, (3, 3))
+    radii = rng.uniform(0.5, 3, 3)
+    origins = rng.uniform(-8, 8, (200, 3))
+    directions = rng.normal(size=(200, 3))
+    directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+    batched = scene.spheres_occlude(centers, radii, origins, directions)
+
+    numz = numerics.QuietNumerics()
+    one = scene.Scene(SIZE, SIZE, numz)
+    spheres = [scene.Sphere(numz.vec3(*c), numz.scalar(r))
+               for (c, r) in zip(centers.tolist(), radii.tolist())]
+    one.sphere, one.others = spheres[0], tuple(spheres[1:])
+    for (o, d, hit) in zip(origins.tolist(), directions.tolist(), batched):
+        ray = scene.Ray(numz.vec3(*o), numz.vec3(*d))
+        assert one.occluded(ray) == hit
+    assert 0 < batched.sum() < len(batched)
@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+
+# Render timelines, as Chrome trace-event JSON.
+#
+# Open the output in chrome://tracing or ui.perfetto.dev to see where a
+# render's wall time goes.  Spans:
+#
+#   frame          Scene.render_frame, containing
+#     precalc      Scene.precalc_camera and precalc_sphere
+#     frame stage  start_frame to end_frame: the frame DAG's ops
+#     pixels       collect_pixels, one `row` span per row, and a
+#                  `pixel` span for every `sample`th pixel
+#   write .dot     each graph Numerics writes, inside its stage
+#   encode png     each frame's PNG
+#
+# and an `ops` counter track: the ops numerics.op_counts saw since the
+# last sample, by op, sampled after the frame stage and every row.
+#
+#     $ timeline.py [-f frames] [-s sample] [--no-dots] [-o trace.json]
+
+import argparse
+from collections import Counter
+from contextlib import contextmanager
+import io
+import json
+import sys
+import time
+
+import numerics
+import scene
+
+
+def op_name(label):
+    """An op's label without its constant's value or test number."""
+    if '\\nis_neg\\n' in label:
+        return 'is_neg'
+    return label.split('\\n')[0]
+
+
+class Tracer:
+    """Collects trace events.  Times are microseconds from creation."""
+
+    def __init__(self, process='ray model', thread='render'):
+        self.t0 = time.perf_counter()
+        self.events = [
+            {'name': 'process_name', 'ph': 'M', 'pid': 1,
+             'args': {'name': process}},
+            {'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': 1,
+             'args': {'name': thread}},
+        ]
+        self.last_ops = Counter()
+
+    def now(self):
+        return (time.perf_counter() - self.t0) * 1e6
+
+    def _event(self, ph, name, **fields):
+        self.events.append(dict(name=name, ph=ph, ts=self.now(), pid=1,
+                                tid=1, **fields))
+
+    def begin(self, name, **args):
+        self._event('B', name, args=args)
+
+    def end(self, name):
+        self._event('E', name)
+
+    @contextmanager
+    def span(self, name, **args):
+        start = self.now()
+        try:
+            yield
+        finally:
+            self.events.append({'name': name, 'ph': 'X', 'ts': start,
+                                'dur': self.now() - start, 'pid': 1,
+                                'tid': 1, 'args': args})
+
+    def counter(self, name, values):
+        self._event('C', name, args=values)
+
+    def count_ops(self, name='ops'):
+        """A counter sample of the ops since the last one."""
+        if numerics.op_counts is None:
+            return
+        ops = Counter()
+        for (label, n) in numerics.op_counts.items():
+            ops[op_name(label)] += n
+        # Every op seen so far, so each series drops to zero, not
+        # holds, when an op stops.
+        delta = {op: n - self.last_ops[op] for (op, n) in ops.items()}
+        self.last_ops = ops
+        self.counter(name, delta)
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': self.events,
+                       'displayTimeUnit': 'ms'}, f)
+
+
+class TracingNumerics(numerics.Numerics):
+    """Numerics that mark the frame stage and the .dot files.  With
+       `dots` false, it builds no graphs at all.
+    """
+
+    def __init__(self, tracer, dots=True):
+        super().__init__()
+        self.tracer = tracer
+        self.dots = dots
+
+    def start_frame(self, *input_tuples):
+        self.tracer.begin('frame stage')
+        if self.dots:
+            super().start_frame(*input_tuples)
+        else:
+            self.frame_counter += 1
+
+    def end_frame(self, *output_tuples):
+        if self.dots:
+            super().end_frame(*output_tuples)
+        else:
+            self.pixel_counter = 0
+        self.tracer.end('frame stage')
+        self.tracer.count_ops()
+
+    def start_pixel(self, *input_tuples):
+        if self.dots:
+            super().start_pixel(*input_tuples)
+
+    def end_pixel(self, *output_tuples):
+        if self.dots:
+            super().end_pixel(*output_tuples)
+        else:
+            self.pixel_counter += 1
+
+    def graph_done(self, dotfile, graph):
+        with self.tracer.span('write .dot', file=dotfile):
+            super().graph_done(dotfile, graph)
+
+
+class TracedScene(scene.Scene):
+    """A Scene that marks its phases on `tracer`."""
+
+    def __init__(self, width, height, numerics, tracer, sample=0,
+                 scanline=False):
+        super().__init__(width, height, numerics, scanline)
+        self.tracer = tracer
+        self.sample = sample
+        self.row = None
+
+    def render_frame(self, frame, fb=None):
+        with self.tracer.span('frame', frame=frame):
+            return super().render_frame(frame, fb)
+
+    def precalc_camera(self):
+        with self.tracer.span('precalc', part='camera'):
+            return super().precalc_camera()
+
+    def precalc_sphere(self, frame):
+        with self.tracer.span('precalc', part='sphere'):
+            return super().precalc_sphere(frame)
+
+    def collect_pixels(self, fb=None):
+        with self.tracer.span('pixels'):
+            fb = super().collect_pixels(fb)
+            self._end_row()
+        return fb
+
+    def _end_row(self):
+        if self.row is not None:
+            self.tracer.end('row')
+            self.tracer.count_ops()
+            self.row = None
+
+    def render_pixel(self, ix, iy, direction=None):
+        if iy != self.row:
+            self._end_row()
+            self.tracer.begin('row', y=iy)
+            self.row = iy
+        if self.sample and (iy * self.width + ix) % self.sample == 0:
+            with self.tracer.span('pixel', x=ix, y=iy):
+                return super().render_pixel(ix, iy, direction)
+        return super().render_pixel(ix, iy, direction)
+
+
+def trace(width, height, frame_count, sample=0, dots=True, scanline=False):
+    """Render and encode `frame_count` frames.  Returns the Tracer."""
+    tracer = Tracer()
+    saved, numerics.op_counts = numerics.op_counts, Counter()
+    try:
+        numz = TracingNumerics(tracer, dots)
+        my_scene = TracedScene(width, height, numz, tracer, sample, scanline)
+        for (f, fb) in enumerate(my_scene.render_anim(frame_count)):
+            png = io.BytesIO()
+            with tracer.span('encode png', frame=f):
+                fb.image().save(png, format='PNG')
+    finally:
+        numerics.op_counts = saved
+    return tracer
+
+
+def main(argv):
+    from main import WIDTH, HEIGHT
+    parser = argparse.ArgumentParser(
+        description='Trace a render as Chrome trace-event JSON.')
+    parser.add_argument('-f', '--frames', type=int, default=2)
+    parser.add_argument('-s', '--sample', type=int, default=64,
+                        help='a pixel span every SAMPLE pixels (0: none)')
+    parser.add_argument('--no-dots', action='store_true',
+                        help="build no graphs and write no .dot files")
+    parser.add_argument('--scanline', action='store_true',
+                        help='step ray directions (see strength.py)')
+    parser.add_argument('-o', '--output', default='trace.json')
+    args = parser.parse_args(argv)
+
+    tracer = trace(WIDTH, HEIGHT, args.frames, args.sample,
+                   not args.no_dots, args.scanline)
+    tracer.save(args.output)
+    totals = Counter()
+    for e in tracer.events:
+        if e['ph'] == 'X' and e['name'] != 'pixel':
+            totals[e['name']] += e['dur']
+    print('{}: {} events'.format(args.output, len(tracer.events)))
+    for (name, us) in totals.most_common():
+        print('  {:12} {:9.3f} s'.format(name, us / 1e6))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
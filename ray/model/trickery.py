@@ -33,6 +33,21 @@ def define_constants(namespace, numerics):
         a.name = name
         namespace[name] = a
 
+def redefine_constant(namespace, numerics, name, value):
+    """Give one lazy constant a new value: a number for a scalar, three
+       for a vec3, or angle() keyword arguments.
+    """
+    if name in dict(scalars):
+        c = numerics.scalar(value)
+    elif name in dict(vectors):
+        c = numerics.vec3(*value)
+    elif name in dict(angles):
+        c = numerics.angle(**value)
+    else:
+        raise KeyError('no constant {!r}'.format(name))
+    c.name = name
+    namespace[name] = c
+
 # def find_constant(obj):
 #     print('find_constant(id={} obj={})'.format(id(obj), obj))
 #     for (name, value) in scalars:
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+
+# Whitted-style reflections between spheres.
+#
+# Scene.trace follows a reflection from a sphere to whatever it hits
+# next, spheres included, up to `depth` bounces.  A reflected ray
+# contributes SPHERE_ALPHA of the ray it came from, so a bounce is cut
+# off once it would change the pixel by less than one unorm step: with
+# alpha 0.3, the fifth is cut, so four are traced.  With a ray budget,
+# each pixel may trace its share of what is left of the frame's;
+# pixels that don't reflect leave their share to the ones that do, and
+# when the budget runs short, reflections lose their deepest bounces
+# first.  A bounce only goes ahead if its ray and a shadow ray fit, so
+# the total stays within the budget unless the primary and shadow rays
+# alone are over it.
+#
+# The plain scene has one sphere, and a reflection off it can only hit
+# the plane, so depth 1 is all it ever needs.  WhittedScene adds two
+# mirror spheres that don't move, for the ball to bounce between.
+#
+#     $ whitted.py [-f frames] [-d depth ...] [-b rays/pixel ...]
+#
+# prints, for each depth limit and budget, the rays per pixel at each
+# depth, the shadow rays, the ops and multiplies per pixel, and how many
+# pixels differ from the deepest unbudgeted render.
+
+import argparse
+from collections import Counter, namedtuple
+import sys
+import time
+
+import numerics
+import scene
+from timeline import op_name
+
+
+# (center, radius)
+MIRRORS = (
+    ((-4.5, 3.5, 6), 3.5),
+    ((+4.5, 3.5, 6), 3.5),
+)
+
+# Ops that build values rather than compute them.
+NOT_ARITHMETIC = {'scalar', 'vec', 'index', 'angle'}
+
+
+class WhittedScene(scene.Scene):
+    """The scene with fixed mirror spheres beside the ball."""
+
+    def __init__(self, width, height, numerics, depth=1, ray_budget=None,
+                 mirrors=MIRRORS):
+        super().__init__(width, height, numerics, depth=depth,
+                         ray_budget=ray_budget)
+        self.others = tuple(
+            scene.Sphere(center=self.numerics.vec3(*center),
+                         radius=self.numerics.scalar(radius))
+            for (center, radius) in mirrors)
+
+
+Run = namedtuple('Run', 'frames rays ops seconds')
+
+
+def render(width, height, frame_count, depth, ray_budget=None):
+    """Render `frame_count` frames; the rays by depth and ops by name
+       they took, summed over the frames.
+    """
+    saved, numerics.op_counts = numerics.op_counts, Counter()
+    try:
+        my_scene = WhittedScene(width, height, numerics.QuietNumerics(), depth,
+                                ray_budget)
+        rays = Counter()
+        frames = []
+        start = time.perf_counter()
+        for fb in my_scene.render_anim(frame_count):
+            frames.append(fb.array.copy())
+            rays += my_scene.rays
+        seconds = time.perf_counter() - start
+        ops = Counter()
+        for (label, n) in numerics.op_counts.items():
+            ops[op_name(label)] += n
+    finally:
+        numerics.op_counts = saved
+    return Run(frames, rays, ops, seconds)
+
+
+def report(label, run, pixels, reference, budget=None):
+    depths = sorted(k for k in run.rays if k != 'shadow')
+    total = sum(run.rays.values())
+    arith = sum(n for (op, n) in run.ops.items() if op not in NOT_ARITHMETIC)
+    muls = run.ops['mul'] + 3 * run.ops['dot']
+    differ = sum(int((a != b).any(axis=-1).sum())
+                 for (a, b) in zip(run.frames, reference.frames))
+    of = '' if budget is None else ' of {:.3f}'.format(budget)
+    print('{:14} {}  shadow {:.3f}  total {:.3f}{}   {:6.1f} ops {:5.1f} '
+          'muls  {:.3f} s  {} differ'.format(
+              label,
+              ' '.join('d{} {:.3f}'.format(d, run.rays[d] / pixels)
+                       for d in depths),
+              run.rays['shadow'] / pixels, total / pixels, of,
+              arith / pixels, muls / pixels, run.seconds, differ))
+
+
+def main(argv):
+    from main import WIDTH, HEIGHT
+    parser = argparse.ArgumentParser(
+        description='Rays and ops for Whitted reflections by depth.')
+    parser.add_argument('-f', '--frames', type=int, default=2)
+    parser.add_argument('-d', '--depth', type=int, nargs='+',
+                        default=[1, 2, 3, 8])
+    parser.add_argument('-b', '--budget', type=float, nargs='+',
+                        default=[1.5, 1.2, 1.0],
+                        help='rays a pixel, on average, at the deepest '
+                             'depth')
+    args = parser.parse_args(argv)
+
+    pixels = WIDTH * HEIGHT * args.frames
+    deepest = max(args.depth)
+    reference = render(WIDTH, HEIGHT, args.frames, deepest)
+    print('rays a pixel by depth, {} frames of {}x{}:'.format(
+        args.frames, WIDTH, HEIGHT))
+    for depth in sorted(args.depth):
+        run = (reference if depth == deepest else
+               render(WIDTH, HEIGHT, args.frames, depth))
+        report('depth {}'.format(depth), run, pixels, reference)
+    for budget in args.budget:
+        run = render(WIDTH, HEIGHT, args.frames, deepest,
+                     round(budget * WIDTH * HEIGHT))
+        report('budget {:.2f}'.format(budget), run, pixels, reference,
+               budget)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
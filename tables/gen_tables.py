@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+
+# Lookup tables for $readmemh.
+#
+# One generator for the tables the demos load into block RAM, and that
+# the Python models use, so both see the same values:
+#
+#   gamma   pow(x, gamma) scaled to the range, like the old
+#           gen_gamma_table.c.  -z shifts the curve so every nonzero
+#           input gives a nonzero output.
+#   sqrt    floor(sqrt(i)), like circle-tunnel's gen_sqrt_table.c.
+#   sin     sin(i / 2**d of a turn), signed fixed point, for the ray
+#   cos     tracer's ray_sin.
+#   recip   1/m at the middle of each of 2**d slices of [1, 2), and
+#   rsqrt   1/sqrt(m) for [1, 4): Newton-Raphson seeds (see
+#           ray/model/numerics.py).
+#
+# Output is the format gen_gamma_table.c wrote: eight values a line,
+# each line starting with its address.  Signed values are written in
+# two's complement.
+#
+# Tables are cached in .table-cache/ next to this file, by a hash of the
+# table, its parameters and this file, so a table is only computed once.
+#
+#     $ gen_tables.py gamma -d 8 -r 10 -z -o gamma8x10z_table.hex
+#     $ gen_tables.py sqrt -d 11 > sqrt_table.hex
+#
+# or, from Python,
+#
+#     import gen_tables
+#     g = gen_tables.gamma(range_bits=10, zero_adjust=True)
+#
+# model/ and ray/model/ have symlinks to this file, so their modules can
+# import it as is.
+
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import sys
+
+import numpy as np
+
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                         '.table-cache')
+
+
+def gamma(gamma=2.2, domain_bits=8, range_bits=16, zero_adjust=False):
+    d_max = (1 << domain_bits) - 1
+    r_max = (1 << range_bits) - 1
+    min_x, x_scale = 0.0, 1.0 / d_max
+    if zero_adjust:
+        min_x = (1.0 / r_max) ** (1.0 / gamma)
+        x_scale = (1.0 - min_x) / d_max
+    i = np.arange(d_max + 1)
+    g = (r_max * (min_x + x_scale * i) ** gamma).astype(np.int64)
+    if zero_adjust:
+        g[1:][g[1:] == 0] = 1
+    return g
+
+
+def sqrt(domain_bits=11):
+    i = np.arange(1 << domain_bits)
+    r = np.sqrt(i).astype(np.int64)
+    # Exact, even where the float root rounds up past an integer.
+    return r - (r * r > i)
+
+
+def sin(domain_bits=10, frac_bits=14, offset=0):
+    n = 1 << domain_bits
+    i = np.arange(n) + offset
+    return np.round(np.sin(i * (2 * np.pi / n)) * 2 ** frac_bits).astype(
+        np.int64)
+
+
+def cos(domain_bits=10, frac_bits=14):
+    return sin(domain_bits, frac_bits, offset=1 << domain_bits - 2)
+
+
+def recip(domain_bits=6):
+    """In units of 2**-(domain_bits + 1)."""
+    n = 1 << domain_bits
+    m = 1 + (np.arange(n) + 0.5) / n
+    return np.round(2 ** (domain_bits + 1) / m).astype(np.int64)
+
+
+def rsqrt(domain_bits=6):
+    """In units of 2**-(domain_bits + 1)."""
+    n = 1 << domain_bits
+    m = 1 + 3 * (np.arange(n) + 0.5) / n
+    return np.round(2 ** (domain_bits + 1) / np.sqrt(m)).astype(np.int64)
+
+
+TABLES = {
+    'gamma': gamma,
+    'sqrt': sqrt,
+    'sin': sin,
+    'cos': cos,
+    'recip': recip,
+    'rsqrt': rsqrt,
+}
+
+
+def range_bits(values):
+    """Bits a table's values need; signed tables get a sign bit."""
+    lo, hi = int(values.min()), int(values.max())
+    if lo < 0:
+        return max(hi.bit_length(), (-lo - 1).bit_length()) + 1
+    return max(hi.bit_length(), 1)
+
+
+def to_hex(values, bits=None):
+    """$readmemh text: eight values a line, each line led by its
+       address.
+    """
+    bits = bits or range_bits(values)
+    digits = (bits + 3) // 4
+    words = ['{:0{}x}'.format(v, digits)
+             for v in (values & (1 << bits) - 1).tolist()]
+    return ''.join('@{:08X} {}\n'.format(a, ' '.join(words[a:a + 8]))
+                   for a in range(0, len(words), 8))
+
+
+def _cache_path(kind, params, cache_dir):
+    with open(os.path.realpath(__file__), 'rb') as f:
+        source = f.read()
+    key = json.dumps([kind, sorted(params.items())]).encode()
+    digest = hashlib.sha1(source + b'\0' + key).hexdigest()
+    return os.path.join(cache_dir, digest[:2], digest + '.hex')
+
+
+def hex_table(kind, cache_dir=CACHE_DIR, **params):
+    """The $readmemh text of a table, and whether it was cached.
+       `range_bits` sets the width written, for tables that don't take
+       it themselves.
+    """
+    cached = _cache_path(kind, params, cache_dir) if cache_dir else None
+    if cached and os.path.exists(cached):
+        with open(cached) as f:
+            return f.read(), True
+    gen = TABLES[kind]
+    bits = params.get('range_bits')
+    if 'range_bits' not in inspect.signature(gen).parameters:
+        params.pop('range_bits', None)
+    text = to_hex(gen(**params), bits)
+    if cached:
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        tmp = '{}.{}.tmp'.format(cached, os.getpid())
+        with open(tmp, 'w') as f:
+            f.write(text)
+        os.replace(tmp, cached)
+    return text, False
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description='Generate a lookup table for $readmemh.')
+    parser.add_argument('kind', choices=sorted(TABLES))
+    parser.add_argument('-g', '--gamma', type=float,
+                        help='gamma exponent (gamma; default 2.2)')
+    parser.add_argument('-d', '--domain-bits', type=int,
+                        help="bits of the table's input")
+    parser.add_argument('-r', '--range-bits', type=int,
+                        help="bits of the table's output")
+    parser.add_argument('-f', '--frac-bits', type=int,
+                        help='fraction bits (sin, cos; default 14)')
+    parser.add_argument('-z', '--zero-adjust', action='store_true',
+                        help='adjust scale so nonzero inputs produce '
+                             'nonzero outputs (gamma)')
+    parser.add_argument('-o', '--output', help='file (default: stdout)')
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--no-cache', action='store_true')
+    args = parser.parse_args(argv)
+
+    params = {k: v for (k, v) in vars(args).items()
+              if k in ('gamma', 'domain_bits', 'range_bits', 'frac_bits')
+              and v is not None}
+    if args.zero_adjust:
+        params['zero_adjust'] = True
+    try:
+        text, _ = hex_table(args.kind,
+                            cache_dir=None if args.no_cache else
+                            args.cache_dir,
+                            **params)
+    except TypeError as e:
+        parser.error('{}: {}'.format(args.kind, e))
+    if args.output:
+        tmp = '{}.{}.tmp'.format(args.output, os.getpid())
+        with open(tmp, 'w') as f:
+            f.write(text)
+        os.replace(tmp, args.output)
+    else:
+        sys.stdout.write(text)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])